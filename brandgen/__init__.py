@@ -6,40 +6,81 @@ This package organizes dataset generation into clear layers:
 - prompt: static prompt templates.
 - prompt_builder: runtime assembly of prompts.
 - api: OpenAI client + schema constrained calls.
+- cache: on-disk response cache in front of the API calls.
+- ratelimit: shared RPM/TPM limiter and retry backoff policy.
+- hedge: percentile-deadline hedged requests under a budget.
+- batch: Batch API execution with a pluggable (and local) client.
+- workqueue: leased SQLite work queue shared by multiple workers.
+- mock: schema-valid mock payloads.
+- mockserver: local mock OpenAI chat-completions server for offline runs and benchmarks.
+- dedup: company-name normalization and near-duplicate clustering.
+- wikidata: Wikidata brand lookup index for grounding or skipping brand calls.
+- validate: compiled item validators, format rules and validation modes.
+- telemetry: per-call metrics, item quality counters and run reports.
+- profiling: trace spans, Chrome trace export and per-phase profilers.
 - persist: JSON file loading/saving helpers.
-- flatten: CSV export utilities.
+- storage: optional SQLite backend for the companies / brands stores.
+- flatten: CSV / Parquet export utilities.
 
-The top-level exports below present a minimal surface area for users.
+The top-level exports below present a minimal surface area for users. They are
+resolved lazily (PEP 562): ``import brandgen`` is cheap, and a submodule (and its
+dependencies such as the openai SDK or pyarrow) loads on first attribute access.
 """
 
-from .config import load_env, get_config, ChatGPTConfig
-from .api import create_client, ask_companies, ask_brands
-from .prompt_builder import (
-    build_prompt,
-    build_companies_prompt,
-    build_brands_prompt,
-    build_companies_groups_prompt,
-)
-from .persist import load_sections, load_json, save_json, load_companies, load_isic_groups
-from .flatten import flatten_to_csv
-from .logger import configure_logger
-
-__all__ = [
-    "load_env",
-    "get_config",
-    "ChatGPTConfig",
-    "create_client",
-    "ask_companies",
-    "ask_brands",
-    "build_prompt",
-    "build_companies_prompt",
-    "build_brands_prompt",
-    "build_companies_groups_prompt",
-    "load_sections",
-    "load_json",
-    "save_json",
-    "flatten_to_csv",
-    "configure_logger",
-    "load_companies",
-    "load_isic_groups",
-]
+from __future__ import annotations
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .config import load_env, get_config, country_config, ChatGPTConfig
+    from .api import create_client, ask_companies, ask_brands, ask_brands_multi
+    from .prompt_builder import (
+        build_prompt,
+        build_companies_prompt,
+        build_brands_prompt,
+        build_companies_groups_prompt,
+        build_brands_multi_prompt,
+    )
+    from .persist import load_sections, load_json, save_json, load_companies, load_isic_groups
+    from .flatten import flatten_to_csv, flatten_files_to_csv
+    from .logger import configure_logger
+
+_EXPORTS = {
+    "load_env": "config",
+    "get_config": "config",
+    "country_config": "config",
+    "ChatGPTConfig": "config",
+    "create_client": "api",
+    "ask_companies": "api",
+    "ask_brands": "api",
+    "ask_brands_multi": "api",
+    "build_prompt": "prompt_builder",
+    "build_companies_prompt": "prompt_builder",
+    "build_brands_prompt": "prompt_builder",
+    "build_companies_groups_prompt": "prompt_builder",
+    "build_brands_multi_prompt": "prompt_builder",
+    "load_sections": "persist",
+    "load_json": "persist",
+    "save_json": "persist",
+    "flatten_to_csv": "flatten",
+    "flatten_files_to_csv": "flatten",
+    "configure_logger": "logger",
+    "load_companies": "persist",
+    "load_isic_groups": "persist",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    """Import the submodule behind a top-level export on first access."""
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
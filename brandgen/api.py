@@ -1,46 +1,315 @@
 """API interaction layer.
 
 Responsibility: Own OpenAI client creation and schema-constrained calls for
-companies and brands generations.
+companies and brands generations, including the validation stage that repairs
+invalid items with a small follow-up request for just the offending fields.
 """
 
 from __future__ import annotations
 import json
-from typing import List, Dict
-from openai import OpenAI
-from .schemas import companies_schema, brands_schema
+import logging
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Iterator, List, Dict, Tuple
+from .cache import get_cache
+from .hedge import get_hedger
+from .profiling import gauge, span
+from .prompt_builder import build_prompt, build_repair_prompt
+from .ratelimit import estimate_tokens, get_limiter, output_token_cap
+from .schemas import companies_schema, brands_schema, brands_multi_schema, repair_schema
+from .telemetry import get_telemetry, phase_for_schema
+from .validate import FIELD_RULES, ItemValidator, get_validation_mode, item_validator
 
+if TYPE_CHECKING:  # the SDK is imported by create_client, so offline runs never load it
+    from openai import OpenAI
 
-def create_client(api_key: str) -> OpenAI:
-    """Instantiate an OpenAI client with the provided API key."""
-    return OpenAI(api_key=api_key)
 
+TEMPERATURE = 0.2
+
+logger = logging.getLogger(__name__)
 
-def ask_companies(client: OpenAI, model: str, prompt: str) -> List[Dict[str, str]]:
-    """Request a structured list of companies for a single industry section.
 
-    Returns list of company dicts matching companies_schema().
+def create_client(api_key: str, max_retries: int = 2, base_url: str | None = None) -> OpenAI:
+    """Instantiate an OpenAI client with the provided API key.
+
+    Pass ``max_retries=0`` when the shared rate limiter owns retries; ``base_url``
+    points the client at another endpoint (e.g. the local mock server).
     """
-    completion = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-        response_format={"type": "json_schema", "json_schema": companies_schema()},
-        temperature=0.2,
-    )
+    from openai import OpenAI
+
+    return OpenAI(api_key=api_key, max_retries=max_retries, base_url=base_url)
+
+
+@lru_cache(maxsize=None)
+def _retryable_errors() -> Tuple[type, ...]:
+    """Exception types retried under the shared limiter: 429 (first), connection errors, 5xx."""
+    from openai import APIConnectionError, InternalServerError, RateLimitError
+
+    return (RateLimitError, APIConnectionError, InternalServerError)
+
+
+def build_request(model: str, prompt: str, schema: Dict[str, Any], max_tokens: int | None = None) -> Dict[str, Any]:
+    """Return chat-completions request parameters for a schema-constrained prompt (optionally output-capped)."""
+    request = {
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}],
+        "response_format": {"type": "json_schema", "json_schema": schema},
+        "temperature": TEMPERATURE,
+    }
+    if max_tokens:
+        request["max_tokens"] = max_tokens
+    return request
+
+
+@contextmanager
+def _in_flight(schema: Dict[str, Any], attempt: int) -> Iterator[None]:
+    """Trace one HTTP attempt as an api_call span and count it in the api_in_flight counter."""
+    with span("api_call", "api", schema=schema.get("name", ""), attempt=attempt):
+        gauge("api_in_flight", 1)
+        try:
+            yield
+        finally:
+            gauge("api_in_flight", -1)
+
+
+def _send(
+    create: Callable[..., Any], request: Dict[str, Any], schema: Dict[str, Any], attempt: int, estimate: int = 0, raw: bool = False
+) -> Any:
+    """Run one HTTP attempt, hedged past the schema's latency deadline when hedging is configured.
+
+    A duplicate takes its own rate-limit budget (``estimate`` tokens); the abandoned
+    request's usage (``raw``: create returns raw responses) is reconciled with the
+    limiter and reported as extra spend.
+    """
+
+    def send() -> Any:
+        with _in_flight(schema, attempt):
+            return create(**request)
+
+    hedger = get_hedger()
+    if hedger is None:
+        return send()
+    limiter = get_limiter()
+    telemetry = get_telemetry()
+    name = schema.get("name", "")
+    phase = phase_for_schema(name)
+
+    def before_hedge() -> None:
+        if limiter is not None:
+            with span("rate_limit_wait", "ratelimit"):
+                telemetry.add_stage_time("rate_limit_wait", limiter.acquire(estimate))
+
+    def on_skip() -> None:
+        if limiter is not None:
+            limiter.reconcile(estimate, 0)  # the duplicate was never sent
+
+    def on_loser(response: Any, saved: float) -> None:
+        completion = response.parse() if raw else response
+        usage = getattr(completion, "usage", None)
+        if limiter is not None and usage is not None:
+            limiter.reconcile(estimate, usage.total_tokens)
+        telemetry.record_hedge(phase, request["model"], usage, saved=saved)
+
+    response, outcome = hedger.run(name, send, before_hedge, on_loser, on_skip)
+    if outcome != "unhedged":
+        telemetry.record_hedge(phase, launched=True, won=outcome == "hedge")
+    return response
+
+
+def _create(
+    client: OpenAI, model: str, prompt: str, schema: Dict[str, Any], max_tokens: int | None = None
+) -> Tuple[Any, int, float]:
+    """Call chat completions under the shared rate limiter, retrying transient failures.
+
+    429 / 5xx / connection errors are retried with jittered exponential backoff; budgets
+    are adapted from the x-ratelimit-* headers of every successful response.
+    Returns (completion, retries, latency of the successful attempt).
+    """
+    request = build_request(model, prompt, schema, max_tokens)
+    limiter = get_limiter()
+    telemetry = get_telemetry()
+    if limiter is None:
+        start = time.perf_counter()
+        completion = _send(client.chat.completions.create, request, schema, 0)
+        return completion, 0, time.perf_counter() - start
+    estimate = estimate_tokens(prompt, schema)
+    for attempt in range(limiter.max_retries + 1):
+        with span("rate_limit_wait", "ratelimit"):
+            telemetry.add_stage_time("rate_limit_wait", limiter.acquire(estimate))
+        start = time.perf_counter()
+        try:
+            raw = _send(client.chat.completions.with_raw_response.create, request, schema, attempt, estimate, raw=True)
+        except _retryable_errors() as e:
+            if attempt == limiter.max_retries:
+                raise
+            headers = getattr(getattr(e, "response", None), "headers", None) or {}
+            delay = limiter.backoff(attempt, headers.get("retry-after"), isinstance(e, _retryable_errors()[0]))
+            logger.warning(
+                f"{type(e).__name__} (attempt {attempt + 1}/{limiter.max_retries + 1}); "
+                f"retrying in {delay:.1f}s | limiter={limiter.state()}"
+            )
+            with telemetry.timed("retry_backoff"), span("retry_backoff", "ratelimit", error=type(e).__name__):
+                time.sleep(delay)
+            continue
+        latency = time.perf_counter() - start
+        limiter.update_from_headers(raw.headers)
+        completion = raw.parse()
+        if getattr(completion, "usage", None):
+            limiter.reconcile(estimate, completion.usage.total_tokens)
+        return completion, attempt, latency
+
+
+def _item_count(payload: Dict[str, Any]) -> int:
+    """Count generated items across the list-valued fields of a response payload."""
+    return sum(len(value) for value in payload.values() if isinstance(value, list))
+
+
+def _complete(client: OpenAI, model: str, prompt: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the parsed JSON object for a schema-constrained prompt.
+
+    Served from the response cache when configured; only responses that parse are cached.
+    Every call (or cache hit) is recorded in the run telemetry. Schemas with maxItems
+    limits get a matching output-token cap; a response cut off by that cap is
+    recorded and requested again without it.
+    """
+    telemetry = get_telemetry()
+    phase = phase_for_schema(schema.get("name", ""))
+    cache = get_cache()
+    key = cache.make_key(model, prompt, schema, TEMPERATURE) if cache else ""
+    content = cache.get(key) if cache else None
+    if content is not None:
+        payload = json.loads(content)
+        telemetry.record_call(phase, model, 0.0, _item_count(payload), cache_hit=True)
+        return payload
+    cap = output_token_cap(schema)
+    completion, retries, latency = _create(client, model, prompt, schema, cap)
+    if cap and getattr(completion.choices[0], "finish_reason", None) == "length":
+        logger.warning(f"{schema.get('name', '')} response hit the {cap}-token output cap; retrying uncapped")
+        telemetry.record_call(phase, model, latency, 0, getattr(completion, "usage", None), retries)
+        telemetry.record_token_cap_hit(phase)
+        completion, retries, latency = _create(client, model, prompt, schema)
     content = completion.choices[0].message.content
-    return json.loads(content).get("companies", [])
+    payload = json.loads(content)
+    if cache:
+        cache.put(key, content)
+    telemetry.record_call(phase, model, latency, _item_count(payload), getattr(completion, "usage", None), retries)
+    return payload
 
 
-def ask_brands(client: OpenAI, model: str, prompt: str) -> List[Dict[str, str]]:
-    """Request structured brand / product / service items for one company.
+def _repair(
+    client: OpenAI,
+    model: str,
+    kind: str,
+    validator: ItemValidator,
+    items: List[Any],
+    flagged: Dict[int, Tuple[str, ...]],
+    subject: str,
+) -> Dict[int, Dict[str, Any]]:
+    """Re-request only the flagged fields of the flagged items; return index -> merged item.
 
-    Returns list of brand dicts matching brands_schema().
+    Items that are not objects, or whose only issue is extra keys, are not sent.
+    A repair call that still fails after the limiter's retries (429 / 5xx / connection
+    errors) is logged and leaves the items to be blanked or dropped; other errors propagate.
     """
-    completion = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-        response_format={"type": "json_schema", "json_schema": brands_schema()},
-        temperature=0.2,
+    repairable = {i: bad for i, bad in flagged.items() if isinstance(items[i], dict) and set(bad) & set(validator.fields)}
+    if not repairable:
+        return {}
+    fields = [field for field in validator.fields if any(field in bad for bad in repairable.values())]
+    what = "company" if kind == "companies" else "brand"
+    listing = [(i, items[i], bad) for i, bad in repairable.items()]
+    prompt = build_prompt(build_repair_prompt(what, subject, listing, fields, FIELD_RULES))
+    try:
+        payload = _complete(client, model, prompt, repair_schema(kind, fields))
+    except _retryable_errors() as exc:  # keep the valid items; the flagged ones are settled by the caller
+        logger.warning(f"Repair request for {len(repairable)} {kind} items{f' of {subject}' if subject else ''} failed: {exc}")
+        return {}
+    merged: Dict[int, Dict[str, Any]] = {}
+    for entry in payload.get("items", []):
+        index = entry.get("index") if isinstance(entry, dict) else None
+        if index not in repairable:
+            continue
+        item = {**items[index], **{field: entry[field] for field in repairable[index] if field in entry}}
+        merged[index] = {field: item[field] for field in validator.fields if field in item}
+    return merged
+
+
+def validate_items(client: OpenAI | None, model: str, kind: str, items: Any, subject: str = "") -> Any:
+    """Validate generated items per VALIDATION_MODE and record item-level quality metrics.
+
+    'repair' first sends one repair request for the offending fields of the invalid
+    items (``subject`` names their company or scope in that prompt); 'drop' skips it.
+    Fields still invalid afterwards are blanked where the schema allows an empty
+    string, otherwise the item is dropped. 'off' returns items unchanged.
+    """
+    mode = get_validation_mode()
+    if mode == "off" or not isinstance(items, list):
+        return items
+    validator = item_validator(kind)
+    flagged = {i: bad for i, item in enumerate(items) if (bad := validator.issues(item))}
+    telemetry = get_telemetry()
+    if not flagged:
+        telemetry.record_validation(kind, len(items))
+        return items
+    field_issues: Dict[str, int] = {}
+    for bad in flagged.values():
+        for field in bad:
+            field_issues[field] = field_issues.get(field, 0) + 1
+    repaired = _repair(client, model, kind, validator, items, flagged, subject) if mode == "repair" and client else {}
+    valid, fixed, dropped = [], 0, 0
+    for i, item in enumerate(items):
+        bad = flagged.get(i)
+        if bad and i in repaired:
+            item = repaired[i]
+            bad = validator.issues(item)
+            fixed += not bad
+        if bad:
+            item = validator.settle(item, bad)
+            if item is None:
+                dropped += 1
+                continue
+        valid.append(item)
+    telemetry.record_validation(kind, len(items), field_issues, len(flagged), fixed, dropped)
+    logger.debug(
+        f"Validated {len(items)} {kind} items{f' of {subject}' if subject else ''}: "
+        f"{len(flagged)} invalid, {fixed} repaired, {dropped} dropped"
     )
-    content = completion.choices[0].message.content
-    return json.loads(content).get("items", [])
+    return valid
+
+
+def ask_companies(client: OpenAI, model: str, prompt: str, scope: str = "", limit: int = 0) -> List[Dict[str, str]]:
+    """Request a structured list of companies for a single industry section.
+
+    Returns list of company dicts matching companies_schema(limit), validated (and
+    repaired) per VALIDATION_MODE; ``scope`` names the section / group in repair prompts.
+    limit > 0 caps the list (maxItems) and the output tokens at request time.
+    """
+    companies = _complete(client, model, prompt, companies_schema(limit)).get("companies", [])
+    return validate_items(client, model, "companies", companies, scope)
+
+
+def ask_brands(client: OpenAI, model: str, prompt: str, company: str = "", limit: int = 0) -> List[Dict[str, str]]:
+    """Request structured brand / product / service items for one company.
+
+    Returns list of brand dicts matching brands_schema(limit), validated (and repaired)
+    per VALIDATION_MODE; ``company`` names the company in repair prompts.
+    limit > 0 caps the list (maxItems) and the output tokens at request time.
+    """
+    items = _complete(client, model, prompt, brands_schema(limit)).get("items", [])
+    return validate_items(client, model, "brands", items, company)
+
+
+def ask_brands_multi(
+    client: OpenAI, model: str, prompt: str, companies: List[str], limit: int = 0
+) -> Dict[str, List[Dict[str, str]]]:
+    """Request brand items for several companies in one call (at most limit each; 0 = unlimited).
+
+    Returns company name -> list of brand dicts; companies missing from the response are omitted.
+    Each company's list is validated (and repaired) on its own, per VALIDATION_MODE.
+    """
+    payload = _complete(client, model, prompt, brands_multi_schema(companies, limit))
+    return {
+        name: validate_items(client, model, "brands", payload[name], name)
+        for name in companies
+        if isinstance(payload.get(name), list)
+    }
@@ -0,0 +1,220 @@
+"""OpenAI Batch API execution.
+
+Responsibility: Serialize pending schema-constrained requests into a Batch API
+JSONL file, submit and poll it through a pluggable client, and return parsed
+results keyed like the input prompts. The outstanding batch is recorded in
+BATCH_DIR so an interrupted run resumes it. ``LocalBatchClient`` is an offline
+stand-in that answers the request file itself.
+"""
+
+from __future__ import annotations
+import json
+import logging
+import shutil
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, Protocol, Tuple
+from .api import TEMPERATURE, build_request
+from .cache import get_cache
+from .mock import mock_content
+from .persist import save_json
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+
+ENDPOINT = "/v1/chat/completions"
+PENDING_STATUSES = {"validating", "in_progress", "finalizing", "cancelling"}
+
+logger = logging.getLogger(__name__)
+
+
+class BatchClient(Protocol):
+    """Submission / polling surface used by ``run_batch``."""
+
+    def submit(self, request_path: Path) -> str:
+        """Upload a request JSONL file and start a batch; return its id."""
+        ...
+
+    def status(self, batch_id: str) -> str:
+        """Return the batch status string (OpenAI batch status vocabulary)."""
+        ...
+
+    def download(self, batch_id: str, output_path: Path) -> bool:
+        """Write the batch output JSONL to output_path; return False when there is none."""
+        ...
+
+
+class OpenAIBatchClient:
+    """Batch client backed by the OpenAI Files + Batches endpoints."""
+
+    def __init__(self, client: OpenAI) -> None:
+        self.client = client
+
+    def submit(self, request_path: Path) -> str:
+        with request_path.open("rb") as fh:
+            file = self.client.files.create(file=fh, purpose="batch")
+        batch = self.client.batches.create(input_file_id=file.id, endpoint=ENDPOINT, completion_window="24h")
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def download(self, batch_id: str, output_path: Path) -> bool:
+        batch = self.client.batches.retrieve(batch_id)
+        if batch.errors and batch.errors.data:
+            logger.warning(f"Batch {batch_id} errors: {[e.message for e in batch.errors.data]}")
+        if not batch.output_file_id:
+            return False
+        output_path.write_bytes(self.client.files.content(batch.output_file_id).content)
+        return True
+
+
+class LocalBatchClient:
+    """Offline stand-in: answers every request line with ``responder(body)`` on submit."""
+
+    def __init__(self, work_dir: Path, responder: Callable[[Dict[str, Any]], str] = mock_content) -> None:
+        self.work_dir = work_dir
+        self.responder = responder
+
+    def submit(self, request_path: Path) -> str:
+        batch_id = f"local_{request_path.stem.removesuffix('_requests')}_{time.time_ns()}"
+        with request_path.open("r", encoding="utf-8") as src, (self.work_dir / f"{batch_id}.response.jsonl").open("w", encoding="utf-8") as dst:
+            for n, line in enumerate(src):
+                request = json.loads(line)
+                content = self.responder(request["body"])
+                body = {
+                    "id": f"chatcmpl-{batch_id}-{n}",
+                    "object": "chat.completion",
+                    "model": request["body"]["model"],
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                }
+                response = {"status_code": 200, "request_id": f"req_{n}", "body": body}
+                dst.write(json.dumps({"id": f"batch_req_{n}", "custom_id": request["custom_id"], "response": response, "error": None}) + "\n")
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        return "completed"
+
+    def download(self, batch_id: str, output_path: Path) -> bool:
+        shutil.copyfile(self.work_dir / f"{batch_id}.response.jsonl", output_path)
+        return True
+
+
+def create_batch_client(kind: str, client: OpenAI | None, work_dir: Path) -> BatchClient:
+    """Return the batch client for BATCH_CLIENT ('openai' or 'local')."""
+    if kind == "local":
+        return LocalBatchClient(work_dir)
+    if kind == "openai" and client is not None:
+        return OpenAIBatchClient(client)
+    raise ValueError(f"Unsupported batch client: {kind}. Use 'openai' or 'local'.")
+
+
+def write_batch_requests(path: Path, prompts: Dict[str, str], model: str, schema: Dict[str, Any]) -> Dict[str, str]:
+    """Write one Batch API request line per prompt; return custom_id -> prompt key."""
+    ids: Dict[str, str] = {}
+    with path.open("w", encoding="utf-8") as fh:
+        for n, (key, prompt) in enumerate(prompts.items()):
+            custom_id = f"{schema['name']}-{n:06d}"
+            ids[custom_id] = key
+            # no output-token cap: a batch answer cut off by one could not be re-requested uncapped in the same run
+            line = {"custom_id": custom_id, "method": "POST", "url": ENDPOINT, "body": build_request(model, prompt, schema)}
+            fh.write(json.dumps(line, ensure_ascii=False) + "\n")
+    return ids
+
+
+def read_batch_results(path: Path) -> Iterator[Tuple[str, str | None]]:
+    """Yield (custom_id, message content or None on a failed request) from a batch output file."""
+    with path.open("r", encoding="utf-8") as fh:
+        for line in fh:
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                logger.warning(f"Batch request {record.get('custom_id')} failed: {record.get('error') or response.get('status_code')}")
+                yield record["custom_id"], None
+                continue
+            yield record["custom_id"], response["body"]["choices"][0]["message"]["content"]
+
+
+def wait_for_batch(batch_client: BatchClient, batch_id: str, poll_seconds: float) -> str:
+    """Poll until the batch leaves the pending statuses; return the final status."""
+    status = batch_client.status(batch_id)
+    while status in PENDING_STATUSES:
+        logger.info(f"Batch {batch_id} status={status}; next poll in {poll_seconds:.0f}s")
+        time.sleep(poll_seconds)
+        status = batch_client.status(batch_id)
+    return status
+
+
+def batch_state_path(work_dir: Path, schema: Dict[str, Any]) -> Path:
+    """Return the file recording the outstanding batch of a schema (id and requests)."""
+    return work_dir / f"{schema['name']}_batch.json"
+
+
+def run_batch(
+    batch_client: BatchClient,
+    prompts: Dict[str, str],
+    model: str,
+    schema: Dict[str, Any],
+    work_dir: Path,
+    poll_seconds: float,
+) -> Dict[str, Dict[str, Any]]:
+    """Answer prompts through one batch and return prompt key -> parsed JSON payload.
+
+    Prompts already in the response cache are answered locally; fresh results are
+    cached. Failed or unparsable requests are left out so a later run retries them.
+    The batch id and its custom_id -> (key, prompt) map are written to BATCH_DIR right
+    after submit, so a run interrupted while polling resumes that batch instead of
+    paying for a new one; only its requests still matching a pending prompt are used.
+    """
+    cache = get_cache()
+    results: Dict[str, Dict[str, Any]] = {}
+    cache_keys = {key: cache.make_key(model, prompt, schema, TEMPERATURE) for key, prompt in prompts.items()} if cache else {}
+    for key, cache_key in cache_keys.items():
+        content = cache.get(cache_key)
+        if content is not None:
+            results[key] = json.loads(content)
+    pending = {key: prompt for key, prompt in prompts.items() if key not in results}
+    work_dir.mkdir(parents=True, exist_ok=True)
+    state_path = batch_state_path(work_dir, schema)
+    while pending:
+        resumed = state_path.exists()
+        if resumed:
+            state = json.loads(state_path.read_text(encoding="utf-8"))
+            logger.info(f"Resuming batch {state['batch_id']} ({len(state['requests'])} {schema['name']} requests) from an earlier run")
+        else:
+            request_path = work_dir / f"{schema['name']}_requests.jsonl"
+            ids = write_batch_requests(request_path, pending, model, schema)
+            state = {
+                "batch_id": batch_client.submit(request_path),
+                "model": model,
+                "requests": {custom_id: [key, pending[key]] for custom_id, key in ids.items()},
+            }
+            save_json(str(state_path), state)
+            logger.info(f"Submitted batch {state['batch_id']} with {len(pending)} {schema['name']} requests ({len(results)} cached)")
+        batch_id = state["batch_id"]
+        status = wait_for_batch(batch_client, batch_id, poll_seconds)
+        if status == "failed":
+            state_path.unlink()
+            raise RuntimeError(f"Batch {batch_id} failed")
+        output_path = work_dir / f"{batch_id}_output.jsonl"
+        if batch_client.download(batch_id, output_path):
+            for custom_id, content in read_batch_results(output_path):
+                key, prompt = state["requests"].get(custom_id, (None, None))
+                if content is None or state["model"] != model or pending.get(key) != prompt:
+                    continue  # failed, or asked for a prompt this run no longer needs
+                try:
+                    results[key] = json.loads(content)
+                except ValueError:
+                    logger.warning(f"Batch request {custom_id} returned invalid JSON; left for a later run")
+                    continue
+                if cache:
+                    cache.put(cache_keys[key], content)
+        else:
+            logger.warning(f"Batch {batch_id} ended with status={status} and no output")
+        state_path.unlink()
+        logger.info(f"Batch {batch_id} status={status}: {len(results)}/{len(prompts)} results")
+        pending = {key: prompt for key, prompt in pending.items() if key not in results}
+        if not resumed:
+            break  # what a fresh batch left unanswered waits for a later run
+    return results
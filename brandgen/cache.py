@@ -0,0 +1,147 @@
+"""On-disk response cache.
+
+Responsibility: Content-addressed SQLite cache of raw model responses keyed by
+model, fully built prompt, schema and temperature, so repeated prompts (re-runs,
+the same company under several ISIC groups) are answered without an API call.
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+
+class ResponseCache:
+    """Thread-safe SQLite cache with age and size based eviction.
+
+    ``bypass`` skips lookups but still stores fresh responses (forced refresh).
+    """
+
+    def __init__(self, path: str, max_entries: int = 0, max_age_days: float = 0, bypass: bool = False) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_s = max_age_days * 86400
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, content TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+        self._count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        self.evict()
+
+    @staticmethod
+    def make_key(model: str, prompt: str, schema: Dict[str, Any], temperature: float) -> str:
+        """Return the content hash identifying one request.
+
+        The schema body is hashed as well as its name, so any schema change acts as a
+        version bump and never serves stale shapes.
+        """
+        schema_hash = hashlib.sha256(json.dumps(schema, sort_keys=True).encode("utf-8")).hexdigest()
+        material = json.dumps([model, prompt, schema.get("name", ""), schema_hash, temperature])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """Return cached content for key (refreshing its access time) or None."""
+        if self.bypass:
+            self.misses += 1
+            return None
+        with self._lock:
+            row = self._db.execute("SELECT content, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and self.max_age_s and row[1] < time.time() - self.max_age_s:
+                row = None  # expired; overwritten by the next put
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, content: str) -> None:
+        """Store content under key and evict when the size cap is exceeded."""
+        now = time.time()
+        with self._lock:
+            inserted = self._db.execute(
+                "INSERT OR IGNORE INTO responses (key, content, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, content, now, now),
+            ).rowcount
+            if not inserted:
+                self._db.execute(
+                    "UPDATE responses SET content = ?, created = ?, accessed = ? WHERE key = ?",
+                    (content, now, now, key),
+                )
+            self._db.commit()
+            self._count += inserted
+            self.writes += 1
+        if self.max_entries and self._count > self.max_entries * 1.1:
+            self.evict()  # batch eviction: trim ~10% at a time
+
+    def evict(self) -> None:
+        """Drop entries older than max age, then least recently used beyond max entries."""
+        with self._lock:
+            removed = 0
+            if self.max_age_s:
+                removed += self._db.execute(
+                    "DELETE FROM responses WHERE created < ?", (time.time() - self.max_age_s,)
+                ).rowcount
+            if self.max_entries:
+                excess = self._count - removed - self.max_entries
+                if excess > 0:
+                    removed += self._db.execute(
+                        "DELETE FROM responses WHERE key IN "
+                        "(SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                        (excess,),
+                    ).rowcount
+            self._db.commit()
+            self._count -= removed
+            self.evicted += removed
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit / miss / write / eviction counters and current size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evicted": self.evicted,
+            "entries": self._count,
+        }
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._db.close()
+
+
+_CACHE: ResponseCache | None = None
+
+
+def configure_cache(
+    path: str | None,
+    max_entries: int = 0,
+    max_age_days: float = 0,
+    bypass: bool = False,
+) -> ResponseCache | None:
+    """Open the process-wide response cache (``path`` None/empty disables caching)."""
+    global _CACHE
+    if _CACHE is not None:
+        _CACHE.close()
+    _CACHE = ResponseCache(path, max_entries, max_age_days, bypass) if path else None
+    return _CACHE
+
+
+def get_cache() -> ResponseCache | None:
+    """Return the configured response cache, if any."""
+    return _CACHE
@@ -5,9 +5,10 @@ environment variables (optionally via a .env file) centralizing all tunables.
 """
 
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 import os
-from dotenv import load_dotenv
+import re
+from pathlib import Path
 
 
 @dataclass
@@ -16,17 +17,63 @@ class ChatGPTConfig:
 
     api_key: str
     model: str
+    base_url: str | None  # OpenAI-compatible endpoint (None = api.openai.com)
     industries_file: str
     companies_file: str
     brands_file: str
     dataset_file: str
     max_companies_per_industry: int
     max_brands_per_company: int
-    country: str
+    country: str  # First COUNTRY entry ("" when unset)
+    countries: tuple[str, ...]  # All COUNTRY entries; several fan one run out over per-country partitions
     country_specific: bool
     level: int  # 1 = sections, 3 = groups
     isic_flattened_file: str
     log_file: str | None
+    max_concurrency: int  # Parallel in-flight API calls (1 = serial)
+    pipeline: bool  # Overlap companies and brands phases in full/resume runs
+    brands_per_call: int  # Companies per brands request (1 = one company per call)
+    journal_fsync_every: int  # Journal appends batched per fsync
+    cache_file: str | None  # SQLite response cache (None = disabled)
+    cache_max_entries: int  # 0 = unlimited
+    cache_max_age_days: float  # 0 = never expire
+    cache_bypass: bool  # Skip cache lookups (still refresh stored responses)
+    rate_limit_rpm: int  # Requests per minute budget (0 = learn from headers)
+    rate_limit_tpm: int  # Tokens per minute budget (0 = learn from headers)
+    max_retries: int  # Retries per call for 429 / 5xx / connection errors
+    backoff_base_seconds: float
+    backoff_max_seconds: float
+    hedge_percentile: float  # Hedge a call past this percentile of recent latencies (0 = off)
+    hedge_budget: float  # Max share of calls that may get a duplicate request
+    hedge_min_samples: int  # Latencies per schema needed before hedging starts
+    batch_client: str  # 'openai' or 'local' (offline stand-in)
+    batch_dir: str  # Batch request / response JSONL files
+    batch_poll_seconds: float
+    flatten_chunk_rows: int  # Rows buffered per CSV write in streaming flatten
+    dataset_formats: tuple[str, ...]  # Output formats: any of "csv", "parquet"
+    parquet_file: str  # Parquet dataset path (default: DATASET_FILE with .parquet suffix)
+    parquet_row_group_size: int  # Rows per Parquet row group
+    incremental_csv: bool  # Rewrite only changed section shards of the CSV (manifest-driven)
+    dedup_companies: bool  # Cluster near-duplicate company names before the brands phase
+    dedup_threshold: float  # Trigram Jaccard similarity needed to merge two names
+    aliases_file: str  # Persisted alias map (variant -> canonical company name)
+    validation_mode: str  # "off", "drop" (blank / drop invalid fields) or "repair" (re-request them first)
+    wikidata_mode: str  # "off", "ground" (known brands in prompts) or "answer" (skip the API call)
+    wikidata_file: str  # Wikidata brand/owner export CSV
+    wikidata_index_file: str  # Pickled lookup index built from wikidata_file
+    queue_file: str  # Shared SQLite work queue for worker mode
+    worker_id: str | None  # Worker name in the queue (default host:pid)
+    lease_seconds: float  # Lease length; renewed by heartbeats every third of it
+    queue_poll_seconds: float  # Idle wait while other workers hold the remaining leases
+    storage_backend: str  # "json" (snapshot + journal files) or "sqlite" (storage_file database)
+    storage_file: str  # SQLite database holding the companies / brands stores
+    storage_export_json: bool  # With sqlite storage, also write the JSON snapshots after each run
+    trace_file: str | None  # Chrome trace / Perfetto JSON timeline of the run (None = disabled)
+    profile_mode: str  # "off", "cprofile" (per-phase .pstats) or "sample" (per-phase collapsed stacks)
+    profile_dir: str  # Output directory for PROFILE_MODE files
+    profile_sample_ms: float  # Sampling interval for PROFILE_MODE=sample
+    run_report_file: str | None  # JSON run report (None = disabled)
+    prometheus_file: str | None  # Prometheus textfile (None = disabled)
 
 
 def load_env(env_path: str = "config/.env") -> None:
@@ -35,6 +82,8 @@ def load_env(env_path: str = "config/.env") -> None:
     Does nothing silently if the file is absent.
     """
     if os.path.exists(env_path):
+        from dotenv import load_dotenv
+
         load_dotenv(env_path)
 
 
@@ -46,14 +95,19 @@ def _as_bool(value: str | None) -> bool:
     return (value or "").strip().lower() in {"1", "true", "yes", "on"}
 
 
-def get_config() -> ChatGPTConfig:
-    """Assemble configuration from environment variables with validation."""
+def get_config(require_api_key: bool = True) -> ChatGPTConfig:
+    """Assemble configuration from environment variables with validation.
+
+    Offline callers (CSV regeneration, dry runs) pass ``require_api_key=False``;
+    ``api_key`` is then empty when OPENAI_API_KEY is unset.
+    """
     api_key = os.getenv("OPENAI_API_KEY", "").strip()
-    if not api_key:
+    if not api_key and require_api_key:
         raise ValueError("OPENAI_API_KEY not set in environment")
     model = os.getenv("GPT_MODEL", "").strip()
     if not model:
         raise ValueError("GPT_MODEL not set in environment")
+    base_url = os.getenv("OPENAI_BASE_URL", "").strip() or None
 
     def need(name: str) -> str:
         v = os.getenv(name, "").strip()
@@ -67,16 +121,65 @@ def get_config() -> ChatGPTConfig:
     dataset_file = need("DATASET_FILE")
     max_companies_per_industry = int(os.getenv("MAX_COMPANIES_PER_INDUSTRY", "0") or 0)
     max_brands_per_company = int(os.getenv("MAX_BRANDS_PER_COMPANY", "0") or 0)
-    country = os.getenv("COUNTRY", "").strip()
+    countries = tuple(dict.fromkeys(c.strip() for c in os.getenv("COUNTRY", "").split(",") if c.strip()))
+    country = countries[0] if countries else ""
     country_specific = _as_bool(os.getenv("COUNTRY_SPECIFIC"))
     level = int(os.getenv("STARTING_ISIC_LEVEL", "1") or 1)  # Default to level 1 (sections)
     isic_flattened_file = os.getenv("ISIC_FLATTENED_FILE", "data/isic/ISIC5_Exp_Notes_11Mar2024_flattened.csv").strip()
 
     log_file = os.getenv("LOG_FILE", "").strip() or None
+    max_concurrency = max(1, int(os.getenv("MAX_CONCURRENCY", "1") or 1))
+    pipeline = _as_bool(os.getenv("PIPELINE"))
+    brands_per_call = max(1, int(os.getenv("BRANDS_PER_CALL", "1") or 1))
+    journal_fsync_every = max(1, int(os.getenv("JOURNAL_FSYNC_EVERY", "50") or 50))
+    cache_file = os.getenv("CACHE_FILE", "").strip() or None
+    cache_max_entries = int(os.getenv("CACHE_MAX_ENTRIES", "100000") or 0)
+    cache_max_age_days = float(os.getenv("CACHE_MAX_AGE_DAYS", "30") or 0)
+    cache_bypass = _as_bool(os.getenv("CACHE_BYPASS"))
+    rate_limit_rpm = int(os.getenv("RATE_LIMIT_RPM", "0") or 0)
+    rate_limit_tpm = int(os.getenv("RATE_LIMIT_TPM", "0") or 0)
+    max_retries = int(os.getenv("MAX_RETRIES", "6") or 0)
+    backoff_base_seconds = float(os.getenv("BACKOFF_BASE_SECONDS", "1") or 1)
+    backoff_max_seconds = float(os.getenv("BACKOFF_MAX_SECONDS", "60") or 60)
+    hedge_percentile = float(os.getenv("HEDGE_PERCENTILE", "0") or 0)
+    hedge_budget = float(os.getenv("HEDGE_BUDGET", "0.05") or 0)
+    hedge_min_samples = max(1, int(os.getenv("HEDGE_MIN_SAMPLES", "20") or 20))
+    batch_client = os.getenv("BATCH_CLIENT", "openai").strip().lower() or "openai"
+    batch_dir = os.getenv("BATCH_DIR", "data/batch").strip() or "data/batch"
+    batch_poll_seconds = float(os.getenv("BATCH_POLL_SECONDS", "60") or 60)
+    flatten_chunk_rows = max(1, int(os.getenv("FLATTEN_CHUNK_ROWS", "10000") or 10000))
+    dataset_formats = tuple(f.strip().lower() for f in os.getenv("DATASET_FORMATS", "csv").split(",") if f.strip()) or ("csv",)
+    unknown_formats = set(dataset_formats) - {"csv", "parquet"}
+    if unknown_formats:
+        raise ValueError(f"Unsupported DATASET_FORMATS: {sorted(unknown_formats)}. Use csv and/or parquet.")
+    parquet_file = os.getenv("PARQUET_FILE", "").strip() or str(Path(dataset_file).with_suffix(".parquet"))
+    parquet_row_group_size = max(1, int(os.getenv("PARQUET_ROW_GROUP_SIZE", "100000") or 100000))
+    incremental_csv = _as_bool(os.getenv("INCREMENTAL_CSV", "false"))
+    dedup_companies = _as_bool(os.getenv("DEDUP_COMPANIES", "false"))
+    dedup_threshold = float(os.getenv("DEDUP_THRESHOLD", "0.8") or 0.8)
+    aliases_file = os.getenv("ALIASES_FILE", "data/aliases.json").strip() or "data/aliases.json"
+    validation_mode = os.getenv("VALIDATION_MODE", "off").strip().lower() or "off"
+    wikidata_mode = os.getenv("WIKIDATA_MODE", "off").strip().lower() or "off"
+    wikidata_file = os.getenv("WIKIDATA_FILE", "data/wikidata/wiki_labels.csv").strip() or "data/wikidata/wiki_labels.csv"
+    wikidata_index_file = os.getenv("WIKIDATA_INDEX_FILE", "data/cache/wikidata_index.pickle").strip() or "data/cache/wikidata_index.pickle"
+    queue_file = os.getenv("QUEUE_FILE", "data/queue.sqlite3").strip() or "data/queue.sqlite3"
+    worker_id = os.getenv("WORKER_ID", "").strip() or None
+    lease_seconds = float(os.getenv("LEASE_SECONDS", "300") or 300)
+    queue_poll_seconds = float(os.getenv("QUEUE_POLL_SECONDS", "10") or 10)
+    storage_backend = os.getenv("STORAGE_BACKEND", "json").strip().lower() or "json"
+    storage_file = os.getenv("STORAGE_FILE", "data/store.sqlite3").strip() or "data/store.sqlite3"
+    storage_export_json = _as_bool(os.getenv("STORAGE_EXPORT_JSON", "false"))
+    trace_file = os.getenv("TRACE_FILE", "").strip() or None
+    profile_mode = os.getenv("PROFILE_MODE", "off").strip().lower() or "off"
+    profile_dir = os.getenv("PROFILE_DIR", "logs/profile").strip() or "logs/profile"
+    profile_sample_ms = float(os.getenv("PROFILE_SAMPLE_MS", "5") or 5)
+    run_report_file = os.getenv("RUN_REPORT_FILE", "").strip() or None
+    prometheus_file = os.getenv("PROMETHEUS_FILE", "").strip() or None
 
     return ChatGPTConfig(
         api_key=api_key,
         model=model,
+        base_url=base_url,
         industries_file=industries_file,
         companies_file=companies_file,
         brands_file=brands_file,
@@ -84,8 +187,82 @@ def get_config() -> ChatGPTConfig:
         max_companies_per_industry=max_companies_per_industry,
         max_brands_per_company=max_brands_per_company,
         country=country,
+        countries=countries,
         country_specific=country_specific,
         level=level,
         isic_flattened_file=isic_flattened_file,
         log_file=log_file,
+        max_concurrency=max_concurrency,
+        pipeline=pipeline,
+        brands_per_call=brands_per_call,
+        journal_fsync_every=journal_fsync_every,
+        cache_file=cache_file,
+        cache_max_entries=cache_max_entries,
+        cache_max_age_days=cache_max_age_days,
+        cache_bypass=cache_bypass,
+        rate_limit_rpm=rate_limit_rpm,
+        rate_limit_tpm=rate_limit_tpm,
+        max_retries=max_retries,
+        backoff_base_seconds=backoff_base_seconds,
+        backoff_max_seconds=backoff_max_seconds,
+        hedge_percentile=hedge_percentile,
+        hedge_budget=hedge_budget,
+        hedge_min_samples=hedge_min_samples,
+        batch_client=batch_client,
+        batch_dir=batch_dir,
+        batch_poll_seconds=batch_poll_seconds,
+        flatten_chunk_rows=flatten_chunk_rows,
+        dataset_formats=dataset_formats,
+        parquet_file=parquet_file,
+        parquet_row_group_size=parquet_row_group_size,
+        incremental_csv=incremental_csv,
+        dedup_companies=dedup_companies,
+        dedup_threshold=dedup_threshold,
+        aliases_file=aliases_file,
+        validation_mode=validation_mode,
+        wikidata_mode=wikidata_mode,
+        wikidata_file=wikidata_file,
+        wikidata_index_file=wikidata_index_file,
+        queue_file=queue_file,
+        worker_id=worker_id,
+        lease_seconds=lease_seconds,
+        queue_poll_seconds=queue_poll_seconds,
+        storage_backend=storage_backend,
+        storage_file=storage_file,
+        storage_export_json=storage_export_json,
+        trace_file=trace_file,
+        profile_mode=profile_mode,
+        profile_dir=profile_dir,
+        profile_sample_ms=profile_sample_ms,
+        run_report_file=run_report_file,
+        prometheus_file=prometheus_file,
+    )
+
+
+def country_slug(country: str) -> str:
+    """Return the directory name for a country partition ("Saudi Arabia" -> "saudi_arabia")."""
+    return re.sub(r"[^a-z0-9]+", "_", country.lower()).strip("_") or "global"
+
+
+def country_config(cfg: ChatGPTConfig, country: str) -> ChatGPTConfig:
+    """Return cfg narrowed to one COUNTRY entry, with its outputs in a per-country subdirectory.
+
+    ``data/companies.json`` becomes ``data/<slug>/companies.json`` (likewise brands,
+    dataset, Parquet and the worker queue). Inputs, the response cache, the SQLite
+    store, the alias map and reports stay shared.
+    """
+
+    def partition(path: str) -> str:
+        p = Path(path)
+        return str(p.parent / country_slug(country) / p.name)
+
+    return replace(
+        cfg,
+        country=country,
+        countries=(country,),
+        companies_file=partition(cfg.companies_file),
+        brands_file=partition(cfg.brands_file),
+        dataset_file=partition(cfg.dataset_file),
+        parquet_file=partition(cfg.parquet_file),
+        queue_file=partition(cfg.queue_file),
     )
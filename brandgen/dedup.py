@@ -0,0 +1,195 @@
+"""Company-name deduplication.
+
+Responsibility: Normalize company names (case, accents, punctuation, legal suffixes),
+cluster near-duplicates with a MinHash-LSH blocking index over character trigrams
+(confirmed token by token), and keep an alias map (variant -> canonical name) so one
+brands request serves a whole cluster while every variant still joins to its brands.
+Names are not transliterated: Arabic-script and Latin spellings stay separate.
+"""
+
+from __future__ import annotations
+import random
+import re
+import unicodedata
+import zlib
+from collections import Counter
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Dict, List, Set, Tuple
+
+
+LEGAL_SUFFIXES = frozenset(
+    {
+        "ag", "bv", "co", "company", "corp", "corporation", "gmbh", "inc", "incorporated",
+        "limited", "llc", "ltd", "nv", "plc", "pjsc", "pte", "pty", "sa", "sae", "sal",
+        "sarl", "spa", "srl", "wll",
+    }
+)
+FILLER_TOKENS = LEGAL_SUFFIXES | {"a", "al", "an", "and", "el", "for", "in", "of", "the"}
+TOKEN_RATIO = 0.85  # SequenceMatcher ratio for two spellings of one token ("farm" / "farms", not "west" / "east")
+SHINGLE_SIZE = 3
+NUM_PERM = 32
+BANDS = 8  # 4 rows per band: pairs at Jaccard 0.8 become candidates ~98% of the time
+
+_JOINERS = re.compile(r"[.'’]")  # "S.A.E." -> "SAE", "Mo'men" -> "Momen"
+_NON_WORD = re.compile(r"[^\w]+")
+_DIGITS = re.compile(r"\d+")
+
+
+def normalize_name(name: str) -> str:
+    """Return a comparison key: accent-folded, casefolded, punctuation-free, legal suffixes removed."""
+    text = unicodedata.normalize("NFKD", name)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = _JOINERS.sub("", text.casefold().replace("&", " and "))
+    tokens = _NON_WORD.sub(" ", text).split()
+    if tokens and tokens[0] == "the":
+        tokens = tokens[1:]
+    while len(tokens) > 1 and tokens[-1] in LEGAL_SUFFIXES:
+        tokens.pop()
+    return " ".join(tokens)
+
+
+def shingles(norm: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """Character n-grams of a normalized name (padded so short names still shingle)."""
+    padded = f" {norm} "
+    return {padded[i : i + size] for i in range(max(1, len(padded) - size + 1))}
+
+
+@lru_cache(maxsize=None)
+def _masks():
+    """XOR masks (cheap 32-bit permutations), built with numpy on the first MinHash.
+
+    numpy is imported here rather than at module level: normalize_name (used by the
+    Wikidata index) and offline runs never need it.
+    """
+    import numpy as np
+
+    rng = random.Random(1)
+    return np.array([rng.getrandbits(32) for _ in range(NUM_PERM)], dtype=np.uint32)
+
+
+def minhash(items: Set[str]) -> List[int]:
+    """MinHash signature of a shingle set under NUM_PERM XOR-mask permutations of crc32."""
+    import numpy as np
+
+    hashes = np.fromiter((zlib.crc32(item.encode("utf-8")) for item in items), dtype=np.uint32, count=len(items))
+    return (hashes[:, None] ^ _masks()).min(axis=0).tolist()
+
+
+def tokens_match(a: str, b: str) -> bool:
+    """True when two normalized names differ only in filler tokens or in the spelling of a token.
+
+    Trigram similarity alone merges distinct companies sharing a long common part
+    ("West Delta Electricity ..." / "East Delta Electricity ..."), so every token left
+    after removing shared and filler tokens (articles, prepositions, legal suffixes)
+    must pair with a token of the other name at ``TOKEN_RATIO`` or above.
+    """
+    left = Counter(t for t in a.split() if t not in FILLER_TOKENS)
+    right = Counter(t for t in b.split() if t not in FILLER_TOKENS)
+    unmatched, others = list((left - right).elements()), list((right - left).elements())
+    if len(unmatched) != len(others):
+        return False
+    for token in unmatched:
+        match = next((o for o in others if SequenceMatcher(None, token, o).ratio() >= TOKEN_RATIO), None)
+        if match is None:
+            return False
+        others.remove(match)
+    return True
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    """Jaccard similarity of two sets."""
+    if not a and not b:
+        return 1.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+class NameIndex:
+    """Incremental near-duplicate index mapping every seen name to its cluster's canonical name.
+
+    The first name added to a cluster becomes its canonical name. Exact normalized
+    matches are resolved through a dict; other names are compared only against the
+    LSH bucket candidates (cluster founders sharing a band), so clustering n names
+    costs roughly O(n) comparisons. A candidate above the trigram threshold must also
+    pass ``tokens_match``. Names with different numbers (``Farm 1`` / ``Farm 2``) are
+    never merged.
+    """
+
+    def __init__(self, threshold: float = 0.8) -> None:
+        self.threshold = threshold
+        self._canonical: Dict[str, str] = {}
+        self._by_norm: Dict[str, str] = {}
+        self._shingles: Dict[str, Set[str]] = {}
+        self._buckets: Dict[Tuple[int, Tuple[str, ...], Tuple[int, ...]], List[str]] = {}
+
+    def add(self, name: str) -> str:
+        """Register name and return the canonical name of its cluster."""
+        if name in self._canonical:
+            return self._canonical[name]
+        norm = normalize_name(name) or name.casefold()
+        canonical = self._by_norm.get(norm)
+        if canonical is None:
+            match = self._nearest(norm)
+            canonical = self._by_norm[match] if match else name
+            self._by_norm[norm] = canonical
+        self._canonical[name] = canonical
+        return canonical
+
+    def _nearest(self, norm: str) -> str | None:
+        """Index norm and return the most similar indexed normalized name above threshold."""
+        items = shingles(norm)
+        signature = minhash(items)
+        rows = NUM_PERM // BANDS
+        digits = tuple(_DIGITS.findall(norm))  # part of the block key: never merge different numbers
+        keys = [(band, digits, tuple(signature[band * rows : (band + 1) * rows])) for band in range(BANDS)]
+        best, best_score = None, self.threshold
+        for candidate in {c for key in keys for c in self._buckets.get(key, ())}:
+            other = self._shingles[candidate]
+            if min(len(items), len(other)) < best_score * max(len(items), len(other)):
+                continue  # sizes alone rule out reaching the threshold
+            score = jaccard(items, other)
+            if score >= best_score and tokens_match(norm, candidate):
+                best, best_score = candidate, score
+        if best is None:  # only cluster founders are indexed, keeping buckets small
+            self._shingles[norm] = items
+            for key in keys:
+                self._buckets.setdefault(key, []).append(norm)
+        return best
+
+    def seed(self, aliases: Dict[str, str]) -> None:
+        """Restore a persisted alias map so canonical names stay stable across runs."""
+        for variant, canonical in aliases.items():
+            self.add(canonical)
+            self._canonical[variant] = self._canonical[canonical]
+
+    def adopt(self, name: str, canonical: str) -> None:
+        """Record a name clustered elsewhere (another worker) under that canonical name."""
+        self.add(name)
+        self._canonical[name] = canonical
+
+    def aliases(self) -> Dict[str, str]:
+        """Return variant -> canonical for every name that is not its own canonical."""
+        return {name: canonical for name, canonical in self._canonical.items() if name != canonical}
+
+    def stats(self) -> Dict[str, int]:
+        """Names seen, clusters formed and variants folded."""
+        clusters = len(set(self._canonical.values()))
+        return {"names": len(self._canonical), "clusters": clusters, "aliases": len(self._canonical) - clusters}
+
+
+_INDEX: NameIndex | None = None
+
+
+def configure_dedup(threshold: float, aliases: Dict[str, str] | None = None) -> NameIndex:
+    """Create the process-wide name index, seeded with a persisted alias map."""
+    global _INDEX
+    _INDEX = NameIndex(threshold)
+    if aliases:
+        _INDEX.seed(aliases)
+    return _INDEX
+
+
+def get_name_index() -> NameIndex | None:
+    """Return the configured name index, if dedup is enabled."""
+    return _INDEX
@@ -1,81 +1,389 @@
-"""Flatten nested data structures to CSV."""
+"""Flatten nested data structures to CSV and Parquet.
+
+Rows come from one iterator (``iter_dataset_rows``) shared by the in-memory path
+(``flatten_to_csv``) and the streaming path (``flatten_files_to_csv``), which reads
+companies / brands stores incrementally and looks brands up in an on-disk index
+(or, with the SQLite storage backend, consumes its joined row cursor directly).
+``write_dataset`` fans each chunk of rows out to the CSV and/or Parquet writer.
+
+Incremental CSV (``update_csv_shards``) keeps one shard file per section / group plus
+a manifest of content hashes; only shards whose companies or brands changed are
+rewritten, and the dataset is re-assembled from the first changed shard onwards.
+"""
 
 from __future__ import annotations
 from pathlib import Path
 import csv
-from typing import Dict, List
+import hashlib
+import io
+import json
+import logging
+import sqlite3
+import shutil
+import tempfile
+from contextlib import ExitStack
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+from .persist import StoreIndex, load_json, save_json
+from .profiling import span
+from .storage import get_storage
+from .telemetry import get_telemetry
+
+
+def _pyarrow():
+    """Import pyarrow on first use: optional, and slow enough to keep out of CSV-only runs."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:  # Optional: only needed when DATASET_FORMATS includes parquet
+        raise ImportError("pyarrow is required for Parquet output (pip install pyarrow)") from None
+    return pa, pq
+
+
+FIELDNAMES = [
+    "industry_section",
+    "company_name",
+    "headquarters_country",
+    "main_industry_activities",
+    "brand_name",
+    "brand_type",
+    "invoice_example",
+    "gpc_segment",
+    "gpc_family",
+    "gpc_class",
+    "gpc_brick",
+]
+# Columns repeated on every brand row of a company (or drawn from a small vocabulary).
+DICTIONARY_COLUMNS = [
+    "industry_section",
+    "company_name",
+    "headquarters_country",
+    "main_industry_activities",
+    "brand_type",
+    "gpc_segment",
+    "gpc_family",
+    "gpc_class",
+    "gpc_brick",
+]
+CHUNK_ROWS = 10000
+ROW_GROUP_ROWS = 100000
+
+logger = logging.getLogger(__name__)
+
+
+def iter_dataset_rows(
+    sections_companies: Iterable[Tuple[str, List[dict]]],
+    brands_lookup: Callable[[str], List[dict]],
+) -> Iterator[Dict[str, str]]:
+    """Yield one row per (section, company, brand) joining companies with their brands.
+
+    If a company has no brands an empty brand row is yielded.
+    """
+    for section, companies in sections_companies:
+        for company in companies:
+            if not isinstance(company, dict):
+                continue
+            company_brands = [b for b in brands_lookup(company.get("company_name", "")) if isinstance(b, dict)]
+            for brand in company_brands or [None]:
+                yield dataset_row(section, company, brand)
+
+
+def dataset_row(section: str, company: dict, brand: dict | None) -> Dict[str, str]:
+    """Build one dataset row; brand None gives the empty brand row of a company without brands."""
+    row = {
+        "industry_section": section,
+        "company_name": company.get("company_name", ""),
+        "headquarters_country": company.get("headquarters_country", ""),
+        "main_industry_activities": company.get("main_industry_activities", ""),
+    }
+    if brand is None:
+        return {**row, **{f: "" for f in FIELDNAMES[4:]}}
+    return {
+        **row,
+        "brand_name": brand.get("name", ""),
+        "brand_type": brand.get("type", ""),
+        "invoice_example": brand.get("invoice_example", ""),
+        "gpc_segment": brand.get("gpc_segment", ""),
+        "gpc_family": brand.get("gpc_family", ""),
+        "gpc_class": brand.get("gpc_class", ""),
+        "gpc_brick": brand.get("gpc_brick", ""),
+    }
+
+
+class ParquetWriter:
+    """Append row chunks to a Parquet file in fixed-size row groups (atomic on close).
+
+    Repeated string columns are dictionary-encoded, both in the Arrow schema (so
+    pandas reads them as categoricals) and in the Parquet pages.
+    """
+
+    def __init__(self, path: str, row_group_size: int = ROW_GROUP_ROWS) -> None:
+        pa, pq = _pyarrow()
+        self.pa = pa
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        self.row_group_size = row_group_size
+        self.schema = pa.schema(
+            [(f, pa.dictionary(pa.int32(), pa.string()) if f in DICTIONARY_COLUMNS else pa.string()) for f in FIELDNAMES]
+        )
+        self.writer = pq.ParquetWriter(str(self.tmp), self.schema, compression="zstd", use_dictionary=DICTIONARY_COLUMNS)
+        self.pending: List[Dict[str, str]] = []
+
+    def write(self, rows: List[Dict[str, str]]) -> None:
+        """Buffer rows and flush every complete row group."""
+        self.pending.extend(rows)
+        while len(self.pending) >= self.row_group_size:
+            self._flush(self.pending[: self.row_group_size])
+            del self.pending[: self.row_group_size]
+
+    def _flush(self, rows: List[Dict[str, str]]) -> None:
+        columns = {f: [row[f] for row in rows] for f in FIELDNAMES}
+        self.writer.write_table(self.pa.table(columns, schema=self.schema), row_group_size=self.row_group_size)
+
+    def close(self) -> None:
+        """Write the final partial row group and move the file into place."""
+        if self.pending:
+            self._flush(self.pending)
+            self.pending = []
+        self.writer.close()
+        self.tmp.replace(self.path)
+
+    def __enter__(self) -> "ParquetWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+            return
+        self.writer.close()
+        self.tmp.unlink(missing_ok=True)
+
+
+def write_dataset(
+    rows: Iterable[Dict[str, str]],
+    csv_path: str | None,
+    parquet_path: str | None = None,
+    chunk_rows: int = CHUNK_ROWS,
+    row_group_size: int = ROW_GROUP_ROWS,
+) -> int:
+    """Write rows to CSV and/or Parquet in buffered chunks; return the number of rows written."""
+    logger.info(f"Writing output to {', '.join(p for p in (csv_path, parquet_path) if p)}...")
+    written = 0
+    rows = iter(rows)
+    with get_telemetry().timed("flatten"), ExitStack() as stack:
+        writer = None
+        if csv_path:
+            Path(csv_path).parent.mkdir(parents=True, exist_ok=True)
+            csv_manifest_path(csv_path).unlink(missing_ok=True)  # a full rewrite invalidates incremental shards
+            fh = stack.enter_context(Path(csv_path).open("w", encoding="utf-8", newline="", buffering=1 << 20))
+            writer = csv.DictWriter(fh, fieldnames=FIELDNAMES)
+            writer.writeheader()
+        parquet = stack.enter_context(ParquetWriter(parquet_path, row_group_size)) if parquet_path else None
+        while True:
+            with span("flatten_chunk", "flatten"):  # building the rows (joins, lookups) + writing them
+                chunk = list(islice(rows, chunk_rows))
+                if writer:
+                    writer.writerows(chunk)
+                if parquet:
+                    parquet.write(chunk)
+            if not chunk:
+                break
+            written += len(chunk)
+    return written
+
+
+def csv_manifest_path(csv_path: str) -> Path:
+    """Return the incremental-CSV manifest path next to the dataset (``dataset.manifest.json``)."""
+    return Path(csv_path).with_suffix(".manifest.json")
+
+
+def csv_shard_dir(csv_path: str) -> Path:
+    """Return the directory holding per-section CSV shards (``dataset.shards``)."""
+    return Path(csv_path).with_suffix(".shards")
+
+
+def _csv_header() -> bytes:
+    buf = io.StringIO(newline="")
+    csv.DictWriter(buf, fieldnames=FIELDNAMES).writeheader()
+    return buf.getvalue().encode("utf-8")
+
+
+def _section_hash(section: str, companies: List[dict], brands_text: Callable[[str], str]) -> Tuple[str, List[List[str]]]:
+    """Hash a section's content: one digest per company (record + brand list) rolled into one."""
+    company_hashes = []
+    digest = hashlib.sha1(section.encode("utf-8"))
+    for company in companies:
+        if not isinstance(company, dict):
+            continue
+        name = company.get("company_name", "")
+        h = hashlib.sha1(json.dumps(company, ensure_ascii=False).encode("utf-8"))
+        h.update(brands_text(name).encode("utf-8"))
+        company_hashes.append([name, h.hexdigest()])
+        digest.update(h.digest())
+    return digest.hexdigest(), company_hashes
+
+
+def _load_manifest(csv_path: str, header: bytes) -> List[dict]:
+    """Return the previous shard entries, or [] when the dataset no longer matches them."""
+    manifest_path, dataset = csv_manifest_path(csv_path), Path(csv_path)
+    if not manifest_path.exists() or not dataset.exists():
+        return []
+    manifest = load_json(str(manifest_path))
+    shards = manifest.get("shards", [])
+    if manifest.get("fieldnames") != FIELDNAMES or dataset.stat().st_size != len(header) + sum(s["bytes"] for s in shards):
+        logger.info(f"{manifest_path} does not match {dataset}; re-assembling the whole dataset")
+        return []
+    return shards
+
+
+def update_csv_shards(
+    sections_companies: Iterable[Tuple[str, List[dict]]],
+    brands_lookup: Callable[[str], List[dict]],
+    brands_text: Callable[[str], str],
+    csv_path: str,
+) -> int:
+    """Bring the CSV up to date by rewriting only the shards whose content hash changed.
+
+    ``brands_text`` returns a company's brand list as JSON text (hashed, not parsed).
+    Shard files are content-addressed, so an interrupted update never leaves a shard
+    that disagrees with its manifest entry. The dataset file is truncated at the first
+    changed shard and the remaining shards are appended by byte copy. Returns the
+    number of data rows in the dataset.
+    """
+    header = _csv_header()
+    shard_dir = csv_shard_dir(csv_path)
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    previous = _load_manifest(csv_path, header)
+    reusable = {s["file"]: s for s in previous}
+    shards: List[dict] = []
+    rewritten = 0
+    with get_telemetry().timed("flatten"):
+        for section, companies in sections_companies:
+            digest, company_hashes = _section_hash(section, companies, brands_text)
+            name = f"{hashlib.sha1(section.encode('utf-8')).hexdigest()[:16]}-{digest[:16]}.csv"
+            entry = reusable.get(name) if (shard_dir / name).exists() else None
+            if entry is None:
+                with span("csv_shard", "flatten", section=section), (shard_dir / name).open("w", encoding="utf-8", newline="") as fh:
+                    writer = csv.DictWriter(fh, fieldnames=FIELDNAMES)
+                    rows = 0
+                    for row in iter_dataset_rows([(section, companies)], brands_lookup):
+                        writer.writerow(row)
+                        rows += 1
+                entry = {"section": section, "file": name, "rows": rows, "bytes": (shard_dir / name).stat().st_size}
+                rewritten += 1
+            shards.append({**entry, "companies": company_hashes})
+        first_changed = next(
+            (i for i, (old, new) in enumerate(zip(previous, shards)) if old["file"] != new["file"]),
+            min(len(previous), len(shards)),
+        )
+        dataset = Path(csv_path)
+        dataset.parent.mkdir(parents=True, exist_ok=True)
+        if not previous:
+            first_changed = 0
+            dataset.write_bytes(header)
+        offset = len(header) + sum(s["bytes"] for s in shards[:first_changed])
+        with dataset.open("r+b") as out:
+            out.truncate(offset)
+            out.seek(offset)
+            for entry in shards[first_changed:]:
+                with (shard_dir / entry["file"]).open("rb") as src:
+                    shutil.copyfileobj(src, out, 1 << 20)
+        save_json(str(csv_manifest_path(csv_path)), {"fieldnames": FIELDNAMES, "shards": shards})
+        live = {s["file"] for s in shards}
+        for stale in shard_dir.glob("*.csv"):
+            if stale.name not in live:
+                stale.unlink()
+    logger.info(
+        f"Incremental CSV: {rewritten}/{len(shards)} shards rewritten, "
+        f"{len(shards) - first_changed} re-appended from byte {offset}"
+    )
+    return sum(s["rows"] for s in shards)
 
 
 def flatten_to_csv(
     sections_companies: Dict[str, List[dict]],
     brands: Dict[str, List[dict]],
-    csv_path: str,
-) -> None:
-    """Emit a tabular CSV joining companies with their brands.
+    csv_path: str | None,
+    parquet_path: str | None = None,
+    chunk_rows: int = CHUNK_ROWS,
+    row_group_size: int = ROW_GROUP_ROWS,
+    incremental: bool = False,
+    aliases: Dict[str, str] | None = None,
+) -> int:
+    """Emit a tabular CSV (and/or Parquet) joining in-memory companies with their brands.
+
+    If a company has no brands an empty brand row is written. With ``incremental`` the
+    CSV is maintained through ``update_csv_shards`` and Parquet (if any) is rewritten.
+    ``aliases`` maps deduplicated name variants to the canonical name holding their brands.
+    """
+    aliases = aliases or {}
+
+    def lookup(name: str) -> List[dict]:
+        return brands.get(aliases.get(name, name), [])
+
+    if incremental and csv_path:
+        rows = update_csv_shards(
+            sections_companies.items(), lookup, lambda name: json.dumps(lookup(name), ensure_ascii=False), csv_path
+        )
+        if parquet_path:
+            write_dataset(iter_dataset_rows(sections_companies.items(), lookup), None, parquet_path, chunk_rows, row_group_size)
+        return rows
+    return write_dataset(iter_dataset_rows(sections_companies.items(), lookup), csv_path, parquet_path, chunk_rows, row_group_size)
 
-    If a company has no brands an empty brand row is written.
+
+def flatten_files_to_csv(
+    companies_path: str,
+    brands_path: str,
+    csv_path: str | None,
+    parquet_path: str | None = None,
+    chunk_rows: int = CHUNK_ROWS,
+    row_group_size: int = ROW_GROUP_ROWS,
+    incremental: bool = False,
+    aliases: Dict[str, str] | None = None,
+) -> int:
+    """Stream companies / brands stores (snapshot + journal) to CSV / Parquet with bounded memory.
+
+    Both stores are loaded into a temporary on-disk SQLite index, so peak memory stays
+    roughly constant regardless of dataset size. With the SQLite storage backend the
+    stores are read in place instead. Returns the number of rows written.
     """
-    import logging
-    logger = logging.getLogger(__name__)
-    logger.info(f"Writing output to {csv_path}...")
-    
-    fieldnames = [
-        "industry_section",
-        "company_name",
-        "headquarters_country",
-        "main_industry_activities",
-        "brand_name",
-        "brand_type",
-        "invoice_example",
-        "gpc_segment",
-        "gpc_family",
-        "gpc_class",
-        "gpc_brick",
-    ]
-    Path(csv_path).parent.mkdir(parents=True, exist_ok=True)
-    with Path(csv_path).open("w", encoding="utf-8", newline="") as fh:
-        writer = csv.DictWriter(fh, fieldnames=fieldnames)
-        writer.writeheader()
-        for section, companies in sections_companies.items():
-            for company in companies:
-                if not isinstance(company, dict):
-                    continue
-                c_name = company.get("company_name", "")
-                c_country = company.get("headquarters_country", "")
-                c_activities = company.get("main_industry_activities", "")
-                company_brands = brands.get(c_name, [])
-                if not company_brands:
-                    writer.writerow(
-                        {
-                            "industry_section": section,
-                            "company_name": c_name,
-                            "headquarters_country": c_country,
-                            "main_industry_activities": c_activities,
-                            "brand_name": "",
-                            "brand_type": "",
-                            "invoice_example": "",
-                            "gpc_segment": "",
-                            "gpc_family": "",
-                            "gpc_class": "",
-                            "gpc_brick": "",
-                        }
-                    )
-                    continue
-                for b in company_brands:
-                    if not isinstance(b, dict):
-                        continue
-                    writer.writerow(
-                        {
-                            "industry_section": section,
-                            "company_name": c_name,
-                            "headquarters_country": c_country,
-                            "main_industry_activities": c_activities,
-                            "brand_name": b.get("name", ""),
-                            "brand_type": b.get("type", ""),
-                            "invoice_example": b.get("invoice_example", ""),
-                            "gpc_segment": b.get("gpc_segment", ""),
-                            "gpc_family": b.get("gpc_family", ""),
-                            "gpc_class": b.get("gpc_class", ""),
-                            "gpc_brick": b.get("gpc_brick", ""),
-                        }
-                    )
+    storage = get_storage()
+    if storage is not None:
+        aliases = aliases or {}
+
+        def stored_brands(name: str) -> List[dict]:
+            return storage.get(brands_path, aliases.get(name, name))
+
+        if incremental and csv_path:
+            rows = update_csv_shards(
+                storage.items(companies_path),
+                stored_brands,
+                lambda name: storage.text(brands_path, aliases.get(name, name)),
+                csv_path,
+            )
+            if parquet_path:
+                joined = (dataset_row(*row) for row in storage.iter_joined(companies_path, brands_path, aliases))
+                write_dataset(joined, None, parquet_path, chunk_rows, row_group_size)
+            return rows
+        joined = (dataset_row(*row) for row in storage.iter_joined(companies_path, brands_path, aliases))
+        return write_dataset(joined, csv_path, parquet_path, chunk_rows, row_group_size)
+    with tempfile.TemporaryDirectory(prefix="brandgen-flatten-") as tmp:
+        db = sqlite3.connect(str(Path(tmp) / "index.sqlite3"))
+        try:
+            with get_telemetry().timed("flatten_index"), span("flatten_index", "flatten"):
+                companies = StoreIndex(db, "companies", companies_path)
+                brands = StoreIndex(db, "brands", brands_path)
+            aliases = aliases or {}
+
+            def lookup(name: str) -> List[dict]:
+                return brands.get(aliases.get(name, name))
+
+            if incremental and csv_path:
+                rows = update_csv_shards(companies.items(), lookup, lambda name: brands.text(aliases.get(name, name)), csv_path)
+                if parquet_path:
+                    write_dataset(iter_dataset_rows(companies.items(), lookup), None, parquet_path, chunk_rows, row_group_size)
+                return rows
+            return write_dataset(iter_dataset_rows(companies.items(), lookup), csv_path, parquet_path, chunk_rows, row_group_size)
+        finally:
+            db.close()
@@ -0,0 +1,178 @@
+"""Hedged requests.
+
+Responsibility: Cut tail latency of slow API calls. Each call key (response
+schema) keeps a window of recent latencies; once a call runs past the
+configured percentile of that window, one duplicate is launched and the first
+successful response wins. The other request cannot be aborted mid-flight with
+the sync client, so it is abandoned: it finishes on its own daemon thread and
+its result is only used for accounting (spend, latency saved). Duplicates are
+capped at a budget fraction of all calls.
+"""
+
+from __future__ import annotations
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable, Deque, Dict, Tuple, TypeVar
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+def _spawn(fn: Callable[[], T], name: str) -> Future:
+    """Run fn on a new daemon thread (abandoned calls never block interpreter exit)."""
+    future: Future = Future()
+
+    def run() -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn())
+        except BaseException as exc:
+            future.set_exception(exc)
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+    return future
+
+
+class Hedger:
+    """Percentile-deadline hedging policy with a budget on duplicate requests.
+
+    ``percentile`` (e.g. 0.95) sets the deadline from the last ``window`` latencies of
+    the same key once ``min_samples`` are known; ``budget`` is the largest share of
+    calls that may be hedged (0.05 = at most one duplicate per 20 calls).
+    """
+
+    def __init__(self, percentile: float = 0.95, budget: float = 0.05, min_samples: int = 20, window: int = 200) -> None:
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = max(1, min_samples)
+        self.window = window
+        self.calls = 0
+        self.hedges = 0
+        self.wins = 0
+        self.saved_seconds = 0.0
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, latency: float) -> None:
+        """Add one completed call latency to the key's window."""
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=self.window)).append(latency)
+
+    def deadline(self, key: str) -> float | None:
+        """Return the hedge deadline in seconds for key (None until min_samples latencies are known)."""
+        with self._lock:
+            window = sorted(self._latencies.get(key, ()))
+        if len(window) < self.min_samples:
+            return None
+        return window[min(len(window) - 1, int(self.percentile * len(window)))]
+
+    def _reserve(self) -> bool:
+        """Count one hedge if the budget allows it."""
+        with self._lock:
+            if self.hedges + 1 > self.budget * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+    def run(
+        self,
+        key: str,
+        fn: Callable[[], T],
+        before_hedge: Callable[[], None] | None = None,
+        on_loser: Callable[[T, float], None] | None = None,
+        on_skip: Callable[[], None] | None = None,
+    ) -> Tuple[T, str]:
+        """Call fn, hedging it past the key's deadline; return (result, outcome).
+
+        outcome is 'unhedged' (no duplicate was sent), 'primary' (the original answered
+        first) or 'hedge'. ``before_hedge`` runs just before the duplicate starts (e.g. a
+        rate-limit acquire); when the primary finishes during it, no duplicate is sent,
+        the hedge is not counted and ``on_skip`` runs (e.g. to return that budget).
+        ``on_loser(result, saved_seconds)`` runs when the abandoned request still
+        succeeds, with the latency the winner saved (0 when the primary won).
+        Only successful calls feed the latency window. When every attempt fails the
+        primary's exception is raised.
+        """
+        with self._lock:
+            self.calls += 1
+        start = time.perf_counter()
+        deadline = self.deadline(key)
+        primary = _spawn(fn, "hedge-primary") if deadline is not None else None
+        if primary is None or wait([primary], timeout=deadline).done or not self._reserve():
+            result = primary.result() if primary is not None else fn()
+            self.record(key, time.perf_counter() - start)  # successes only: fast failures would pull the deadline down
+            return result, "unhedged"
+
+        def record_primary(future: Future) -> None:
+            if future.exception() is None:
+                self.record(key, time.perf_counter() - start)
+
+        primary.add_done_callback(record_primary)
+        if before_hedge:
+            before_hedge()  # may wait on the rate limiter
+        if primary.done():  # finished meanwhile: a duplicate could not win
+            with self._lock:
+                self.hedges -= 1
+            if on_skip:
+                on_skip()
+            return primary.result(), "unhedged"
+        hedge = _spawn(fn, "hedge-duplicate")
+        logger.debug(f"Hedging {key} call after {deadline:.2f}s")
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((f for f in (primary, hedge) if f in done and f.exception() is None), None)
+            if winner is not None:
+                break
+        else:
+            raise primary.exception()
+        elapsed = time.perf_counter() - start
+        loser = hedge if winner is primary else primary
+        if winner is hedge:
+            with self._lock:
+                self.wins += 1
+
+        def settle(future: Future) -> None:
+            if future.exception() is not None:
+                return
+            saved = time.perf_counter() - start - elapsed if loser is primary else 0.0
+            with self._lock:
+                self.saved_seconds += saved
+            if on_loser:
+                on_loser(future.result(), saved)
+
+        loser.add_done_callback(settle)
+        return winner.result(), "hedge" if winner is hedge else "primary"
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hedge counters: calls, hedges, hedge wins, rate and latency saved."""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedges": self.hedges,
+                "wins": self.wins,
+                "hedge_rate": round(self.hedges / self.calls, 4) if self.calls else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
+
+
+_HEDGER: Hedger | None = None
+
+
+def configure_hedging(percentile: float, budget: float = 0.05, min_samples: int = 20) -> Hedger | None:
+    """Create the process-wide hedger (None when percentile is 0 = hedging off)."""
+    global _HEDGER
+    if not 0 <= percentile < 1:
+        raise ValueError(f"Unsupported HEDGE_PERCENTILE: {percentile}. Use 0 (off) or a value below 1, e.g. 0.95.")
+    _HEDGER = Hedger(percentile, budget, min_samples) if percentile else None
+    return _HEDGER
+
+
+def get_hedger() -> Hedger | None:
+    """Return the configured hedger, if any."""
+    return _HEDGER
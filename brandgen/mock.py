@@ -0,0 +1,79 @@
+"""Mock payloads.
+
+Responsibility: Produce schema-valid fake companies / brands for dry runs and
+offline stand-ins of the API (no network, deterministic output).
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import re
+from typing import Any, Dict, List
+
+
+_COMPANY_NAMED = re.compile(r"company named: (.*?)\. (?:Only|List)")
+
+
+def mock_companies(tag: str, scope: str, limit: int, country: str, count: int = 3) -> List[Dict[str, str]]:
+    """Return count (default 3) mock companies, or limit if smaller."""
+    mock_count = count if limit == 0 else min(count, limit)
+    return [
+        {
+            "company_name": f"company{n}_{tag}",
+            "headquarters_country": country or "Unknown",
+            "main_industry_activities": f"Activities for {scope}",
+        }
+        for n in range(1, mock_count + 1)
+    ]
+
+
+def mock_brands(name: str, limit: int, count: int = 2) -> List[Dict[str, str]]:
+    """Return count (default 2) mock brand items for one company, or limit if smaller."""
+    mock_count = count if limit == 0 else min(count, limit)
+    return [
+        {
+            "name": f"brand{b}_{name}",
+            "type": "mock",
+            "invoice_example": f"Invoice line for brand{b}_{name}",
+            "gpc_segment": "10000000",
+            "gpc_family": "10000100",
+            "gpc_class": "10000101",
+            "gpc_brick": "10000102",
+        }
+        for b in range(1, mock_count + 1)
+    ]
+
+
+_REPAIR_INDEX = re.compile(r"^(\d+): ", re.M)
+
+
+def mock_repairs(schema: Dict[str, Any], prompt: str) -> List[Dict[str, Any]]:
+    """Answer a repair request: valid values for the requested fields of every listed index."""
+    fields = [f for f in schema["properties"]["items"]["items"]["properties"] if f != "index"]
+    valid = {**mock_brands("repaired", 1)[0], "name": "repaired", "company_name": "repaired"}
+    return [
+        {"index": int(index), **{field: valid.get(field, "") for field in fields}}
+        for index in _REPAIR_INDEX.findall(prompt)
+    ]
+
+
+def mock_content(body: Dict[str, Any], companies: int = 3, brands: int = 2) -> str:
+    """Return JSON message content answering a chat-completions request body.
+
+    Companies are tagged with a hash of the prompt; brands reuse the company name(s)
+    found in the prompt or schema so results stay deterministic. ``companies`` /
+    ``brands`` set how many items each answer holds, capped by the schema's maxItems.
+    """
+    schema_name = body["response_format"]["json_schema"]["name"]
+    properties = body["response_format"]["json_schema"]["schema"]["properties"]
+    prompt = body["messages"][-1]["content"]
+    if schema_name.startswith("repair_"):
+        return json.dumps({"items": mock_repairs(body["response_format"]["json_schema"]["schema"], prompt)})
+    tag = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+    if schema_name == "companies_schema":
+        limit = properties["companies"].get("maxItems", 0)
+        return json.dumps({"companies": mock_companies(tag, f"prompt {tag}", limit, "", companies)})
+    if schema_name == "brands_multi_schema":
+        return json.dumps({name: mock_brands(name, spec.get("maxItems", 0), brands) for name, spec in properties.items()})
+    match = _COMPANY_NAMED.search(prompt)
+    return json.dumps({"items": mock_brands(match.group(1) if match else tag, properties["items"].get("maxItems", 0), brands)})
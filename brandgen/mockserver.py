@@ -0,0 +1,227 @@
+"""Mock OpenAI server.
+
+Responsibility: Serve ``POST /v1/chat/completions`` on localhost with schema-valid
+companies / brands payloads (``mock.mock_content``) so the real HTTP client, api.py,
+the rate limiter and persistence can be exercised and benchmarked offline
+(``OPENAI_BASE_URL=http://127.0.0.1:<port>/v1``). Latency follows a configurable
+distribution, 429 / 5xx responses and invalid items (truncated GPC codes, empty
+company names; to exercise validation repairs) are injected at fixed rates, and
+responses carry usage and x-ratelimit-* headers. Answers honour the schema's
+maxItems and the request's max_tokens (cut off with finish_reason "length").
+Every draw is seeded by (seed, prompt, attempt), so a run is reproducible
+regardless of request interleaving.
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Tuple
+from .mock import mock_content
+from .ratelimit import CHARS_PER_TOKEN
+
+
+LATENCY_DISTRIBUTIONS = ("constant", "uniform", "exponential", "lognormal")
+
+logger = logging.getLogger(__name__)
+
+
+class MockOpenAIServer:
+    """Threaded local chat-completions endpoint answering with mock payloads.
+
+    ``latency_ms`` is the constant delay, the mean of the uniform (0 .. 2x) and
+    exponential distributions, or the median of the lognormal one (shape
+    ``latency_sigma``). ``rate_429`` / ``rate_5xx`` are per-attempt failure
+    probabilities; ``invalid_rate`` is the per-item probability of a corrupted field
+    in companies / brands answers; ``companies`` / ``brands`` set the items per answer.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: str = "constant",
+        latency_ms: float = 0.0,
+        latency_sigma: float = 0.5,
+        rate_429: float = 0.0,
+        rate_5xx: float = 0.0,
+        retry_after: float = 0.0,
+        invalid_rate: float = 0.0,
+        companies: int = 3,
+        brands: int = 2,
+        rpm: int = 10000,
+        tpm: int = 10_000_000,
+        seed: int = 0,
+    ) -> None:
+        if latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unsupported latency distribution: {latency}. Use one of {', '.join(LATENCY_DISTRIBUTIONS)}.")
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.retry_after = retry_after
+        self.invalid_rate = invalid_rate
+        self.companies = companies
+        self.brands = brands
+        self.rpm = rpm
+        self.tpm = tpm
+        self.seed = seed
+        self.counts = {"requests": 0, "ok": 0, "429": 0, "5xx": 0, "invalid_items": 0}
+        self._attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        """Base URL to pass as ``OPENAI_BASE_URL``."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _delay(self, rng: random.Random) -> float:
+        """Draw one response latency in seconds."""
+        mean = self.latency_ms / 1000
+        if mean <= 0:
+            return 0.0
+        if self.latency == "uniform":
+            return rng.uniform(0, 2 * mean)
+        if self.latency == "exponential":
+            return rng.expovariate(1 / mean)
+        if self.latency == "lognormal":
+            return mean * rng.lognormvariate(0, self.latency_sigma)
+        return mean
+
+    def respond(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, str], Dict[str, Any]]:
+        """Return (status, headers, JSON body) for one chat-completions request (after its latency)."""
+        prompt = body["messages"][-1]["content"]
+        key = hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+        with self._lock:
+            attempt = self._attempts[key] = self._attempts.get(key, 0) + 1
+            self.counts["requests"] += 1
+        rng = random.Random(f"{self.seed}:{key}:{attempt}")
+        time.sleep(self._delay(rng))
+        headers = {
+            "x-ratelimit-limit-requests": str(self.rpm),
+            "x-ratelimit-remaining-requests": str(self.rpm),
+            "x-ratelimit-limit-tokens": str(self.tpm),
+            "x-ratelimit-remaining-tokens": str(self.tpm),
+        }
+        roll = rng.random()
+        if roll < self.rate_429 + self.rate_5xx:
+            status, kind = (429, "429") if roll < self.rate_429 else (rng.choice((500, 502, 503)), "5xx")
+            with self._lock:
+                self.counts[kind] += 1
+            if status == 429:
+                headers["retry-after"] = f"{self.retry_after:g}"
+            error = {"message": f"mock {status}", "type": "rate_limit_exceeded" if status == 429 else "server_error"}
+            return status, headers, {"error": {**error, "param": None, "code": None}}
+        content = mock_content(body, self.companies, self.brands)
+        if self.invalid_rate and not body["response_format"]["json_schema"]["name"].startswith("repair_"):
+            content = self._corrupt(content, rng)
+        prompt_tokens = max(1, sum(len(m.get("content", "")) for m in body["messages"]) // CHARS_PER_TOKEN)
+        completion_tokens = max(1, len(content) // CHARS_PER_TOKEN)
+        finish_reason = "stop"
+        if body.get("max_tokens") and completion_tokens > body["max_tokens"]:  # cut off like the real API
+            content = content[: body["max_tokens"] * CHARS_PER_TOKEN]
+            completion_tokens, finish_reason = body["max_tokens"], "length"
+        with self._lock:
+            self.counts["ok"] += 1
+            served = self.counts["ok"]
+        return 200, headers, {
+            "id": f"chatcmpl-mock-{served}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content, "refusal": None},
+                    "logprobs": None,
+                    "finish_reason": finish_reason,
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": 0},
+            },
+        }
+
+    def _corrupt(self, content: str, rng: random.Random) -> str:
+        """Break one field of each item with probability invalid_rate (GPC brick for brands, name for companies)."""
+        payload = json.loads(content)
+        corrupted = 0
+        for items in payload.values():
+            for item in items:
+                if rng.random() < self.invalid_rate:
+                    if "gpc_brick" in item:
+                        item["gpc_brick"] = item["gpc_brick"][:5]
+                    else:
+                        item["company_name"] = ""
+                    corrupted += 1
+        with self._lock:
+            self.counts["invalid_items"] += corrupted
+        return json.dumps(payload)
+
+    def _handler(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+            disable_nagle_algorithm = True  # headers and body are separate writes
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    status, headers, payload = 404, {}, {"error": {"message": f"unknown path {self.path}"}}
+                else:
+                    status, headers, payload = server.respond(body)
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                for name, value in {**headers, "Content-Type": "application/json"}.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                logger.debug(format % args)
+
+        return Handler
+
+    def start(self) -> "MockOpenAIServer":
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-openai", daemon=True)
+        self._thread.start()
+        logger.info(f"Mock OpenAI server listening on {self.base_url}")
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve in the calling thread until interrupted."""
+        logger.info(f"Mock OpenAI server listening on {self.base_url}")
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "MockOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc: object) -> None:
+        self.stop()
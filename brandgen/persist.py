@@ -1,13 +1,33 @@
 """Persistence helpers.
 
 Responsibility: Minimal JSON file IO plus industries sections loader.
+
+Mapping stores (companies / brands) are a pretty JSON snapshot plus an append-only
+JSONL journal beside it (``companies.journal.jsonl``). ``incremental_update`` appends one
+record per completed item; ``compact_store`` folds the journal back into the snapshot.
+Readers (``load_store`` / ``load_companies``) replay journal over snapshot transparently;
+``iter_store`` / ``StoreIndex`` / ``NameStream`` give bounded-memory access to large stores.
+When a storage backend is configured (``storage.configure_storage``) these store
+functions delegate to it and the JSON files only serve as import / export format.
 """
 
 from __future__ import annotations
+import atexit
 import json
+import os
+import re
+import sqlite3
+import tempfile
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, List, Callable
-import json as _json
+from typing import Any, Dict, Iterable, Iterator, List, Callable, Tuple
+from .profiling import span
+from .telemetry import get_telemetry
+
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r"\s*")
+_DELIMITERS = frozenset(",:}] \t\r\n")
 
 
 def load_json(path: str) -> Any:
@@ -20,35 +40,429 @@ def save_json(path: str, data: Any) -> None:
     """Persist Python data structure as pretty JSON to disk."""
     p = Path(path)
     p.parent.mkdir(parents=True, exist_ok=True)
-    tmp = p.with_suffix(p.suffix + ".tmp")
+    tmp = p.with_name(f"{p.name}.{os.getpid()}.tmp")  # per-process: queue workers may merge concurrently
     with tmp.open("w", encoding="utf-8") as fh:
         json.dump(data, fh, indent=2, ensure_ascii=False)
     tmp.replace(p)
 
 
-def incremental_update(
-    path: str,
-    mutate: Callable[[Dict[str, Any]], None],
-) -> Dict[str, Any]:
-    """Load (if exists), apply mutation, and atomically persist updated mapping.
+def save_json_items(path: str, items: Iterable[Tuple[str, Any]]) -> int:
+    """Stream (key, value) pairs to disk as the same pretty JSON object ``save_json`` writes.
+
+    Only one value is encoded at a time; returns the number of entries written.
+    """
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_name(f"{p.name}.{os.getpid()}.tmp")
+    count = 0
+    with tmp.open("w", encoding="utf-8") as fh:
+        for key, value in items:
+            value_text = json.dumps(value, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+            fh.write(("{\n  " if count == 0 else ",\n  ") + json.dumps(key, ensure_ascii=False) + ": " + value_text)
+            count += 1
+        fh.write("\n}" if count else "{}")
+    tmp.replace(p)
+    return count
+
+
+def _trim_torn_line(path: Path, chunk_size: int = 1 << 16) -> None:
+    """Truncate a journal after its last newline, dropping a record torn by a crash mid-append."""
+    if not path.exists():
+        return
+    with path.open("rb+") as fh:
+        end = fh.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            start = max(0, pos - chunk_size)
+            fh.seek(start)
+            newline = fh.read(pos - start).rfind(b"\n")
+            if newline >= 0:
+                pos = start + newline + 1
+                break
+            pos = start
+        if pos < end:
+            fh.truncate(pos)
+
+
+class JsonJournal:
+    """Append-only JSONL journal of ``{"key": ..., "value": ...}`` records.
+
+    Records are flushed to the OS on every append and fsync'ed every ``fsync_every``
+    appends (and on close), bounding both write cost and data lost on power failure.
+    """
+
+    def __init__(self, path: Path, fsync_every: int) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.fsync_every = max(1, fsync_every)
+        _trim_torn_line(path)
+        self._fh = path.open("a", encoding="utf-8")
+        self._unsynced = 0
+
+    def append(self, key: str, value: Any) -> None:
+        """Write one record and fsync when the batch threshold is reached."""
+        self._fh.write(json.dumps({"key": key, "value": value}, ensure_ascii=False) + "\n")
+        self._fh.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self) -> None:
+        """Force buffered records to disk."""
+        if self._unsynced:
+            os.fsync(self._fh.fileno())
+            self._unsynced = 0
+
+    def close(self) -> None:
+        """Sync and close the underlying file."""
+        if not self._fh.closed:
+            self.sync()
+            self._fh.close()
+
+    def __enter__(self) -> "JsonJournal":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
 
-    Returns final mapping. Ensures partial progress durability.
+_JOURNALS: Dict[Path, JsonJournal] = {}
+_FSYNC_EVERY = 50
+
+
+def configure_journal(fsync_every: int) -> None:
+    """Set how many journal appends are batched per fsync (applies to new journals)."""
+    global _FSYNC_EVERY
+    _FSYNC_EVERY = max(1, fsync_every)
+
+
+def journal_path(path: str) -> Path:
+    """Return the journal file that accompanies a JSON snapshot path."""
+    return Path(path).with_suffix(".journal.jsonl")
+
+
+def _journal(path: str) -> JsonJournal:
+    """Return the open journal for a snapshot path, opening it on first use."""
+    jp = journal_path(path)
+    if jp not in _JOURNALS:
+        _JOURNALS[jp] = JsonJournal(jp, _FSYNC_EVERY)
+    return _JOURNALS[jp]
+
+
+def close_journals() -> None:
+    """Sync and close every open journal (also registered to run at exit)."""
+    for journal in _JOURNALS.values():
+        journal.close()
+    _JOURNALS.clear()
+
+
+atexit.register(close_journals)
+
+
+def read_journal(path: str) -> Iterator[Tuple[str, Any]]:
+    """Yield (key, value) records from a snapshot's journal in append order.
+
+    A torn line (crash mid-write) is skipped; the records after it are still read.
     """
+    jp = journal_path(path)
+    if jp in _JOURNALS:
+        _JOURNALS[jp].sync()
+    if not jp.exists():
+        return
+    with jp.open("r", encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            yield record["key"], record["value"]
+
+
+def iter_json_items(path: str, chunk_size: int = 1 << 16) -> Iterator[Tuple[str, Any]]:
+    """Stream (key, value) pairs of a top-level JSON object without loading the whole file.
+
+    Memory is bounded by the largest single value plus one read chunk.
+    """
+    with Path(path).open("r", encoding="utf-8") as fh:
+        buf, pos, eof = "", 0, False
+
+        def token(expected: str) -> str:
+            """Skip whitespace, then consume one character that must be in ``expected``."""
+            nonlocal buf, pos, eof
+            while True:
+                pos = _WHITESPACE.match(buf, pos).end()
+                if pos < len(buf) or eof:
+                    break
+                buf, pos = fh.read(chunk_size), 0
+                eof = not buf
+            char = buf[pos:pos + 1]
+            if not char or char not in expected:
+                raise ValueError(f"Unexpected {char or 'end of file'!r} in {path}; expected one of {expected!r}")
+            pos += 1
+            return char
+
+        def value() -> Any:
+            """Decode the next JSON value, reading more input until it is complete."""
+            nonlocal buf, pos, eof
+            while True:
+                pos = _WHITESPACE.match(buf, pos).end()
+                try:
+                    decoded, end = _DECODER.raw_decode(buf, pos)
+                    if eof or buf[end:end + 1] in _DELIMITERS:  # a number at the buffer edge may continue
+                        pos = end
+                        return decoded
+                except ValueError:
+                    if eof:
+                        raise
+                chunk = fh.read(chunk_size)
+                buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+
+        token("{")
+        if token("}\"") == "}":
+            return
+        pos -= 1  # un-read the opening quote of the first key
+        while True:
+            key = value()
+            token(":")
+            yield key, value()
+            if token(",}") == "}":
+                return
+
+
+_BACKEND: Any = None
+
+
+def use_backend(backend: Any) -> None:
+    """Route the mapping-store functions to backend (None restores the JSON files)."""
+    global _BACKEND
+    _BACKEND = backend
+
+
+def iter_store(path: str) -> Iterator[Tuple[str, Any]]:
+    """Stream snapshot items then journal records (later records override earlier keys)."""
+    if _BACKEND is not None:
+        yield from _BACKEND.items(path)
+        return
+    if Path(path).exists():
+        yield from iter_json_items(path)
+    yield from read_journal(path)
+
+
+def store_exists(path: str) -> bool:
+    """Return True when a snapshot or journal exists for the mapping store."""
+    if _BACKEND is not None:
+        return _BACKEND.exists(path)
+    return Path(path).exists() or journal_path(path).exists()
+
+
+def load_store(path: str) -> Dict[str, Any]:
+    """Return snapshot mapping (if any) with journal records replayed on top."""
+    if _BACKEND is not None:
+        return _BACKEND.load(path)
     store: Dict[str, Any] = {}
     p = Path(path)
     if p.exists():
         try:
-            with p.open("r", encoding="utf-8") as fh:
-                store = _json.load(fh)  # type: ignore[assignment]
-            if not isinstance(store, dict):  # defensive
-                store = {}
+            data = load_json(path)
+            store = data if isinstance(data, dict) else {}
         except Exception:
             store = {}
-    mutate(store)
-    save_json(path, store)
+    store.update(read_journal(path))
     return store
 
 
+def incremental_update(
+    path: str,
+    mutate: Callable[[Dict[str, Any]], None],
+) -> Dict[str, Any]:
+    """Apply mutation to an empty delta and append its entries to the store journal.
+
+    Returns the delta. Cost is proportional to the delta, not the store size; use
+    ``load_store`` for the merged view and ``compact_store`` to rewrite the snapshot.
+    """
+    delta: Dict[str, Any] = {}
+    mutate(delta)
+    with get_telemetry().timed("persistence"), span("incremental_update", "persistence", store=Path(path).name, keys=len(delta)):
+        if _BACKEND is not None:
+            _BACKEND.upsert(path, delta)
+            return delta
+        journal = _journal(path)
+        for key, value in delta.items():
+            journal.append(key, value)
+    return delta
+
+
+def compact_store(path: str, data: Dict[str, Any] | None = None) -> None:
+    """Fold the journal into a fresh pretty snapshot and remove the journal.
+
+    ``data`` may pass an already merged in-memory mapping to skip re-reading.
+    Without it, the journal is indexed on disk and the snapshot is streamed past it
+    (see ``_merged_items``), so memory stays bounded by one entry.
+    The snapshot is written before the journal is dropped, so a crash in between
+    only leaves records that replay idempotently. With a storage backend ``data``
+    replaces the stored entries (in its order); no JSON file is written.
+    """
+    with get_telemetry().timed("persistence"), span("compact_store", "persistence", store=Path(path).name):
+        if _BACKEND is not None:
+            if data is not None:
+                _BACKEND.replace(path, data)
+            return
+        jp = journal_path(path)
+        if jp in _JOURNALS:
+            _JOURNALS.pop(jp).close()
+        if data is not None:
+            save_json(path, data)
+        elif jp.exists() or not Path(path).exists():
+            with tempfile.TemporaryDirectory(prefix="brandgen-compact-") as tmp:
+                db = sqlite3.connect(str(Path(tmp) / "journal.sqlite3"))
+                try:
+                    save_json_items(path, _merged_items(path, StoreIndex(db, "journal", path, records=read_journal(path))))
+                finally:
+                    db.close()
+        jp.unlink(missing_ok=True)
+
+
+def _merged_items(path: str, journal: "StoreIndex") -> Iterator[Tuple[str, Any]]:
+    """Yield snapshot entries (journal values replacing theirs in place), then the new journal keys."""
+    if Path(path).exists():
+        for key, value in iter_json_items(path):
+            yield key, journal.pop(key, value)
+    yield from journal.items()
+
+
+def staging_path(path: str) -> str:
+    """Return the side store a fresh run fills before it replaces path (``brands.new.json``)."""
+    p = Path(path)
+    return str(p.with_suffix(".new" + p.suffix))
+
+
+def swap_store(staged: str, path: str) -> None:
+    """Compact staged and move it over the store at path (snapshot and journal, or backend entries).
+
+    Until the swap, path keeps its previous contents, so an interrupted run loses nothing.
+    """
+    if _BACKEND is not None:
+        with get_telemetry().timed("persistence"):
+            _BACKEND.rename(staged, path)
+        return
+    compact_store(staged)
+    jp = journal_path(path)
+    if jp in _JOURNALS:
+        _JOURNALS.pop(jp).close()
+    jp.unlink(missing_ok=True)  # stale records of the old store must not replay over the new snapshot
+    os.replace(staged, path)
+
+
+def reset_store(path: str) -> None:
+    """Drop a mapping store (snapshot and journal, or the backend entries) before regenerating it."""
+    if _BACKEND is not None:
+        _BACKEND.replace(path, {})
+        return
+    jp = journal_path(path)
+    if jp in _JOURNALS:
+        _JOURNALS.pop(jp).close()
+    Path(path).unlink(missing_ok=True)
+    jp.unlink(missing_ok=True)
+
+
+class StoreIndex:
+    """Temporary SQLite index over a companies or brands store (key -> JSON value).
+
+    Journal records override snapshot entries while keeping the first-seen order.
+    ``records`` replaces the default source (the whole store via ``iter_store``).
+    """
+
+    def __init__(
+        self, db: sqlite3.Connection, table: str, path: str, batch: int = 1000, records: Iterable[Tuple[str, Any]] | None = None
+    ) -> None:
+        self.db = db
+        self.table = table
+        db.execute(f"CREATE TABLE {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        source = iter_store(path) if records is None else records
+        rows = ((key, json.dumps(value, ensure_ascii=False)) for key, value in source)
+        while chunk := list(islice(rows, batch)):
+            db.executemany(
+                f"INSERT INTO {table} (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                chunk,
+            )
+        db.commit()
+
+    def get(self, key: str) -> list:
+        """Return the stored value for key, or an empty list."""
+        row = self.db.execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def text(self, key: str) -> str:
+        """Return the stored value for key as JSON text ('[]' when missing)."""
+        row = self.db.execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else "[]"
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        """Remove key and return its value, or default when it is not indexed."""
+        row = self.db.execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return default
+        self.db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        return json.loads(row[0])
+
+    def items(self) -> Iterator[Tuple[str, list]]:
+        """Stream (key, value) pairs in first-seen order."""
+        for key, value in self.db.execute(f"SELECT key, value FROM {self.table} ORDER BY rowid"):
+            yield key, json.loads(value)
+
+
+class NameStream:
+    """Disk-backed set of names with a done flag (a temporary SQLite table).
+
+    De-duplicates without holding the names in memory and streams the pending ones
+    in sorted order straight off the primary-key B-tree (an external sort).
+    """
+
+    def __init__(self, batch: int = 1000) -> None:
+        self.batch = batch
+        self._tmp = tempfile.TemporaryDirectory(prefix="brandgen-names-")
+        self.db = sqlite3.connect(str(Path(self._tmp.name) / "names.sqlite3"))
+        self.db.execute("CREATE TABLE names (name TEXT PRIMARY KEY, done INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID")
+
+    def add(self, names: Iterable[str]) -> None:
+        """Insert names (duplicates are ignored)."""
+        rows = ((name,) for name in names)
+        while chunk := list(islice(rows, self.batch)):
+            self.db.executemany("INSERT OR IGNORE INTO names (name) VALUES (?)", chunk)
+        self.db.commit()
+
+    def mark_done(self, records: Iterable[Tuple[str, bool]]) -> None:
+        """Set the done flag per (name, done) record, later records winning; unknown names are ignored."""
+        rows = ((int(done), name) for name, done in records)
+        while chunk := list(islice(rows, self.batch)):
+            self.db.executemany("UPDATE names SET done = ? WHERE name = ?", chunk)
+        self.db.commit()
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM names").fetchone()[0]
+
+    def done(self) -> int:
+        """Return how many names are marked done."""
+        return self.db.execute("SELECT COUNT(*) FROM names WHERE done = 1").fetchone()[0]
+
+    def pending(self) -> Iterator[str]:
+        """Stream the names not marked done, in sorted (code point) order."""
+        for (name,) in self.db.execute("SELECT name FROM names WHERE done = 0 ORDER BY name"):
+            yield name
+
+    def close(self) -> None:
+        """Close the database and delete its directory."""
+        self.db.close()
+        self._tmp.cleanup()
+
+    def __enter__(self) -> "NameStream":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
 def load_sections(path: str) -> Dict[int, str]:
     """Return mapping of section index -> label from industries JSON."""
     import logging
@@ -60,12 +474,14 @@ def load_sections(path: str) -> Dict[int, str]:
 
 
 def load_companies(path: str) -> Dict[str, List[Dict[str, str]]]:
-    """Load previously generated companies JSON (section label -> list of company dicts)."""
+    """Load previously generated companies (section label -> list of company dicts).
+
+    Reads the JSON snapshot plus any pending journal records.
+    """
     import logging
     logger = logging.getLogger(__name__)
     logger.info(f"Opened file {path} for reading...")
-    data = load_json(path)
-    return data if isinstance(data, dict) else {}
+    return load_store(path)
 
 
 def load_isic_groups(path: str) -> Dict[str, Dict[str, str]]:
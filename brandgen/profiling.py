@@ -0,0 +1,186 @@
+"""Run profiling.
+
+Responsibility: Record opt-in timeline spans (phases, API calls, rate-limit and
+retry waits, persistence, flatten chunks) plus an in-flight API call counter, and
+export them as one Chrome trace / Perfetto JSON file (open in ui.perfetto.dev or
+chrome://tracing). Optionally profile each phase with cProfile (``.pstats`` per
+phase, calling thread only) or with a sampling profiler over all threads
+(collapsed stacks per phase, ready for flamegraph.pl / speedscope).
+When profiling is off, ``span`` / ``phase`` return a shared no-op context.
+"""
+
+from __future__ import annotations
+import cProfile
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, ContextManager, Dict, Iterator, List
+
+PROFILE_MODES = ("off", "cprofile", "sample")
+
+logger = logging.getLogger(__name__)
+
+
+class Profiler:
+    """Thread-safe collector of trace events with optional per-phase profilers."""
+
+    def __init__(self, mode: str = "off", profile_dir: str = "logs/profile", sample_interval_ms: float = 5.0) -> None:
+        self.mode = mode
+        self.profile_dir = Path(profile_dir)
+        self.sample_interval = max(0.001, sample_interval_ms / 1000)
+        self.events: List[Dict[str, Any]] = []
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._threads: Dict[int, str] = {}
+        self._gauges: Dict[str, int] = {}
+        self._phases: List[str] = []
+        self._phase_runs: Counter = Counter()
+        self._samples: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: threading.Thread | None = None
+        if mode == "sample":
+            self._sampler = threading.Thread(target=self._sample, name="profiler-sampler", daemon=True)
+            self._sampler.start()
+
+    def _now(self) -> float:
+        return (time.perf_counter() - self._origin) * 1e6
+
+    def _tid(self) -> int:
+        thread = threading.current_thread()
+        if thread.ident not in self._threads:
+            self._threads[thread.ident] = thread.name
+        return thread.ident
+
+    @contextmanager
+    def span(self, name: str, cat: str = "", **args: Any) -> Iterator[None]:
+        """Record the enclosed block as a complete ('X') event on the current thread."""
+        start = self._now()
+        try:
+            yield
+        finally:
+            event = {"name": name, "cat": cat, "ph": "X", "ts": start, "dur": self._now() - start, "pid": self._pid, "tid": self._tid()}
+            if args:
+                event["args"] = args
+            with self._lock:
+                self.events.append(event)
+
+    def gauge(self, name: str, delta: int) -> None:
+        """Adjust a named counter and record its new value ('C' event)."""
+        with self._lock:
+            value = self._gauges[name] = self._gauges.get(name, 0) + delta
+            self.events.append({"name": name, "ph": "C", "ts": self._now(), "pid": self._pid, "args": {name: value}})
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Span a run phase; with cProfile mode also write ``<profile_dir>/<phase>.pstats``."""
+        with self._lock:
+            self._phases.append(name)
+            self._phase_runs[name] += 1
+            run = self._phase_runs[name]
+        profile = cProfile.Profile() if self.mode == "cprofile" else None
+        try:
+            with self.span(name, "phase"):
+                if profile:
+                    profile.enable()
+                try:
+                    yield
+                finally:
+                    if profile:
+                        profile.disable()
+        finally:
+            with self._lock:
+                self._phases.remove(name)
+            if profile:
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                path = self.profile_dir / (f"{name}.pstats" if run == 1 else f"{name}.{run}.pstats")
+                profile.dump_stats(str(path))
+                logger.info(f"cProfile for phase {name} written to {path}")
+
+    def _sample(self) -> None:
+        """Sampler thread: count the stack of every other thread under the active phase."""
+        own = threading.get_ident()
+        while not self._stop.wait(self.sample_interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            with self._lock:
+                current = self._phases[-1] if self._phases else "idle"
+            counts = self._samples.setdefault(current, Counter())
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                    frame = frame.f_back
+                counts[";".join([names.get(ident, str(ident)), *reversed(stack)])] += 1
+
+    def close(self) -> None:
+        """Stop the sampler and write collapsed stacks (``<profile_dir>/<phase>.folded``)."""
+        if self._sampler is None:
+            return
+        self._stop.set()
+        self._sampler.join()
+        self._sampler = None
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        for phase, counts in self._samples.items():
+            path = self.profile_dir / f"{phase}.folded"
+            with path.open("w", encoding="utf-8") as fh:
+                fh.writelines(f"{stack} {count}\n" for stack, count in counts.most_common())
+            logger.info(f"Sampled stacks for phase {phase} written to {path} ({sum(counts.values())} samples)")
+
+    def write_trace(self, path: str) -> None:
+        """Write the Chrome trace / Perfetto JSON timeline to path."""
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self._threads)
+        metadata = [
+            {"name": "process_name", "ph": "M", "pid": self._pid, "args": {"name": "brandgen"}},
+            *({"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": name}} for tid, name in threads.items()),
+        ]
+        p = Path(path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        with p.open("w", encoding="utf-8") as fh:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, fh)
+
+
+_PROFILER: Profiler | None = None
+_NULL = nullcontext()
+
+
+def configure_profiling(enabled: bool, mode: str = "off", profile_dir: str = "logs/profile", sample_interval_ms: float = 5.0) -> Profiler | None:
+    """Create the process-wide profiler (None when neither tracing nor a profile mode is on)."""
+    global _PROFILER
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unsupported PROFILE_MODE: {mode}. Use one of {', '.join(PROFILE_MODES)}.")
+    if _PROFILER is not None:
+        _PROFILER.close()
+    _PROFILER = Profiler(mode, profile_dir, sample_interval_ms) if enabled or mode != "off" else None
+    return _PROFILER
+
+
+def get_profiler() -> Profiler | None:
+    """Return the configured profiler, if any."""
+    return _PROFILER
+
+
+def span(name: str, cat: str = "", **args: Any) -> ContextManager[None]:
+    """Timeline span for the enclosed block (no-op unless profiling is configured)."""
+    return _PROFILER.span(name, cat, **args) if _PROFILER else _NULL
+
+
+def phase(name: str) -> ContextManager[None]:
+    """Run-phase span, profiled per PROFILE_MODE (no-op unless profiling is configured)."""
+    return _PROFILER.phase(name) if _PROFILER else _NULL
+
+
+def gauge(name: str, delta: int) -> None:
+    """Adjust a timeline counter such as in-flight API calls (no-op unless profiling is configured)."""
+    if _PROFILER:
+        _PROFILER.gauge(name, delta)
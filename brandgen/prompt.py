@@ -3,6 +3,9 @@
 from __future__ import annotations
 
 
+PROMPT_LIST_SIZE = 10  # {count}: items asked for per list unless a lower MAX_* limit is set
+
+
 BASE_PROMPT_TEMPLATE = (
   "You are a disciplined data extraction engine. "
   "Return ONLY valid JSON matching the provided schema instructions—no code fences, no prose, no markdown, no explanations. "
@@ -12,7 +15,7 @@ BASE_PROMPT_TEMPLATE = (
 
 companies_prompt_template = (
   "You are an industry research assistant. Using ISIC Rev.4 Section {section} as the scope, "
-  "identify the top 10 global companies operating in this section based on market share. "
+  "identify the top {count} global companies operating in this section based on market share. "
   "For each company, provide the following fields in JSON format:\n\n"
   "{\n"
   '  "company_name": "",\n'
@@ -26,7 +29,7 @@ companies_prompt_template = (
 brands_prompt_template = (
   "You are a business classification assistant. "
   "Focus strictly on the company named: {company}. "
-  "List the top 10 distinct brands / products / services likely to appear as individual invoice line items. "
+  "List the top {count} distinct brands / products / services likely to appear as individual invoice line items. "
   "Return ONLY a single JSON object with this exact shape (no code fences, no extra commentary):\n"
   "{\n"
   "  \"items\": [\n"
@@ -41,12 +44,12 @@ brands_prompt_template = (
   "    }\n"
   "  ]\n"
   "}\n"
-  "Rules: (1) No markdown. (2) Do not include more than 10 items. (3) Each field must be a concise string."
+  "Rules: (1) No markdown. (2) Do not include more than {count} items. (3) Each field must be a concise string."
 )
 
 companies_country_prompt_template = (
   "You are an industry research assistant. Using ISIC Rev.4 Section {section} as the scope, "
-  "identify the top 10 companies headquartered in {country} operating in this section (or strongly associated with {country}). "
+  "identify the top {count} companies headquartered in {country} operating in this section (or strongly associated with {country}). "
   "For each company, provide the following fields in JSON format:\n\n"
   "{\n"
   '  \"company_name\": \"\",\n'
@@ -59,7 +62,7 @@ companies_country_prompt_template = (
 brands_country_prompt_template = (
   "You are a business classification assistant. "
   "Focus strictly on the company named: {company}. Only consider brands / products / services originating from or primarily marketed in {country}. "
-  "List the top 10 distinct brands / products / services likely to appear as individual invoice line items. "
+  "List the top {count} distinct brands / products / services likely to appear as individual invoice line items. "
   "Return ONLY a single JSON object with this exact shape (no code fences, no extra commentary):\n"
   "{\n"
   "  \"items\": [\n"
@@ -74,7 +77,7 @@ brands_country_prompt_template = (
   "    }\n"
   "  ]\n"
   "}\n"
-  "Rules: (1) No markdown. (2) Do not include more than 10 items. (3) Each field must be a concise string."
+  "Rules: (1) No markdown. (2) Do not include more than {count} items. (3) Each field must be a concise string."
 )
 
 companies_groups_prompt_template = (
@@ -85,7 +88,7 @@ companies_groups_prompt_template = (
   "- Group: {group_name}\n"
   "- Includes: {includes}\n"
   "- Excludes: {excludes}\n\n"
-  "Identify the top 10 global companies operating specifically in this group based on market share. "
+  "Identify the top {count} global companies operating specifically in this group based on market share. "
   "For each company, provide the following fields in JSON format:\n\n"
   "{\n"
   '  "company_name": "",\n'
@@ -103,7 +106,7 @@ companies_groups_country_prompt_template = (
   "- Group: {group_name}\n"
   "- Includes: {includes}\n"
   "- Excludes: {excludes}\n\n"
-  "Identify the top 10 companies headquartered in {country} operating specifically in this group (or strongly associated with {country}). "
+  "Identify the top {count} companies headquartered in {country} operating specifically in this group (or strongly associated with {country}). "
   "For each company, provide the following fields in JSON format:\n\n"
   "{\n"
   '  "company_name": "",\n'
@@ -113,7 +116,74 @@ companies_groups_country_prompt_template = (
   "Return only valid JSON (no explanations, text, or formatting outside the JSON array)."
 )
 
+brands_multi_prompt_template = (
+  "You are a business classification assistant. "
+  "Handle each of the following companies independently:\n"
+  "{companies}\n"
+  "For EACH company list the top {count} distinct brands / products / services likely to appear as individual invoice line items. "
+  "Return ONLY a single JSON object keyed by the exact company names above (no code fences, no extra commentary):\n"
+  "{\n"
+  "  \"<company name>\": [\n"
+  "    {\n"
+  "      \"name\": \"\",\n"
+  "      \"type\": \"\",\n"
+  "      \"invoice_example\": \"\",\n"
+  "      \"gpc_segment\": \"\",\n"
+  "      \"gpc_family\": \"\",\n"
+  "      \"gpc_class\": \"\",\n"
+  "      \"gpc_brick\": \"\"\n"
+  "    }\n"
+  "  ]\n"
+  "}\n"
+  "Rules: (1) No markdown. (2) Do not include more than {count} items per company. (3) Each field must be a concise string. "
+  "(4) Include every listed company; use an empty list when none are known."
+)
+
+brands_multi_country_prompt_template = (
+  "You are a business classification assistant. "
+  "Handle each of the following companies independently:\n"
+  "{companies}\n"
+  "Only consider brands / products / services originating from or primarily marketed in {country}. "
+  "For EACH company list the top {count} distinct brands / products / services likely to appear as individual invoice line items. "
+  "Return ONLY a single JSON object keyed by the exact company names above (no code fences, no extra commentary):\n"
+  "{\n"
+  "  \"<company name>\": [\n"
+  "    {\n"
+  "      \"name\": \"\",\n"
+  "      \"type\": \"\",\n"
+  "      \"invoice_example\": \"\",\n"
+  "      \"gpc_segment\": \"\",\n"
+  "      \"gpc_family\": \"\",\n"
+  "      \"gpc_class\": \"\",\n"
+  "      \"gpc_brick\": \"\"\n"
+  "    }\n"
+  "  ]\n"
+  "}\n"
+  "Rules: (1) No markdown. (2) Do not include more than {count} items per company. (3) Each field must be a concise string. "
+  "(4) Include every listed company; use an empty list when none are known."
+)
+
+known_brands_hint_template = (
+  "Known brands of {company} (from Wikidata): {brands}. "
+  "Include those still on the market, then complete the list."
+)
+
+repair_prompt_template = (
+  "You are a data repair assistant. Some {what} items{subject} failed validation. "
+  "For each item listed below, return corrected values for these fields: {fields}.\n"
+  "Field rules:\n"
+  "{rules}\n"
+  "Items (index: current values | invalid fields):\n"
+  "{items}\n"
+  "Return ONLY a single JSON object with this exact shape (no code fences, no extra commentary):\n"
+  "{\n"
+  "  \"items\": [{\"index\": 0, <one string per field above>}]\n"
+  "}\n"
+  "Rules: (1) One entry per listed index. (2) Keep valid values unchanged. (3) Use an empty string when a code is unknown."
+)
+
 __all__ = [
+  "PROMPT_LIST_SIZE",
   "BASE_PROMPT_TEMPLATE",
   "companies_prompt_template",
   "brands_prompt_template",
@@ -121,4 +191,8 @@ __all__ = [
   "brands_country_prompt_template",
   "companies_groups_prompt_template",
   "companies_groups_country_prompt_template",
+  "brands_multi_prompt_template",
+  "brands_multi_country_prompt_template",
+  "known_brands_hint_template",
+  "repair_prompt_template",
   ]
@@ -5,7 +5,10 @@ parameters (section labels, company names, optional country filtering).
 """
 
 from __future__ import annotations
+import json
+from typing import Any
 from .prompt import (
+    PROMPT_LIST_SIZE,
     BASE_PROMPT_TEMPLATE,
     companies_prompt_template,
     brands_prompt_template,
@@ -13,31 +16,42 @@ from .prompt import (
     brands_country_prompt_template,
     companies_groups_prompt_template,
     companies_groups_country_prompt_template,
+    brands_multi_prompt_template,
+    brands_multi_country_prompt_template,
+    known_brands_hint_template,
+    repair_prompt_template,
 )
 
 
+def _count(limit: int) -> str:
+    """Return the list size to ask for: PROMPT_LIST_SIZE, lowered to limit when that is smaller (0 = no limit)."""
+    return str(min(limit, PROMPT_LIST_SIZE) if limit > 0 else PROMPT_LIST_SIZE)
+
+
 def build_prompt(question: str) -> str:
     """Wrap a specific question with the shared base system instructions."""
     return f"{BASE_PROMPT_TEMPLATE}\n\n{question.strip()}"
 
 
-def build_companies_prompt(section_label: str, country: str, use_country: bool) -> str:
-    """Return companies prompt, optionally country-specific."""
+def build_companies_prompt(section_label: str, country: str, use_country: bool, limit: int = 0) -> str:
+    """Return companies prompt, optionally country-specific, asking for at most limit companies."""
     # Use simple replacement instead of str.format to avoid interpreting JSON braces.
     if use_country and country:
         return (
             companies_country_prompt_template
             .replace('{section}', section_label)
             .replace('{country}', country)
+            .replace('{count}', _count(limit))
         )
-    return companies_prompt_template.replace('{section}', section_label)
+    return companies_prompt_template.replace('{section}', section_label).replace('{count}', _count(limit))
 
 
-def build_companies_groups_prompt(group_data: dict[str, str], country: str, use_country: bool) -> str:
-    """Return companies prompt for ISIC groups (level 3), optionally country-specific."""
+def build_companies_groups_prompt(group_data: dict[str, str], country: str, use_country: bool, limit: int = 0) -> str:
+    """Return companies prompt for ISIC groups (level 3), optionally country-specific, asking for at most limit companies."""
     template = companies_groups_country_prompt_template if use_country and country else companies_groups_prompt_template
     
     prompt = (template
+        .replace('{count}', _count(limit))
         .replace('{section_name}', group_data.get('section_name', ''))
         .replace('{division_name}', group_data.get('division_name', ''))
         .replace('{group_name}', group_data.get('group_name', ''))
@@ -51,12 +65,77 @@ def build_companies_groups_prompt(group_data: dict[str, str], country: str, use_
     return prompt
 
 
-def build_brands_prompt(company: str, country: str, use_country: bool) -> str:
-    """Return brands prompt, optionally country-specific."""
+def build_known_brands_hint(company: str, known_brands: list[str]) -> str:
+    """Return the grounding line listing brands already known for a company."""
+    return known_brands_hint_template.replace('{company}', company).replace('{brands}', ", ".join(known_brands))
+
+
+def build_brands_prompt(
+    company: str,
+    country: str,
+    use_country: bool,
+    known_brands: list[str] | None = None,
+    limit: int = 0,
+) -> str:
+    """Return brands prompt asking for at most limit items, optionally country-specific and grounded with known brands."""
     if use_country and country:
-        return (
+        prompt = (
             brands_country_prompt_template
             .replace('{company}', company)
             .replace('{country}', country)
         )
-    return brands_prompt_template.replace('{company}', company)
+    else:
+        prompt = brands_prompt_template.replace('{company}', company)
+    prompt = prompt.replace('{count}', _count(limit))
+    if known_brands:
+        prompt = f"{prompt}\n{build_known_brands_hint(company, known_brands)}"
+    return prompt
+
+
+def build_brands_multi_prompt(
+    companies: list[str],
+    country: str,
+    use_country: bool,
+    known_brands: dict[str, list[str] | None] | None = None,
+    limit: int = 0,
+) -> str:
+    """Return one brands prompt covering several companies, optionally country-specific.
+
+    Companies with entries in known_brands get them listed inline as grounding;
+    each company is asked for at most limit items.
+    """
+    known_brands = known_brands or {}
+    listing = "\n".join(
+        f"- {company} (known brands: {', '.join(known_brands[company])})" if known_brands.get(company) else f"- {company}"
+        for company in companies
+    )
+    if use_country and country:
+        return (
+            brands_multi_country_prompt_template
+            .replace('{companies}', listing)
+            .replace('{country}', country)
+            .replace('{count}', _count(limit))
+        )
+    return brands_multi_prompt_template.replace('{companies}', listing).replace('{count}', _count(limit))
+
+
+def build_repair_prompt(
+    what: str,
+    subject: str,
+    flagged: list[tuple[int, Any, tuple[str, ...]]],
+    fields: list[str],
+    rules: dict[str, str],
+) -> str:
+    """Return a repair prompt listing only the flagged items (index, current values, invalid fields)."""
+    listing = "\n".join(
+        f"{index}: {json.dumps(item, ensure_ascii=False)} | {', '.join(f for f in bad if f in fields)}"
+        for index, item, bad in flagged
+    )
+    return (
+        repair_prompt_template
+        .replace('{what}', what)
+        .replace('{subject}', f" of {subject}" if subject else "")
+        .replace('{fields}', ", ".join(fields))
+        .replace('{rules}', "\n".join(f"- {field}: {rules.get(field, 'concise string')}" for field in fields))
+        .replace('{items}', listing)
+    )
@@ -0,0 +1,222 @@
+"""Rate limiting and retry policy.
+
+Responsibility: Budget requests-per-minute and estimated tokens-per-minute across
+all worker threads with token buckets, adapt the budgets from the API rate-limit
+headers, and compute jittered exponential backoff for retryable failures.
+"""
+
+from __future__ import annotations
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Mapping
+
+
+# Rough completion sizes per top-level schema property (tokens) used to pre-charge the TPM bucket.
+EXPECTED_OUTPUT_TOKENS = {
+    "companies_schema": 600,
+    "brands_schema": 1200,
+    "brands_multi_schema": 1200,  # per company
+}
+DEFAULT_OUTPUT_TOKENS = 800
+# Completion-token allowance per list item when a schema caps its lists with maxItems: about twice a
+# typical item (company ~55 tokens, brand ~80), so the cap stops runaway output, not normal answers.
+OUTPUT_TOKENS_PER_ITEM = {
+    "companies_schema": 120,
+    "brands_schema": 160,
+    "brands_multi_schema": 160,
+}
+OUTPUT_TOKENS_OVERHEAD = 50  # JSON envelope / keys per response
+CHARS_PER_TOKEN = 4
+
+_DURATION_PART = re.compile(r"([\d.]+)(ms|s|m|h)")
+_DURATION_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def output_token_cap(schema: Dict[str, Any]) -> int | None:
+    """Return a completion-token cap derived from the schema's maxItems limits.
+
+    None when the schema has no per-item allowance or any top-level list is unbounded.
+    """
+    per_item = OUTPUT_TOKENS_PER_ITEM.get(schema.get("name", ""))
+    properties = schema.get("schema", {}).get("properties", {})
+    limits = [spec.get("maxItems") for spec in properties.values() if spec.get("type") == "array"]
+    if per_item is None or not limits or None in limits:
+        return None
+    return OUTPUT_TOKENS_OVERHEAD + per_item * sum(limits)
+
+
+def estimate_tokens(prompt: str, schema: Dict[str, Any] | None = None) -> int:
+    """Estimate total tokens for a call: prompt length plus expected output for the schema.
+
+    Output is scaled by the number of top-level properties (companies in a multi-company schema)
+    and never exceeds the schema's output_token_cap.
+    """
+    schema = schema or {}
+    per_property = EXPECTED_OUTPUT_TOKENS.get(schema.get("name", ""), DEFAULT_OUTPUT_TOKENS)
+    properties = len(schema.get("schema", {}).get("properties", {})) or 1
+    cap = output_token_cap(schema)
+    output = per_property * properties if cap is None else min(cap, per_property * properties)
+    return len(prompt) // CHARS_PER_TOKEN + output
+
+
+def parse_duration(value: str | None) -> float:
+    """Parse rate-limit reset strings such as '1s', '6m0s' or '250ms' into seconds."""
+    if not value:
+        return 0.0
+    try:
+        return float(value)  # plain seconds (retry-after)
+    except ValueError:
+        return sum(float(n) * _DURATION_SECONDS[unit] for n, unit in _DURATION_PART.findall(value))
+
+
+class TokenBucket:
+    """Continuously refilling bucket holding up to ``per_minute`` units (0 = unlimited)."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.set_limit(per_minute)
+        self.updated = time.monotonic()
+
+    def set_limit(self, per_minute: float) -> None:
+        """Change capacity and refill rate; a previously unlimited bucket starts full."""
+        was_unlimited = not getattr(self, "capacity", 0)
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity if was_unlimited else min(self.tokens, self.capacity)
+
+    def refill(self, now: float) -> None:
+        """Add tokens accrued since the last update."""
+        if self.capacity:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` tokens are available (after refill)."""
+        if not self.capacity:
+            return 0.0
+        return max(0.0, (min(amount, self.capacity) - self.tokens) / self.rate)
+
+    def consume(self, amount: float) -> None:
+        """Remove tokens (may go negative to repay earlier under-estimates)."""
+        if self.capacity:
+            self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Shared RPM / TPM limiter with header adaptation and backoff.
+
+    ``state()`` exposes current budgets and accumulated stall time so throughput can be
+    tuned against the account tier.
+    """
+
+    def __init__(
+        self,
+        rpm: int = 0,
+        tpm: int = 0,
+        max_retries: int = 6,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+    ) -> None:
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.blocked_until = 0.0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.throttled = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> float:
+        """Block until one request and ``tokens`` tokens fit the budgets; return seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.requests.refill(now)
+                self.tokens.refill(now)
+                delay = max(self.blocked_until - now, self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                if delay <= 0:
+                    self.requests.consume(1)
+                    self.tokens.consume(tokens)
+                    if waited:
+                        self.waits += 1
+                        self.wait_seconds += waited
+                    return waited
+            time.sleep(delay)
+            waited += delay
+
+    def reconcile(self, estimated: int, actual: int) -> None:
+        """Correct the TPM bucket once real usage is known."""
+        with self._lock:
+            self.tokens.tokens += estimated - actual
+            if self.tokens.capacity:
+                self.tokens.tokens = min(self.tokens.tokens, self.tokens.capacity)
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """Adopt account limits and remaining budgets from x-ratelimit-* response headers."""
+        with self._lock:
+            for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if limit and (not bucket.capacity or float(limit) < bucket.capacity):
+                    bucket.set_limit(float(limit))
+                if remaining and bucket.capacity:
+                    bucket.tokens = min(bucket.tokens, float(remaining))
+
+    def backoff(self, attempt: int, retry_after: str | None = None, throttled: bool = False) -> float:
+        """Return the delay before retry ``attempt`` (0-based) and record it.
+
+        Uses full-jitter exponential backoff, never shorter than a server ``retry-after``.
+        A 429 also pauses every other worker until the delay has passed.
+        """
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        delay = max(delay, parse_duration(retry_after))
+        with self._lock:
+            self.retries += 1
+            if throttled:
+                self.throttled += 1
+                self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+        return delay
+
+    def state(self) -> Dict[str, Any]:
+        """Snapshot of budgets and stall counters."""
+        with self._lock:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            return {
+                "rpm": self.requests.capacity,
+                "tpm": self.tokens.capacity,
+                "requests_available": round(self.requests.tokens, 1),
+                "tokens_available": round(self.tokens.tokens),
+                "blocked_for": round(max(0.0, self.blocked_until - now), 2),
+                "waits": self.waits,
+                "wait_seconds": round(self.wait_seconds, 2),
+                "throttled": self.throttled,
+                "retries": self.retries,
+            }
+
+
+_LIMITER: RateLimiter | None = None
+
+
+def configure_limiter(
+    rpm: int = 0,
+    tpm: int = 0,
+    max_retries: int = 6,
+    backoff_base: float = 1.0,
+    backoff_max: float = 60.0,
+) -> RateLimiter:
+    """Create the process-wide limiter shared by all API calls."""
+    global _LIMITER
+    _LIMITER = RateLimiter(rpm, tpm, max_retries, backoff_base, backoff_max)
+    return _LIMITER
+
+
+def get_limiter() -> RateLimiter | None:
+    """Return the configured limiter, if any."""
+    return _LIMITER
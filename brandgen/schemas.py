@@ -8,8 +8,13 @@ from __future__ import annotations
 from typing import Any, Dict
 
 
-def companies_schema() -> Dict[str, Any]:
-    """Return JSON schema dict for companies response."""
+def _max_items(limit: int) -> Dict[str, Any]:
+    """Return the maxItems keyword for a list capped at limit (nothing for 0 = unlimited)."""
+    return {"maxItems": limit} if limit > 0 else {}
+
+
+def companies_schema(limit: int = 0) -> Dict[str, Any]:
+    """Return JSON schema dict for companies response (at most limit companies; 0 = unlimited)."""
     return {
         "name": "companies_schema",
         "schema": {
@@ -17,6 +22,7 @@ def companies_schema() -> Dict[str, Any]:
             "properties": {
                 "companies": {
                     "type": "array",
+                    **_max_items(limit),
                     "items": {
                         "type": "object",
                         "properties": {
@@ -39,10 +45,68 @@ def companies_schema() -> Dict[str, Any]:
     }
 
 
-def brands_schema() -> Dict[str, Any]:
-    """Return JSON schema dict for brands response."""
+def _brand_items_schema(limit: int = 0) -> Dict[str, Any]:
+    """Return the array schema for one company's brand / product / service items."""
+    return {
+        "type": "array",
+        **_max_items(limit),
+        "items": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "type": {"type": "string"},
+                "invoice_example": {"type": "string"},
+                "gpc_segment": {"type": "string"},
+                "gpc_family": {"type": "string"},
+                "gpc_class": {"type": "string"},
+                "gpc_brick": {"type": "string"},
+            },
+            "required": [
+                "name",
+                "type",
+                "invoice_example",
+                "gpc_segment",
+                "gpc_family",
+                "gpc_class",
+                "gpc_brick",
+            ],
+            "additionalProperties": False,
+        },
+    }
+
+
+def brands_schema(limit: int = 0) -> Dict[str, Any]:
+    """Return JSON schema dict for brands response (at most limit items; 0 = unlimited)."""
     return {
         "name": "brands_schema",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "items": _brand_items_schema(limit),
+            },
+            "required": ["items"],
+            "additionalProperties": False,
+        },
+    }
+
+
+def brands_multi_schema(companies: list[str], limit: int = 0) -> Dict[str, Any]:
+    """Return JSON schema dict for a multi-company brands response keyed by company name (at most limit items each)."""
+    return {
+        "name": "brands_multi_schema",
+        "schema": {
+            "type": "object",
+            "properties": {company: _brand_items_schema(limit) for company in companies},
+            "required": list(companies),
+            "additionalProperties": False,
+        },
+    }
+
+
+def repair_schema(kind: str, fields: list[str]) -> Dict[str, Any]:
+    """Return JSON schema dict for a repair response: corrected fields per item index."""
+    return {
+        "name": f"repair_{kind}_schema",
         "schema": {
             "type": "object",
             "properties": {
@@ -50,24 +114,8 @@ def brands_schema() -> Dict[str, Any]:
                     "type": "array",
                     "items": {
                         "type": "object",
-                        "properties": {
-                            "name": {"type": "string"},
-                            "type": {"type": "string"},
-                            "invoice_example": {"type": "string"},
-                            "gpc_segment": {"type": "string"},
-                            "gpc_family": {"type": "string"},
-                            "gpc_class": {"type": "string"},
-                            "gpc_brick": {"type": "string"},
-                        },
-                        "required": [
-                            "name",
-                            "type",
-                            "invoice_example",
-                            "gpc_segment",
-                            "gpc_family",
-                            "gpc_class",
-                            "gpc_brick",
-                        ],
+                        "properties": {"index": {"type": "integer"}, **{field: {"type": "string"} for field in fields}},
+                        "required": ["index", *fields],
                         "additionalProperties": False,
                     },
                 },
@@ -0,0 +1,251 @@
+"""Pluggable storage backend.
+
+Responsibility: Keep the companies / brands mapping stores in one SQLite database
+instead of JSON snapshot + journal files. ``persist`` routes ``load_store``,
+``iter_store``, ``incremental_update`` and ``compact_store`` here once
+``configure_storage("sqlite", ...)`` ran, so callers keep passing the usual JSON
+paths; each path names a store inside the database. Every mapping entry is upserted
+on its own (WAL mode, one short transaction per update), entries are indexed by
+key (group / section or company name) and company name, and ``iter_joined`` streams
+(section, company, brand) rows straight from a join for the flatten step. The JSON
+files stay the import / export format: an empty store is imported from its JSON
+snapshot + journal on first use, and ``export_json`` writes the snapshot back.
+"""
+
+from __future__ import annotations
+import json
+import logging
+import sqlite3
+import threading
+from itertools import chain, groupby, islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+from . import persist
+
+STORAGE_BACKENDS = ("json", "sqlite")
+
+logger = logging.getLogger(__name__)
+
+
+def _company_name(item: Any) -> str | None:
+    return item.get("company_name", "") if isinstance(item, dict) else None
+
+
+class SqliteStorage:
+    """Mapping stores (key -> list of records) kept as rows of one SQLite database.
+
+    ``entries`` holds one row per key with its first-seen position; ``items`` holds
+    one row per list element with the element as JSON text. Reads that stream open
+    their own connection, so they see a consistent snapshot while writers continue.
+    """
+
+    def __init__(self, path: str, batch: int = 1000) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.batch = batch
+        self._lock = threading.Lock()
+        self._ready: set[str] = set()
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "store TEXT NOT NULL, key TEXT NOT NULL, seq INTEGER NOT NULL, PRIMARY KEY (store, key));"
+            "CREATE INDEX IF NOT EXISTS entries_order ON entries(store, seq);"
+            "CREATE TABLE IF NOT EXISTS items ("
+            "store TEXT NOT NULL, key TEXT NOT NULL, position INTEGER NOT NULL, company_name TEXT, "
+            "record TEXT NOT NULL, PRIMARY KEY (store, key, position));"
+            "CREATE INDEX IF NOT EXISTS items_company ON items(store, company_name);"
+        )
+
+    @staticmethod
+    def store_name(path: str) -> str:
+        """Return the store name used for a JSON store path."""
+        return Path(path).as_posix()
+
+    def _transaction(self, work: Callable[[sqlite3.Connection], None]) -> None:
+        """Run work in one IMMEDIATE transaction (serialized across processes)."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                work(self._db)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _put(self, db: sqlite3.Connection, store: str, entries: Iterable[Tuple[str, Any]]) -> int:
+        """Upsert (key, list) entries: new keys go last, existing keys keep their position."""
+        (seq,) = db.execute("SELECT COALESCE(MAX(seq), 0) FROM entries WHERE store = ?", (store,)).fetchone()
+        count = 0
+        for key, value in entries:
+            seq += 1
+            db.execute("INSERT OR IGNORE INTO entries (store, key, seq) VALUES (?, ?, ?)", (store, key, seq))
+            db.execute("DELETE FROM items WHERE store = ? AND key = ?", (store, key))
+            db.executemany(
+                "INSERT INTO items (store, key, position, company_name, record) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (store, key, position, _company_name(item), json.dumps(item, ensure_ascii=False))
+                    for position, item in enumerate(value)
+                ],
+            )
+            count += 1
+        return count
+
+    def _prepare(self, path: str) -> str:
+        """Return the store name, importing the JSON store first if the database has none."""
+        store = self.store_name(path)
+        if store in self._ready:
+            return store
+        with self._lock:
+            empty = self._db.execute("SELECT 1 FROM entries WHERE store = ? LIMIT 1", (store,)).fetchone() is None
+        if empty and (Path(path).exists() or persist.journal_path(path).exists()):
+            self.import_json(path)
+        self._ready.add(store)
+        return store
+
+    def import_json(self, path: str) -> int:
+        """Load a JSON snapshot + journal into its store (journal records win); return entries read."""
+        store = self.store_name(path)
+        records = chain(persist.iter_json_items(path) if Path(path).exists() else (), persist.read_journal(path))
+        count = 0
+        while chunk := list(islice(records, self.batch)):
+            self._transaction(lambda db: self._put(db, store, chunk))
+            count += len(chunk)
+        self._ready.add(store)
+        logger.info(f"Imported {count} entries from {path} into {self.path}")
+        return count
+
+    def export_json(self, path: str) -> int:
+        """Stream the store to its JSON snapshot (dropping any stale journal); return the entries written."""
+        count = persist.save_json_items(path, self.items(path))
+        persist.journal_path(path).unlink(missing_ok=True)
+        logger.info(f"Exported {count} entries from {self.path} to {path}")
+        return count
+
+    def exists(self, path: str) -> bool:
+        """Return True when the store has entries (or a JSON store is waiting to be imported)."""
+        store = self._prepare(path)
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM entries WHERE store = ? LIMIT 1", (store,)).fetchone() is not None
+
+    def upsert(self, path: str, delta: Dict[str, Any]) -> None:
+        """Insert or replace the given entries in one transaction."""
+        store = self._prepare(path)
+        self._transaction(lambda db: self._put(db, store, delta.items()))
+
+    def replace(self, path: str, data: Dict[str, Any]) -> None:
+        """Replace the whole store with data, in data's order."""
+        store = self.store_name(path)
+
+        def work(db: sqlite3.Connection) -> None:
+            db.execute("DELETE FROM items WHERE store = ?", (store,))
+            db.execute("DELETE FROM entries WHERE store = ?", (store,))
+            self._put(db, store, data.items())
+
+        self._transaction(work)
+        self._ready.add(store)
+
+    def rename(self, src: str, dst: str) -> None:
+        """Move the store at src over dst (dst's previous entries are dropped)."""
+        old, new = self.store_name(src), self.store_name(dst)
+
+        def work(db: sqlite3.Connection) -> None:
+            db.execute("DELETE FROM items WHERE store = ?", (new,))
+            db.execute("DELETE FROM entries WHERE store = ?", (new,))
+            db.execute("UPDATE entries SET store = ? WHERE store = ?", (new, old))
+            db.execute("UPDATE items SET store = ? WHERE store = ?", (new, old))
+
+        self._transaction(work)
+        self._ready.add(new)
+        self._ready.discard(old)
+
+    def _read(self) -> sqlite3.Connection:
+        """Open a separate connection for a streaming read."""
+        return sqlite3.connect(self.path, timeout=60)
+
+    def items(self, path: str) -> Iterator[Tuple[str, List[Any]]]:
+        """Stream (key, list) entries in first-seen order."""
+        store = self._prepare(path)
+        db = self._read()
+        try:
+            rows = db.execute(
+                "SELECT e.key, i.record FROM entries e LEFT JOIN items i ON i.store = e.store AND i.key = e.key "
+                "WHERE e.store = ? ORDER BY e.seq, i.position",
+                (store,),
+            )
+            for key, group in groupby(rows, key=lambda row: row[0]):
+                yield key, [json.loads(record) for _, record in group if record is not None]
+        finally:
+            db.close()
+
+    def load(self, path: str) -> Dict[str, Any]:
+        """Return the whole store as a mapping."""
+        return dict(self.items(path))
+
+    def text(self, path: str, key: str) -> str:
+        """Return one entry's list as JSON text ('[]' when missing)."""
+        store = self._prepare(path)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT record FROM items WHERE store = ? AND key = ? ORDER BY position", (store, key)
+            ).fetchall()
+        return f"[{', '.join(record for (record,) in rows)}]"
+
+    def get(self, path: str, key: str) -> List[Any]:
+        """Return one entry's list (empty when missing)."""
+        return json.loads(self.text(path, key))
+
+    def iter_joined(
+        self, companies_path: str, brands_path: str, aliases: Dict[str, str] | None = None
+    ) -> Iterator[Tuple[str, dict, dict | None]]:
+        """Stream (section, company, brand) for every company and each of its brands.
+
+        Companies without brands yield one row with brand None; non-object records are
+        skipped. ``aliases`` maps deduplicated name variants to the canonical brands key.
+        """
+        companies, brands = self._prepare(companies_path), self._prepare(brands_path)
+        db = self._read()
+        try:
+            db.execute("CREATE TEMP TABLE aliases (variant TEXT PRIMARY KEY, canonical TEXT NOT NULL)")
+            db.executemany("INSERT INTO temp.aliases VALUES (?, ?)", (aliases or {}).items())
+            rows = db.execute(
+                "SELECT e.key, c.key, c.position, c.record, b.record FROM entries e "
+                "JOIN items c ON c.store = e.store AND c.key = e.key AND json_type(c.record) = 'object' "
+                "LEFT JOIN temp.aliases a ON a.variant = c.company_name "
+                "LEFT JOIN items b ON b.store = ? AND b.key = COALESCE(a.canonical, c.company_name) "
+                "AND json_type(b.record) = 'object' "
+                "WHERE e.store = ? ORDER BY e.seq, c.position, b.position",
+                (brands, companies),
+            )
+            current, company = None, {}
+            for section, key, position, company_record, brand_record in rows:
+                if (key, position) != current:
+                    current, company = (key, position), json.loads(company_record)
+                yield section, company, json.loads(brand_record) if brand_record is not None else None
+        finally:
+            db.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_STORAGE: SqliteStorage | None = None
+
+
+def configure_storage(backend: str, db_path: str) -> SqliteStorage | None:
+    """Select the process-wide storage backend ('json' keeps the plain files)."""
+    global _STORAGE
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unsupported STORAGE_BACKEND: {backend}. Use one of {', '.join(STORAGE_BACKENDS)}.")
+    if _STORAGE is not None:
+        _STORAGE.close()
+    _STORAGE = SqliteStorage(db_path) if backend == "sqlite" else None
+    persist.use_backend(_STORAGE)
+    return _STORAGE
+
+
+def get_storage() -> SqliteStorage | None:
+    """Return the configured SQLite storage, if any."""
+    return _STORAGE
@@ -0,0 +1,369 @@
+"""Run telemetry.
+
+Responsibility: Record per-call latency, token usage, item counts and retries,
+item-level validation outcomes (invalid / repaired / dropped, per field), items
+and completion tokens wasted on lists truncated to the MAX_* limits, hedged
+requests (rate, wins, latency saved, extra spend), attribute non-API time
+(persistence, flatten, rate-limit waits) to named stages, and export the
+roll-up as a JSON run report or a Prometheus textfile.
+"""
+
+from __future__ import annotations
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+# USD per 1M tokens: (input, cached input, output). Unknown models are reported without cost.
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+}
+
+
+def phase_for_schema(schema_name: str) -> str:
+    """Map a response schema name to its pipeline phase ('companies' / 'brands' / 'repair')."""
+    if schema_name.startswith("repair"):
+        return "repair"
+    return "companies" if schema_name.startswith("companies") else "brands"
+
+
+def call_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int) -> float:
+    """Return the estimated USD cost of one call (0 for models without a price entry)."""
+    price = next((p for name, p in sorted(MODEL_PRICES.items(), key=lambda kv: -len(kv[0])) if model.startswith(name)), None)
+    if price is None:
+        return 0.0
+    return ((prompt_tokens - cached_tokens) * price[0] + cached_tokens * price[1] + completion_tokens * price[2]) / 1e6
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an unsorted list (0 for empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class PhaseStats:
+    """Accumulated call metrics for one phase."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.cache_hits = 0
+        self.retries = 0
+        self.items = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.cost_usd = 0.0
+        self.latencies: List[float] = []
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.models: Dict[str, float] = {}
+        self.validated = 0
+        self.invalid = 0
+        self.repaired = 0
+        self.dropped = 0
+        self.field_issues: Dict[str, int] = {}
+        self.truncated_items = 0
+        self.truncated_tokens = 0
+        self.token_cap_hits = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.hedge_saved_seconds = 0.0
+        self.hedge_tokens = 0
+        self.hedge_cost_usd = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return a JSON-ready summary including latency histogram and percentiles."""
+        cumulative, histogram = 0, {}
+        for le, count in zip([*map(str, LATENCY_BUCKETS), "+Inf"], self.bucket_counts):
+            cumulative += count
+            histogram[le] = cumulative
+        return {
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "retries": self.retries,
+            "items": self.items,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "cost_usd_by_model": {m: round(c, 6) for m, c in self.models.items()},
+            "latency_seconds": {
+                "sum": round(sum(self.latencies), 3),
+                "p50": round(_percentile(self.latencies, 0.50), 3),
+                "p90": round(_percentile(self.latencies, 0.90), 3),
+                "p99": round(_percentile(self.latencies, 0.99), 3),
+                "max": round(max(self.latencies, default=0.0), 3),
+                "histogram": histogram,
+            },
+            "validation": {
+                "items": self.validated,
+                "invalid": self.invalid,
+                "repaired": self.repaired,
+                "dropped": self.dropped,
+                "field_issues": dict(sorted(self.field_issues.items())),
+            },
+            "limits": {
+                "truncated_items": self.truncated_items,
+                "truncated_tokens": self.truncated_tokens,
+                "token_cap_hits": self.token_cap_hits,
+            },
+            "hedging": {
+                "hedges": self.hedges,
+                "wins": self.hedge_wins,
+                "hedge_rate": round(self.hedges / self.calls, 4) if self.calls else 0.0,
+                "saved_seconds": round(self.hedge_saved_seconds, 3),
+                "extra_tokens": self.hedge_tokens,
+                "extra_cost_usd": round(self.hedge_cost_usd, 6),
+            },
+        }
+
+
+class Telemetry:
+    """Thread-safe collector of call metrics and stage timings for one run."""
+
+    def __init__(self) -> None:
+        self.started = time.time()
+        self.phases: Dict[str, PhaseStats] = {}
+        self.stages: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record_call(
+        self,
+        phase: str,
+        model: str,
+        latency: float,
+        items: int,
+        usage: Any = None,
+        retries: int = 0,
+        cache_hit: bool = False,
+    ) -> None:
+        """Record one ask_* call; ``usage`` is the SDK usage object (None for cache hits)."""
+        prompt = getattr(usage, "prompt_tokens", 0) or 0
+        completion = getattr(usage, "completion_tokens", 0) or 0
+        cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0
+        cost = call_cost(model, prompt, completion, cached)
+        with self._lock:
+            stats = self.phases.setdefault(phase, PhaseStats())
+            stats.items += items
+            if cache_hit:
+                stats.cache_hits += 1
+                return
+            stats.calls += 1
+            stats.retries += retries
+            stats.prompt_tokens += prompt
+            stats.completion_tokens += completion
+            stats.cached_tokens += cached
+            stats.cost_usd += cost
+            stats.models[model] = stats.models.get(model, 0.0) + cost
+            stats.latencies.append(latency)
+            stats.bucket_counts[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def record_validation(
+        self,
+        phase: str,
+        items: int,
+        field_issues: Dict[str, int] | None = None,
+        invalid: int = 0,
+        repaired: int = 0,
+        dropped: int = 0,
+    ) -> None:
+        """Record the validation outcome of one response's items (``field_issues``: field -> offending items)."""
+        with self._lock:
+            stats = self.phases.setdefault(phase, PhaseStats())
+            stats.validated += items
+            stats.invalid += invalid
+            stats.repaired += repaired
+            stats.dropped += dropped
+            for field, count in (field_issues or {}).items():
+                stats.field_issues[field] = stats.field_issues.get(field, 0) + count
+
+    def record_truncation(self, phase: str, items: int, tokens: int) -> None:
+        """Record items cut by a MAX_* limit after generation and their (estimated) completion tokens."""
+        with self._lock:
+            stats = self.phases.setdefault(phase, PhaseStats())
+            stats.truncated_items += items
+            stats.truncated_tokens += tokens
+
+    def record_token_cap_hit(self, phase: str) -> None:
+        """Record a response cut off by its output-token cap (and requested again uncapped)."""
+        with self._lock:
+            self.phases.setdefault(phase, PhaseStats()).token_cap_hits += 1
+
+    def record_hedge(
+        self,
+        phase: str,
+        model: str = "",
+        usage: Any = None,
+        launched: bool = False,
+        won: bool = False,
+        saved: float = 0.0,
+    ) -> None:
+        """Record one hedge event for phase.
+
+        ``launched``: a duplicate request started; ``won``: the duplicate answered first;
+        ``usage``: an abandoned request finished, which is extra spend (also added to the
+        phase's token and cost totals) after the winner saved ``saved`` seconds.
+        """
+        prompt = getattr(usage, "prompt_tokens", 0) or 0
+        completion = getattr(usage, "completion_tokens", 0) or 0
+        cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0
+        cost = call_cost(model, prompt, completion, cached) if usage is not None else 0.0
+        with self._lock:
+            stats = self.phases.setdefault(phase, PhaseStats())
+            stats.hedges += launched
+            stats.hedge_wins += won
+            stats.hedge_saved_seconds += saved
+            if usage is not None:
+                stats.hedge_tokens += prompt + completion
+                stats.hedge_cost_usd += cost
+                stats.prompt_tokens += prompt
+                stats.completion_tokens += completion
+                stats.cached_tokens += cached
+                stats.cost_usd += cost
+                stats.models[model] = stats.models.get(model, 0.0) + cost
+
+    def add_stage_time(self, stage: str, seconds: float) -> None:
+        """Attribute seconds to a non-API stage (persistence, flatten, rate_limit_wait...)."""
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        """Context manager adding the enclosed wall time to ``stage``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage_time(stage, time.perf_counter() - start)
+
+    def report(self) -> Dict[str, Any]:
+        """Return the machine-readable run report."""
+        with self._lock:
+            phases = {name: stats.as_dict() for name, stats in self.phases.items()}
+            stages = {name: round(seconds, 3) for name, seconds in self.stages.items()}
+        elapsed = time.time() - self.started
+        items = sum(p["items"] for p in phases.values())
+        return {
+            "started": self.started,
+            "elapsed_seconds": round(elapsed, 3),
+            "items_per_second": round(items / elapsed, 3) if elapsed else 0.0,
+            "cost_usd": round(sum(p["cost_usd"] for p in phases.values()), 6),
+            "phases": phases,
+            "stages_seconds": stages,
+        }
+
+    def write_report(self, path: str) -> None:
+        """Write the JSON run report to path."""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(json.dumps(self.report(), indent=2), encoding="utf-8")
+
+    def write_prometheus(self, path: str) -> None:
+        """Write metrics in Prometheus textfile-collector format (atomic replace)."""
+        report = self.report()
+        lines = [
+            "# HELP brandgen_api_call_latency_seconds API call latency per phase.",
+            "# TYPE brandgen_api_call_latency_seconds histogram",
+        ]
+        for phase, stats in report["phases"].items():
+            for le, count in stats["latency_seconds"]["histogram"].items():
+                lines.append(f'brandgen_api_call_latency_seconds_bucket{{phase="{phase}",le="{le}"}} {count}')
+            lines.append(f'brandgen_api_call_latency_seconds_sum{{phase="{phase}"}} {stats["latency_seconds"]["sum"]}')
+            lines.append(f'brandgen_api_call_latency_seconds_count{{phase="{phase}"}} {stats["calls"]}')
+        counters = (
+            ("brandgen_api_calls_total", "calls"),
+            ("brandgen_cache_hits_total", "cache_hits"),
+            ("brandgen_retries_total", "retries"),
+            ("brandgen_items_total", "items"),
+            ("brandgen_prompt_tokens_total", "prompt_tokens"),
+            ("brandgen_completion_tokens_total", "completion_tokens"),
+            ("brandgen_cached_tokens_total", "cached_tokens"),
+            ("brandgen_cost_usd_total", "cost_usd"),
+        )
+        for metric, key in counters:
+            lines.append(f"# TYPE {metric} counter")
+            lines.extend(f'{metric}{{phase="{phase}"}} {stats[key]}' for phase, stats in report["phases"].items())
+        for metric, key in (
+            ("brandgen_items_validated_total", "items"),
+            ("brandgen_items_invalid_total", "invalid"),
+            ("brandgen_items_repaired_total", "repaired"),
+            ("brandgen_items_dropped_total", "dropped"),
+        ):
+            lines.append(f"# TYPE {metric} counter")
+            lines.extend(f'{metric}{{phase="{phase}"}} {stats["validation"][key]}' for phase, stats in report["phases"].items())
+        for metric, key in (
+            ("brandgen_truncated_items_total", "truncated_items"),
+            ("brandgen_truncated_tokens_total", "truncated_tokens"),
+            ("brandgen_token_cap_hits_total", "token_cap_hits"),
+        ):
+            lines.append(f"# TYPE {metric} counter")
+            lines.extend(f'{metric}{{phase="{phase}"}} {stats["limits"][key]}' for phase, stats in report["phases"].items())
+        for metric, key in (
+            ("brandgen_hedges_total", "hedges"),
+            ("brandgen_hedge_wins_total", "wins"),
+            ("brandgen_hedge_saved_seconds_total", "saved_seconds"),
+            ("brandgen_hedge_extra_tokens_total", "extra_tokens"),
+            ("brandgen_hedge_extra_cost_usd_total", "extra_cost_usd"),
+        ):
+            lines.append(f"# TYPE {metric} counter")
+            lines.extend(f'{metric}{{phase="{phase}"}} {stats["hedging"][key]}' for phase, stats in report["phases"].items())
+        lines.append("# TYPE brandgen_field_issues_total counter")
+        lines.extend(
+            f'brandgen_field_issues_total{{phase="{phase}",field="{field}"}} {count}'
+            for phase, stats in report["phases"].items()
+            for field, count in stats["validation"]["field_issues"].items()
+        )
+        lines.append("# TYPE brandgen_stage_seconds_total counter")
+        lines.extend(f'brandgen_stage_seconds_total{{stage="{stage}"}} {seconds}' for stage, seconds in report["stages_seconds"].items())
+        p = Path(path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix(p.suffix + ".tmp")
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        tmp.replace(p)
+
+    def summary(self) -> List[str]:
+        """Return one human-readable line per phase and one for stage timings."""
+        report = self.report()
+        lines = [
+            f"{phase}: calls={s['calls']} cache_hits={s['cache_hits']} retries={s['retries']} items={s['items']} "
+            f"tokens={s['prompt_tokens']}+{s['completion_tokens']} (cached {s['cached_tokens']}) "
+            f"p50={s['latency_seconds']['p50']}s p99={s['latency_seconds']['p99']}s cost=${s['cost_usd']:.4f}"
+            for phase, s in report["phases"].items()
+        ]
+        lines.extend(
+            f"{phase} validation: items={v['items']} invalid={v['invalid']} repaired={v['repaired']} "
+            f"dropped={v['dropped']} fields={v['field_issues']}"
+            for phase, v in ((phase, s["validation"]) for phase, s in report["phases"].items())
+            if v["invalid"]
+        )
+        lines.extend(
+            f"{phase} limits: truncated_items={v['truncated_items']} wasted_tokens~{v['truncated_tokens']} "
+            f"token_cap_hits={v['token_cap_hits']}"
+            for phase, v in ((phase, s["limits"]) for phase, s in report["phases"].items())
+            if any(v.values())
+        )
+        lines.extend(
+            f"{phase} hedging: hedges={v['hedges']} rate={v['hedge_rate']:.2%} wins={v['wins']} "
+            f"saved={v['saved_seconds']}s extra_tokens={v['extra_tokens']} extra_cost=${v['extra_cost_usd']:.4f}"
+            for phase, v in ((phase, s["hedging"]) for phase, s in report["phases"].items())
+            if v["hedges"]
+        )
+        lines.append(f"stages: {report['stages_seconds']}")
+        return lines
+
+
+_TELEMETRY = Telemetry()
+
+
+def get_telemetry() -> Telemetry:
+    """Return the process-wide telemetry collector."""
+    return _TELEMETRY
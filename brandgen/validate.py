@@ -0,0 +1,127 @@
+"""Response item validation.
+
+Responsibility: Check every generated company / brand item against validators
+compiled once from the item schemas in ``schemas.py`` (types, required fields,
+no extra keys) plus format rules the schemas cannot express (non-empty names,
+8-digit GPC codes nested segment > family > class). Report the offending fields
+per item so api.py can repair just those, and blank or drop what a repair does
+not fix.
+"""
+
+from __future__ import annotations
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Tuple
+from .schemas import brands_schema, companies_schema
+
+VALIDATION_MODES = ("off", "drop", "repair")
+GPC_FIELDS = ("gpc_segment", "gpc_family", "gpc_class", "gpc_brick")
+EXTRA_KEYS = "additional_properties"  # pseudo-field reported for keys outside the schema
+NOT_AN_OBJECT = "item"  # pseudo-field reported for list entries that are not objects
+
+_GPC_CODE = re.compile(r"\d{8}")
+# field -> (parent field, leading digits shared with the parent code)
+GPC_PARENTS = {"gpc_family": ("gpc_segment", 2), "gpc_class": ("gpc_family", 4)}
+# fields that may not be empty; other string fields may be "" (the prompts ask for "" when uncertain)
+NON_EMPTY = {"company_name", "name"}
+
+FIELD_RULES = {
+    "company_name": "non-empty company name",
+    "name": "non-empty brand / product / service name",
+    "gpc_segment": 'GS1 GPC segment code, 8 digits (e.g. "50000000"), or "" if unknown',
+    "gpc_family": 'GS1 GPC family code, 8 digits starting with the segment\'s first 2 digits, or ""',
+    "gpc_class": 'GS1 GPC class code, 8 digits starting with the family\'s first 4 digits, or ""',
+    "gpc_brick": 'GS1 GPC brick code, 8 digits, or ""',
+}
+
+_Check = Callable[[Dict[str, Any]], bool]
+
+
+def _format_check(field: str) -> _Check | None:
+    """Return the format rule for field (True = valid), or None when the schema type is enough."""
+    if field in NON_EMPTY:
+        return lambda item: bool(item[field].strip())
+    if field in GPC_PARENTS:
+        parent, digits = GPC_PARENTS[field]
+
+        def nested(item: Dict[str, Any]) -> bool:
+            code, above = item[field], item.get(parent)
+            if not code:
+                return True
+            if not _GPC_CODE.fullmatch(code):
+                return False
+            # only compare against a well-formed parent; a bad parent is reported on its own
+            return not (isinstance(above, str) and _GPC_CODE.fullmatch(above)) or code[:digits] == above[:digits]
+
+        return nested
+    if field in GPC_FIELDS:
+        return lambda item: not item[field] or bool(_GPC_CODE.fullmatch(item[field]))
+    return None
+
+
+class ItemValidator:
+    """Validator compiled from one JSON item schema (an object schema with properties)."""
+
+    def __init__(self, item_schema: Dict[str, Any]) -> None:
+        properties = item_schema["properties"]
+        self.fields: Tuple[str, ...] = tuple(properties)
+        self.required = frozenset(item_schema.get("required", ()))
+        self.closed = item_schema.get("additionalProperties", True) is False
+        self.allow_empty = frozenset(f for f in self.fields if f not in NON_EMPTY)
+        types = {"string": str, "integer": int, "number": (int, float), "boolean": bool}
+        self._checks: List[Tuple[str, type | tuple, _Check | None]] = [
+            (field, types.get(spec.get("type"), object), _format_check(field)) for field, spec in properties.items()
+        ]
+
+    def issues(self, item: Any) -> Tuple[str, ...]:
+        """Return the offending field names of item (empty when valid)."""
+        if not isinstance(item, dict):
+            return (NOT_AN_OBJECT,)
+        bad = []
+        for field, kind, check in self._checks:
+            value = item.get(field)
+            if value is None:
+                if field in self.required:
+                    bad.append(field)
+            elif not isinstance(value, kind) or (check is not None and not check(item)):
+                bad.append(field)
+        if self.closed and len(item) > len(self.fields) and any(key not in self.fields for key in item):
+            bad.append(EXTRA_KEYS)
+        return tuple(bad)
+
+    def settle(self, item: Dict[str, Any], fields: Tuple[str, ...]) -> Dict[str, Any] | None:
+        """Return item with the unrepaired fields blanked, or None when one of them may not be empty.
+
+        Keys outside the schema are removed.
+        """
+        if NOT_AN_OBJECT in fields or any(f not in self.allow_empty for f in fields if f != EXTRA_KEYS):
+            return None
+        blank = set(fields)
+        return {field: "" if field in blank else item.get(field, "") for field in self.fields}
+
+
+@lru_cache(maxsize=None)
+def item_validator(kind: str) -> ItemValidator:
+    """Return the compiled validator for 'companies' or 'brands' items."""
+    if kind == "companies":
+        return ItemValidator(companies_schema()["schema"]["properties"]["companies"]["items"])
+    if kind == "brands":
+        return ItemValidator(brands_schema()["schema"]["properties"]["items"]["items"])
+    raise ValueError(f"Unknown item kind: {kind}. Use companies or brands.")
+
+
+_MODE = "off"
+
+
+def configure_validation(mode: str) -> str:
+    """Set the process-wide validation mode ('off', 'drop' or 'repair')."""
+    global _MODE
+    if mode not in VALIDATION_MODES:
+        raise ValueError(f"Unsupported VALIDATION_MODE: {mode}. Use one of {', '.join(VALIDATION_MODES)}.")
+    _MODE = mode
+    return _MODE
+
+
+def get_validation_mode() -> str:
+    """Return the configured validation mode."""
+    return _MODE
@@ -0,0 +1,216 @@
+"""Wikidata brand lookup.
+
+Responsibility: Index ``data/wikidata/wiki_labels.csv`` (brand -> owner rows) so
+company names can be resolved to known brands without an API call. Owner and brand
+labels / aliases are normalized into a hash index, and an Aho-Corasick automaton
+over owner labels finds owners embedded in longer company names ("Google Egypt LLC").
+An embedded owner is used only when its label has several tokens or the rest of the
+name is country names and legal suffixes, so generic one-word owners ("Canal",
+"Park", "Metro") never claim unrelated companies. Brand labels held by several
+owners are dropped. The built index is pickled next to the response cache and
+reused while the CSV is unchanged.
+"""
+
+from __future__ import annotations
+import csv
+import logging
+import pickle
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+from .dedup import LEGAL_SUFFIXES, normalize_name
+
+
+INDEX_VERSION = 2
+MIN_EMBEDDED_LABEL = 4  # shortest normalized owner label matched inside a longer company name
+WIKIDATA_MODES = ("off", "ground", "answer")
+
+logger = logging.getLogger(__name__)
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher over normalized text (pure Python, picklable)."""
+
+    def __init__(self, patterns: List[str]) -> None:
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[int]] = [[]]
+        for pid, pattern in enumerate(patterns):
+            state = 0
+            for ch in pattern:
+                if ch not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                    self.goto[state][ch] = len(self.goto) - 1
+                state = self.goto[state][ch]
+            self.out[state].append(pid)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0) if self.goto[f].get(ch, 0) != nxt else 0
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def find(self, text: str) -> List[Tuple[int, int]]:
+        """Return (end offset, pattern id) for every pattern occurrence in text."""
+        hits, state = [], 0
+        for i, ch in enumerate(text):
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            hits.extend((i, pid) for pid in self.out[state])
+        return hits
+
+
+class WikidataIndex:
+    """Company name -> known brand labels, built from the Wikidata export CSV."""
+
+    def __init__(self, csv_path: str, mode: str = "ground") -> None:
+        self.mode = mode
+        self.owner_brands: Dict[str, List[str]] = {}  # normalized owner label -> brand labels
+        self.brand_owner: Dict[str, str] = {}  # normalized brand label / alias -> normalized owner label
+        self.countries: Set[str] = set()  # normalized country names allowed around an embedded owner
+        ambiguous: Set[str] = set()
+        with Path(csv_path).open("r", encoding="utf-8", newline="") as fh:
+            for row in csv.DictReader(fh):
+                self.countries.add(normalize_name(row.get("countryLabel", "")))
+                owner, brand = normalize_name(row.get("ownerLabel", "")), row.get("brandLabel", "").strip()
+                if not owner or not brand or brand.startswith("Q") and brand[1:].isdigit():
+                    continue  # unlabeled entities export their Q-id as label
+                brands = self.owner_brands.setdefault(owner, [])
+                if brand not in brands:
+                    brands.append(brand)
+                for label in {normalize_name(label) for label in [brand, *row.get("brandAlt_en", "").split("|")]}:
+                    if label in ambiguous or self.brand_owner.setdefault(label, owner) == owner:
+                        continue
+                    del self.brand_owner[label]  # held by two owners: resolving it to either would be a guess
+                    ambiguous.add(label)
+        self.brand_owner.pop("", None)
+        self.countries.discard("")
+        if ambiguous:
+            logger.info(f"Wikidata: dropped {len(ambiguous)} brand labels held by several owners")
+        self._resolved: Dict[str, str | None] = {}
+        self.owners = [owner for owner in self.owner_brands if len(owner) >= MIN_EMBEDDED_LABEL]
+        self.automaton = AhoCorasick([f" {owner} " for owner in self.owners])
+
+    def add_countries(self, countries: Iterable[str]) -> None:
+        """Also accept these country names (e.g. the run's COUNTRY list) around an embedded owner."""
+        self.countries.update(filter(None, map(normalize_name, countries)))
+        self._resolved.clear()
+
+    def _qualifiers_only(self, tokens: List[str]) -> bool:
+        """True when tokens are only country names and legal suffixes ("egypt", "saudi arabia", "sae")."""
+        i = 0
+        while i < len(tokens):
+            if tokens[i] in LEGAL_SUFFIXES:
+                i += 1
+                continue
+            span = next((n for n in range(len(tokens) - i, 0, -1) if " ".join(tokens[i : i + n]) in self.countries), 0)
+            if not span:
+                return False
+            i += span
+        return True
+
+    def owner_for(self, company: str) -> str | None:
+        """Resolve a company name to a Wikidata owner: exact owner, exact brand/alias, then embedded owner.
+
+        An embedded owner counts only if its label has several tokens or the rest of the
+        name is country names / legal suffixes; of nested owners ("japan tobacco" inside
+        "japan tobacco international") the longest wins. Skipped and ambiguous hits
+        (unrelated owners qualify) are logged once and resolve to None.
+        """
+        norm = normalize_name(company)
+        if norm in self.owner_brands:
+            return norm
+        if norm in self.brand_owner:
+            return self.brand_owner[norm]
+        if norm in self._resolved:
+            return self._resolved[norm]
+        text = f" {norm} "
+        accepted, skipped = set(), set()
+        for end, pid in self.automaton.find(text):
+            owner = self.owners[pid]
+            start = end - len(owner) - 1  # the pattern is " owner "
+            rest = (text[:start] + text[end:]).split()
+            (accepted if " " in owner or self._qualifiers_only(rest) else skipped).add(owner)
+        owner = max(accepted, key=len) if accepted else None
+        if owner and any(f" {other} " not in f" {owner} " for other in accepted):
+            logger.info(f"Wikidata: {company!r} matches several owners {sorted(accepted)}; not using any")
+            owner = None
+        elif not owner and skipped:
+            logger.info(f"Wikidata: {company!r} only contains one-word owner labels {sorted(skipped)}; not using them")
+        self._resolved[norm] = owner
+        return owner
+
+    def known_brands(self, company: str) -> List[str]:
+        """Return brand labels Wikidata lists for the company (empty when unknown)."""
+        owner = self.owner_for(company)
+        return list(self.owner_brands[owner]) if owner else []
+
+    def brand_items(self, company: str, limit: int = 0) -> List[Dict[str, str]]:
+        """Return schema-shaped brand items for the company; GPC / invoice fields stay empty."""
+        brands = self.known_brands(company)
+        if limit > 0:
+            brands = brands[:limit]
+        return [
+            {
+                "name": brand,
+                "type": "brand",
+                "invoice_example": "",
+                "gpc_segment": "",
+                "gpc_family": "",
+                "gpc_class": "",
+                "gpc_brick": "",
+            }
+            for brand in brands
+        ]
+
+
+def load_wikidata_index(csv_path: str, index_path: str, mode: str) -> WikidataIndex:
+    """Load the pickled index when it matches the CSV (mtime, size), else build and pickle it."""
+    stat = Path(csv_path).stat()
+    key = (INDEX_VERSION, str(Path(csv_path).resolve()), stat.st_mtime_ns, stat.st_size)
+    p = Path(index_path)
+    if p.exists():
+        with p.open("rb") as fh:
+            cached_key, index = pickle.load(fh)
+        if cached_key == key:
+            index.mode = mode
+            return index
+    index = WikidataIndex(csv_path, mode)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_suffix(p.suffix + ".tmp")
+    with tmp.open("wb") as fh:
+        pickle.dump((key, index), fh, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp.replace(p)
+    logger.info(f"Built Wikidata index: {len(index.owner_brands)} owners, {len(index.brand_owner)} brand labels -> {p}")
+    return index
+
+
+_WIKIDATA: WikidataIndex | None = None
+
+
+def configure_wikidata(mode: str, csv_path: str, index_path: str, countries: Iterable[str] = ()) -> WikidataIndex | None:
+    """Create the process-wide Wikidata index (None when mode is 'off' or the CSV is missing).
+
+    countries (the run's COUNTRY list) join the CSV's country labels as names allowed
+    around an embedded owner ("PepsiCo Egypt").
+    """
+    global _WIKIDATA
+    if mode not in WIKIDATA_MODES:
+        raise ValueError(f"Unsupported WIKIDATA_MODE: {mode}. Use one of {', '.join(WIKIDATA_MODES)}.")
+    _WIKIDATA = None
+    if mode != "off" and Path(csv_path).exists():
+        _WIKIDATA = load_wikidata_index(csv_path, index_path, mode)
+        _WIKIDATA.add_countries(countries)
+    return _WIKIDATA
+
+
+def get_wikidata() -> WikidataIndex | None:
+    """Return the configured Wikidata index, if any."""
+    return _WIKIDATA
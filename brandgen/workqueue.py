@@ -0,0 +1,291 @@
+"""Leased work queue.
+
+Responsibility: Coordinate several ``generate.py`` workers (threads, processes or
+hosts sharing a filesystem) through one SQLite file. Companies groups and brand
+companies are enqueued once; workers claim disjoint items under a time-limited
+lease, keep it alive with heartbeats, and record results. Expired leases return to
+the pool, a result is accepted only once, and once the queue drains exactly one
+worker (``claim_merge``) rebuilds the usual ``companies.json`` / ``brands.json``
+layout from the finished items with ``merge_to_json``. With company dedup on,
+names are clustered through the queue's ``names`` table (``canonicalize``), so every
+worker maps a variant to the same canonical name and requests its brands once.
+"""
+
+from __future__ import annotations
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Tuple
+from .persist import compact_store
+
+if TYPE_CHECKING:
+    from .dedup import NameIndex
+
+
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+MERGE = "merge"  # kind of the single row that elects the worker merging the results
+
+
+def default_worker_id() -> str:
+    """Return host:pid, unique across the workers sharing a queue."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """SQLite-backed queue of ``(kind, key)`` items with leases, heartbeats and expiry.
+
+    Every state change runs in an IMMEDIATE transaction, so concurrent workers never
+    claim the same live item. Items failing ``max_attempts`` times are parked as failed.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        worker_id: str | None = None,
+        lease_seconds: float = 300.0,
+        max_attempts: int = 5,
+    ) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            "kind TEXT NOT NULL, key TEXT NOT NULL, state TEXT NOT NULL, worker TEXT, "
+            "lease_until REAL NOT NULL DEFAULT 0, attempts INTEGER NOT NULL DEFAULT 0, "
+            "result TEXT, error TEXT, updated REAL NOT NULL, PRIMARY KEY (kind, key))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS items_claim ON items(kind, state, lease_until)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS names ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE, canonical TEXT NOT NULL)"
+        )
+        self._names_seq = 0  # last names row replayed into the local index
+
+    def _write(self, sql_batches: Iterable[Tuple[str, Any]]) -> List[sqlite3.Cursor]:
+        """Run statements in one IMMEDIATE transaction (serialized across processes)."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                cursors = [self._db.execute(sql, params) for sql, params in sql_batches]
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            return cursors
+
+    def enqueue(self, kind: str, keys: Iterable[str]) -> int:
+        """Add pending items (existing items keep their state); return how many were new."""
+        now = time.time()
+        cursors = self._write(
+            ("INSERT OR IGNORE INTO items (kind, key, state, updated) VALUES (?, ?, ?, ?)", (kind, key, PENDING, now))
+            for key in keys
+        )
+        return sum(c.rowcount for c in cursors)
+
+    def seed(self, kind: str, results: Dict[str, Any]) -> int:
+        """Record results produced outside the queue (e.g. an existing JSON store) as done."""
+        now = time.time()
+        cursors = self._write(
+            (
+                "INSERT OR IGNORE INTO items (kind, key, state, result, updated) VALUES (?, ?, ?, ?, ?)",
+                (kind, key, DONE, json.dumps(value, ensure_ascii=False), now),
+            )
+            for key, value in results.items()
+            if value
+        )
+        return sum(c.rowcount for c in cursors)
+
+    def claim(self, kind: str, limit: int) -> List[str]:
+        """Lease up to limit pending or expired items for this worker; return their keys."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                keys = [
+                    row[0]
+                    for row in self._db.execute(
+                        "SELECT key FROM items WHERE kind = ? AND (state = ? OR (state = ? AND lease_until < ?)) "
+                        "ORDER BY rowid LIMIT ?",
+                        (kind, PENDING, LEASED, now, limit),
+                    )
+                ]
+                self._db.executemany(
+                    "UPDATE items SET state = ?, worker = ?, lease_until = ?, attempts = attempts + 1, updated = ? "
+                    "WHERE kind = ? AND key = ?",
+                    [(LEASED, self.worker_id, now + self.lease_seconds, now, kind, key) for key in keys],
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return keys
+
+    def heartbeat(self) -> int:
+        """Extend every lease this worker holds; return how many were extended."""
+        now = time.time()
+        (cursor,) = self._write(
+            [(
+                "UPDATE items SET lease_until = ?, updated = ? WHERE state = ? AND worker = ?",
+                (now + self.lease_seconds, now, LEASED, self.worker_id),
+            )]
+        )
+        return cursor.rowcount
+
+    def complete(self, kind: str, key: str, result: Any) -> bool:
+        """Store the result unless another worker already finished the item; return True if stored."""
+        (cursor,) = self._write(
+            [(
+                "UPDATE items SET state = ?, result = ?, worker = ?, error = NULL, updated = ? "
+                "WHERE kind = ? AND key = ? AND state != ?",
+                (DONE, json.dumps(result, ensure_ascii=False), self.worker_id, time.time(), kind, key, DONE),
+            )]
+        )
+        return cursor.rowcount == 1
+
+    def release(self, kind: str, key: str, error: str) -> None:
+        """Give a leased item back after a failure (parked as failed after max_attempts)."""
+        self._write(
+            [(
+                "UPDATE items SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, lease_until = 0, "
+                "error = ?, updated = ? WHERE kind = ? AND key = ? AND state = ? AND worker = ?",
+                (self.max_attempts, FAILED, PENDING, error, time.time(), kind, key, LEASED, self.worker_id),
+            )]
+        )
+
+    def claim_merge(self) -> bool:
+        """Elect this worker to merge the finished items; return False when another worker does.
+
+        The merge row is claimed under a lease like any item. It can be claimed again
+        once that lease expires (the merging worker died) or, after ``finish_merge``,
+        once newer results arrive.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT state, lease_until, updated FROM items WHERE kind = ? AND key = ''", (MERGE,)
+                ).fetchone()
+                (latest,) = self._db.execute(
+                    "SELECT COALESCE(MAX(updated), 0) FROM items WHERE kind != ?", (MERGE,)
+                ).fetchone()
+                claim = (
+                    row is None
+                    or (row[0] == LEASED and row[1] < now)
+                    or (row[0] == DONE and row[2] < latest)
+                )
+                if claim:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO items (kind, key, state, worker, lease_until, updated) VALUES (?, '', ?, ?, ?, ?)",
+                        (MERGE, LEASED, self.worker_id, now + self.lease_seconds, now),
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return claim
+
+    def finish_merge(self) -> None:
+        """Mark this worker's merge as done (the merged files are complete)."""
+        now = time.time()
+        self._write(
+            [(
+                "UPDATE items SET state = ?, lease_until = 0, updated = ? WHERE kind = ? AND key = '' AND worker = ?",
+                (DONE, now, MERGE, self.worker_id),
+            )]
+        )
+
+    def canonicalize(self, names: Iterable[str], index: "NameIndex") -> List[str]:
+        """Return the canonical name of each name, clustered consistently across workers.
+
+        Names clustered by other workers are first replayed into index in the order they
+        were recorded; names new to the queue are then added and recorded, all in one
+        IMMEDIATE transaction so no two workers cluster concurrently.
+        """
+        names = list(names)  # may stream from this queue (e.g. ``results``): read before locking
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for seq, name, canonical in self._db.execute(
+                    "SELECT seq, name, canonical FROM names WHERE seq > ? ORDER BY seq", (self._names_seq,)
+                ).fetchall():
+                    index.adopt(name, canonical)
+                    self._names_seq = seq
+                canonicals = []
+                for name in names:
+                    canonical = index.add(name)
+                    cursor = self._db.execute(
+                        "INSERT OR IGNORE INTO names (name, canonical) VALUES (?, ?)", (name, canonical)
+                    )
+                    if cursor.rowcount:
+                        self._names_seq = cursor.lastrowid
+                    canonicals.append(canonical)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                self._names_seq = 0  # replay everything next time; adopt is idempotent
+                raise
+        return canonicals
+
+    def counts(self, kind: str) -> Dict[str, int]:
+        """Return item counts per state for kind."""
+        with self._lock:
+            rows = self._db.execute("SELECT state, COUNT(*) FROM items WHERE kind = ? GROUP BY state", (kind,)).fetchall()
+        return {state: count for state, count in rows}
+
+    def outstanding(self, kind: str) -> int:
+        """Items of kind that are still pending or leased (by anyone)."""
+        counts = self.counts(kind)
+        return counts.get(PENDING, 0) + counts.get(LEASED, 0)
+
+    def results(self, kind: str) -> Iterator[Tuple[str, Any]]:
+        """Stream (key, result) for finished items in enqueue order."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, result FROM items WHERE kind = ? AND state = ? ORDER BY rowid", (kind, DONE)
+            ).fetchall()
+        for key, result in rows:
+            yield key, json.loads(result)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class LeaseKeeper:
+    """Background thread calling ``queue.heartbeat()`` every third of the lease while open."""
+
+    def __init__(self, queue: WorkQueue) -> None:
+        self.queue = queue
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lease-keeper", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            self.queue.heartbeat()
+
+    def __enter__(self) -> "LeaseKeeper":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def merge_to_json(queue: WorkQueue, kind: str, path: str, order: Iterable[str] = ()) -> Dict[str, Any]:
+    """Write finished items of kind as a JSON store snapshot (``order`` keys first); return the mapping."""
+    results = dict(queue.results(kind))
+    merged = {key: results[key] for key in order if key in results}
+    merged.update({key: value for key, value in results.items() if key not in merged})
+    compact_store(path, merged)
+    return merged
@@ -6,33 +6,137 @@ Uses the internal brandgen package modules for:
 - OpenAI schema-constrained calls
 - persistence (JSON save/load)
 - CSV flattening
+
+Run ``python generate.py <mode>`` (see ``--help``) or without a mode for the
+interactive menu. Offline modes (csv, dry) need no API key and never import
+the openai SDK.
 """
 
 from __future__ import annotations
+import argparse
 from pathlib import Path
-import json
 from brandgen import (
 	load_env,
 	get_config,
+	country_config,
 	create_client,
 	ask_companies,
 	ask_brands,
+	ask_brands_multi,
 	load_sections,
 	flatten_to_csv,
 	build_prompt,
 	build_companies_prompt,
 	build_brands_prompt,
+	build_brands_multi_prompt,
 	build_companies_groups_prompt,
 	load_companies,
 	load_isic_groups,
 	configure_logger,
 )
-from brandgen.persist import incremental_update, save_json
+from brandgen.api import validate_items
+from brandgen.batch import create_batch_client, run_batch
+from brandgen.cache import configure_cache
+from brandgen.dedup import configure_dedup, get_name_index
+from brandgen.flatten import flatten_files_to_csv
+from brandgen.hedge import configure_hedging
+from brandgen.mock import mock_brands, mock_companies
+from brandgen.ratelimit import CHARS_PER_TOKEN, configure_limiter
+from brandgen.schemas import brands_schema, companies_schema
+from brandgen.storage import configure_storage, get_storage
+from brandgen.telemetry import get_telemetry
+from brandgen.validate import configure_validation
+from brandgen.wikidata import configure_wikidata, get_wikidata
+from brandgen.workqueue import LeaseKeeper, WorkQueue, merge_to_json
+from brandgen.profiling import configure_profiling, phase
+from brandgen.persist import (
+	NameStream,
+	StoreIndex,
+	incremental_update,
+	compact_store,
+	configure_journal,
+	iter_store,
+	load_json,
+	load_store,
+	reset_store,
+	save_json,
+	staging_path,
+	store_exists,
+	swap_store,
+)
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from functools import partial
+from itertools import islice
+from typing import Callable, Iterable, Iterator, NamedTuple, TypeVar
+import json
 import logging
-from tqdm import tqdm
 import time
 
 
+K = TypeVar("K")
+T = TypeVar("T")
+
+# CLI mode -> internal mode; menu choice -> internal mode
+RUN_MODES = {"full": "both", "brands": "brands", "csv": "csv", "dry": "dry", "resume": "resume", "batch": "batch", "worker": "worker"}
+MENU_MODES = {"1": "both", "2": "brands", "3": "csv", "4": "dry", "5": "resume", "6": "batch", "7": "worker"}
+OFFLINE_MODES = {"csv", "dry"}  # no API key, no client
+
+
+def _tqdm(*args, **kwargs):
+	"""tqdm progress bar, imported on first use so CSV-only runs skip it."""
+	from tqdm import tqdm
+
+	return tqdm(*args, **kwargs)
+
+
+def _truncate(items: list[dict[str, str]], limit: int, what: str, key: str, logger) -> list[dict[str, str]]:
+	"""Cut a response list down to limit (0 = unlimited), logging the truncation and its wasted tokens.
+
+	Requests already carry the limit (prompt count, maxItems, output-token cap), so this
+	only trims models that overshoot; what it trims is reported as wasted completion tokens.
+	"""
+	if limit > 0 and len(items) > limit:
+		wasted = len(json.dumps(items[limit:], ensure_ascii=False)) // CHARS_PER_TOKEN
+		get_telemetry().record_truncation(what, len(items) - limit, wasted)
+		logger.debug(f"Truncated {what} {len(items)}->{limit} for {key} (~{wasted} completion tokens wasted)")
+		return items[:limit]
+	return items
+
+
+def _fetch_group_companies(
+	client,
+	model: str,
+	idx: int,
+	group_data: dict[str, str],
+	limit: int,
+	country: str,
+	use_country: bool,
+	dry_run: bool,
+) -> list[dict[str, str]]:
+	"""Return companies for one ISIC group (mock companies when dry_run)."""
+	if dry_run:
+		return mock_companies(f"group{idx}", f"group {group_data.get('group_name', '')}", limit, country)
+	question = build_companies_groups_prompt(group_data, country, use_country, limit).strip()
+	return ask_companies(client, model, build_prompt(question), f"ISIC group {group_data.get('group_name', '')}", limit)
+
+
+def _fetch_section_companies(
+	client,
+	model: str,
+	idx: int,
+	label: str,
+	limit: int,
+	country: str,
+	use_country: bool,
+	dry_run: bool,
+) -> list[dict[str, str]]:
+	"""Return companies for one ISIC section (mock companies when dry_run)."""
+	if dry_run:
+		return mock_companies(f"section{idx}", f"section {label}", limit, country)
+	question = build_companies_prompt(label, country, use_country, limit).strip()
+	return ask_companies(client, model, build_prompt(question), f"ISIC section {label}", limit)
+
+
 def _collect_group_responses(
 	client,
 	model: str,
@@ -49,31 +153,14 @@ def _collect_group_responses(
 
 	Logs progress and truncation events when limits are applied.
 	"""
-	responses: dict[str, list[dict[str, str]]] = existing.copy() if existing else {}
+	responses: dict[str, list[dict[str, str]]] = existing if existing is not None else {}  # extended in place
 	total = len(groups)
 	logger.info(f"Starting company generation for {total} ISIC groups (limit={limit or 'none'})")
-	for idx, (group_name, group_data) in enumerate(tqdm(groups.items(), desc="Groups", unit="group"), start=1):
+	for idx, (group_name, group_data) in enumerate(_tqdm(groups.items(), desc="Groups", unit="group"), start=1):
 		if group_name in responses and responses[group_name]:
 			continue  # already have data (resume)
-		if dry_run:
-			# Create 3 mock companies per group (or limit if smaller)
-			mock_count = 3 if limit == 0 else min(3, limit)
-			companies = [
-				{
-					"company_name": f"company{n}_group{idx}",
-					"headquarters_country": country or "Unknown",
-					"main_industry_activities": f"Activities for group {group_name}",
-				}
-				for n in range(1, mock_count + 1)
-			]
-		else:
-			question = build_companies_groups_prompt(group_data, country, use_country).strip()
-			prompt_str = build_prompt(question)
-			companies = ask_companies(client, model, prompt_str)
-		original_count = len(companies)
-		if limit > 0 and original_count > limit:
-			companies = companies[:limit]
-			logger.debug(f"Truncated companies {original_count}->{len(companies)} for group {group_name}")
+		companies = _fetch_group_companies(client, model, idx, group_data, limit, country, use_country, dry_run)
+		companies = _truncate(companies, limit, "companies", f"group {group_name}", logger)
 		responses[group_name] = companies
 		if save_path:
 			incremental_update(str(save_path), lambda m: m.update({group_name: companies}))
@@ -97,92 +184,621 @@ def _collect_section_responses(
 
 	Logs progress and truncation events when limits are applied.
 	"""
-	responses: dict[str, list[dict[str, str]]] = existing.copy() if existing else {}
+	responses: dict[str, list[dict[str, str]]] = existing if existing is not None else {}  # extended in place
 	total = len(sections)
 	logger.info(f"Starting company generation for {total} sections (limit={limit or 'none'})")
-	for idx, section_index in enumerate(tqdm(sorted(sections), desc="Sections", unit="section"), start=1):
+	for idx, section_index in enumerate(_tqdm(sorted(sections), desc="Sections", unit="section"), start=1):
 		label = sections[section_index]
 		if label in responses and responses[label]:
 			continue  # already have data (resume)
-		if dry_run:
-			# Create 3 mock companies per section (or limit if smaller)
-			mock_count = 3 if limit == 0 else min(3, limit)
-			companies = [
-				{
-					"company_name": f"company{n}_section{idx}",
-					"headquarters_country": country or "Unknown",
-					"main_industry_activities": f"Activities for section {label}",
-				}
-				for n in range(1, mock_count + 1)
-			]
-		else:
-			question = build_companies_prompt(label, country, use_country).strip()
-			prompt_str = build_prompt(question)
-			companies = ask_companies(client, model, prompt_str)
-		original_count = len(companies)
-		if limit > 0 and original_count > limit:
-			companies = companies[:limit]
-			logger.debug(f"Truncated companies {original_count}->{len(companies)} for section {label}")
+		companies = _fetch_section_companies(client, model, idx, label, limit, country, use_country, dry_run)
+		companies = _truncate(companies, limit, "companies", f"section {label}", logger)
 		responses[label] = companies
 		if save_path:
 			incremental_update(str(save_path), lambda m: m.update({label: companies}))
 	logger.info("Company generation complete")
 	return responses
 
+
+def _run_bounded(
+	fn: Callable[[K], T],
+	keys: Iterable[K],
+	max_concurrency: int,
+) -> Iterator[tuple[K, T]]:
+	"""Yield (key, fn(key)) pairs as calls complete, keeping at most max_concurrency in flight.
+
+	Results arrive in completion order; callers persist them from the main thread so
+	the JSON stores keep a single writer.
+	"""
+	pending = iter(keys)
+	with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+		in_flight = {pool.submit(fn, key): key for key in islice(pending, max_concurrency)}
+		while in_flight:
+			done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+			for future in done:
+				key = in_flight.pop(future)
+				for nxt in islice(pending, 1):
+					in_flight[pool.submit(fn, nxt)] = nxt
+				yield key, future.result()
+
+
+def _batched(items: Iterable[K], size: int) -> Iterator[tuple[K, ...]]:
+	"""Yield consecutive tuples of up to size items, pulling lazily from items."""
+	it = iter(items)
+	while chunk := tuple(islice(it, size)):
+		yield chunk
+
+
+def _known_brands(name: str) -> list[str] | None:
+	"""Return Wikidata brands to ground a prompt with (WIKIDATA_MODE=ground only)."""
+	wikidata = get_wikidata()
+	if wikidata and wikidata.mode == "ground":
+		return wikidata.known_brands(name) or None
+	return None
+
+
+def _wikidata_answer(name: str, limit: int) -> list[dict[str, str]]:
+	"""Return brand items answered from Wikidata without an API call (WIKIDATA_MODE=answer only)."""
+	wikidata = get_wikidata()
+	if wikidata and wikidata.mode == "answer":
+		return wikidata.brand_items(name, limit)
+	return []
+
+
+def _fetch_brands(
+	client,
+	model: str,
+	limit: int,
+	country: str,
+	use_country: bool,
+	dry_run: bool,
+	name: str,
+) -> list[dict[str, str]]:
+	"""Return brand items for one company (mock items when dry_run)."""
+	if dry_run:
+		return mock_brands(name, limit)
+	prompt = build_prompt(build_brands_prompt(name, country, use_country, _known_brands(name), limit))
+	return ask_brands(client, model, prompt, name, limit)
+
+
+def _fetch_brands_multi(
+	client,
+	model: str,
+	limit: int,
+	country: str,
+	use_country: bool,
+	dry_run: bool,
+	names: tuple[str, ...],
+) -> dict[str, list[dict[str, str]]]:
+	"""Return brand items for several companies from one request (mock items when dry_run)."""
+	if dry_run:
+		return {name: mock_brands(name, limit) for name in names}
+	known = {name: _known_brands(name) for name in names}
+	prompt = build_prompt(build_brands_multi_prompt(list(names), country, use_country, known, limit))
+	return ask_brands_multi(client, model, prompt, list(names), limit)
+
+
+def _multi_tokens_saved(names: tuple[str, ...], country: str, use_country: bool) -> int:
+	"""Estimate input tokens saved by one multi-company prompt versus single-company prompts."""
+	single = sum(len(build_prompt(build_brands_prompt(name, country, use_country))) for name in names)
+	multi = len(build_prompt(build_brands_multi_prompt(list(names), country, use_country)))
+	return (single - multi) // CHARS_PER_TOKEN
+
+
 def _collect_brand_responses(
 	client,
 	model: str,
-	companies: list[str],
+	companies: Iterable[str],
 	limit: int,
 	country: str,
 	use_country: bool,
 	logger,
     dry_run: bool,
-    existing: dict[str, list[dict[str, str]]] | None = None,
     save_path: Path | None = None,
+    max_concurrency: int = 1,
+    brands_per_call: int = 1,
+    total: int | None = None,
+    done: int = 0,
 ) -> dict[str, list[dict[str, str]]]:
-	"""Fetch brand/product/service items for each company with logging."""
-	results: dict[str, list[dict[str, str]]] = existing.copy() if existing else {}
-	total = len(companies)
-	logger.info(f"Starting brand generation for {total} companies (limit={limit or 'none'})")
-	for name in tqdm(companies, desc="Brands", unit="company"):
-		if name in results and results[name]:
-			continue  # already processed
-		if dry_run:
-			mock_count = 2 if limit == 0 else min(2, limit)
-			items = [
-				{
-					"name": f"brand{b}_{name}",
-					"type": "mock",
-					"invoice_example": f"Invoice line for brand{b}_{name}",
-					"gpc_segment": "00",
-					"gpc_family": "000",
-					"gpc_class": "0000",
-					"gpc_brick": "000000",
-				}
-				for b in range(1, mock_count + 1)
-			]
-		else:
-			prompt = build_prompt(build_brands_prompt(name, country, use_country))
-			items = ask_brands(client, model, prompt)
-		original_count = len(items)
-		if limit > 0 and original_count > limit:
-			items = items[:limit]
-			logger.debug(f"Truncated brands {original_count}->{len(items)} for company {name}")
-		results[name] = items
-		if save_path:
-			incremental_update(str(save_path), lambda m: m.update({name: items}))
+	"""Fetch brand/product/service items for each pending company with logging.
+
+	companies is consumed lazily, so it may be a disk-backed stream; total / done
+	(companies that already have brands) only size the progress bar. Up to
+	max_concurrency requests run in parallel; results are handled in completion order
+	from the calling thread. With save_path they are written through to that store and
+	not kept (the returned mapping is empty); without, they are returned. With
+	brands_per_call > 1 companies are requested in groups of that size, and any company
+	missing from a grouped response falls back to a single-company call.
+	"""
+	results: dict[str, list[dict[str, str]]] = {}
+	total = len(companies) + done if total is None else total
+	logger.info(
+		f"Starting brand generation for {total} companies "
+		f"(limit={limit or 'none'}, pending={total - done}, concurrency={max_concurrency}, per_call={brands_per_call})"
+	)
+	with _tqdm(total=total, initial=done, desc="Brands", unit="company") as bar:
+		def store(name: str, items: list[dict[str, str]]) -> None:
+			items = _truncate(items, limit, "brands", f"company {name}", logger)
+			if save_path:
+				incremental_update(str(save_path), lambda m: m.update({name: items}))
+			else:
+				results[name] = items
+			bar.update(1)
+
+		wikidata = {"answered": 0, "grounded": 0}
+
+		def unanswered(names: Iterable[str]) -> Iterator[str]:
+			"""Store companies Wikidata answers; yield the ones that still need an API call."""
+			for name in names:
+				items = _wikidata_answer(name, limit)
+				if items:
+					store(name, items)
+					wikidata["answered"] += 1
+					continue
+				if _known_brands(name):
+					wikidata["grounded"] += 1
+				yield name
+
+		pending: Iterable[str] = unanswered(companies)
+		if brands_per_call > 1:
+			fetch_multi = partial(_fetch_brands_multi, client, model, limit, country, use_country, dry_run)
+			fallbacks: list[str] = []
+			calls, grouped, tokens_saved = 0, 0, 0
+			for chunk, found in _run_bounded(fetch_multi, _batched(pending, brands_per_call), max_concurrency):
+				for name in chunk:
+					if found.get(name):
+						store(name, found[name])
+					else:
+						fallbacks.append(name)  # missing or empty: retry alone
+				calls += 1
+				grouped += len(chunk)
+				tokens_saved += _multi_tokens_saved(chunk, country, use_country)
+			logger.info(
+				f"Grouped brand prompts: {calls} calls for {grouped} companies, "
+				f"{len(fallbacks)} single-company fallbacks; saved {grouped - calls - len(fallbacks)} calls, ~{tokens_saved} input tokens"
+			)
+			pending = fallbacks
+		fetch = partial(_fetch_brands, client, model, limit, country, use_country, dry_run)
+		for name, items in _run_bounded(fetch, pending, max_concurrency):
+			store(name, items)
+	if wikidata["answered"]:
+		logger.info(f"Wikidata answered {wikidata['answered']} companies ({wikidata['answered']} API calls avoided)")
+	if wikidata["grounded"]:
+		logger.info(f"Wikidata grounded brand prompts for {wikidata['grounded']} companies")
 	logger.info("Brand generation complete")
 	return results
 
 
-def ask_run_mode(companies_path: Path, brands_path: Path) -> str:
-	"""Ask user which mode to run.
+def _company_names(company_lists: Iterable[list[dict[str, str]]]) -> Iterator[str]:
+	"""Yield company names from section/group company lists (duplicates included)."""
+	for company_list in company_lists:
+		for entry in company_list:
+			if isinstance(entry, dict) and entry.get("company_name"):
+				yield entry["company_name"]
+
+
+def _unique_companies(company_lists: Iterable[list[dict[str, str]]]) -> set[str]:
+	"""Return the names needing brands: one canonical name per near-duplicate cluster when dedup is on."""
+	index = get_name_index()
+	names = _company_names(company_lists)
+	return {index.add(name) for name in names} if index else set(names)
+
+
+def _queued_companies(queue: WorkQueue, company_lists: Iterable[list[dict[str, str]]]) -> list[str]:
+	"""Return the sorted names needing brands, clustered through the shared queue when dedup is on."""
+	index = get_name_index()
+	names = _company_names(company_lists)
+	return sorted(set(queue.canonicalize(names, index) if index else names))
+
+
+def _company_name_stream(companies_path: Path, brands_path: Path | None = None) -> NameStream:
+	"""Return the names needing brands as a disk-backed stream built from the companies store.
+
+	Companies are read through an on-disk index (journal records override the snapshot)
+	and canonicalized like ``_unique_companies``. With brands_path, companies that already
+	have brands there are marked done (resume).
+	"""
+	names = NameStream()
+	try:
+		companies = StoreIndex(names.db, "companies", str(companies_path))
+		company_names = _company_names(items for _, items in companies.items())
+		index = get_name_index()
+		names.add((index.add(name) for name in company_names) if index else company_names)
+		if brands_path is not None and store_exists(str(brands_path)):
+			names.mark_done((name, bool(items)) for name, items in iter_store(str(brands_path)))
+	except BaseException:
+		names.close()
+		raise
+	return names
+
+
+def _aliases(cfg) -> dict[str, str] | None:
+	"""Return the variant -> canonical alias map (live index, else the persisted file)."""
+	index = get_name_index()
+	if index:
+		return index.aliases()
+	return load_json(cfg.aliases_file) if Path(cfg.aliases_file).exists() else None
+
+
+def _dataset_outputs(cfg) -> dict:
+	"""Return flatten keyword arguments for the configured DATASET_FORMATS."""
+	return {
+		"csv_path": cfg.dataset_file if "csv" in cfg.dataset_formats else None,
+		"parquet_path": cfg.parquet_file if "parquet" in cfg.dataset_formats else None,
+		"chunk_rows": cfg.flatten_chunk_rows,
+		"row_group_size": cfg.parquet_row_group_size,
+		"incremental": cfg.incremental_csv,
+		"aliases": _aliases(cfg),
+	}
+
+
+def _dataset_paths(cfg) -> str:
+	"""Describe the dataset files written for the configured formats (every COUNTRY partition)."""
+	outputs = [_dataset_outputs(part) for part in _partitions(cfg).values()]
+	return ", ".join(p for out in outputs for p in (out["csv_path"], out["parquet_path"]) if p)
+
+
+def _partitions(cfg) -> dict:
+	"""Return country -> config for each COUNTRY entry; a single country keeps the configured paths."""
+	if len(cfg.countries) <= 1:
+		return {cfg.country: cfg}
+	return {country: country_config(cfg, country) for country in cfg.countries}
+
+
+def _load_scopes(cfg) -> dict[str, dict[str, str]]:
+	"""Return section label / group name -> ISIC data for cfg.level, in processing order."""
+	if cfg.level == 1:
+		sections = load_sections(cfg.industries_file)
+		return {sections[i]: {"section_name": sections[i]} for i in sorted(sections)}
+	if cfg.level == 3:
+		return load_isic_groups(cfg.isic_flattened_file)
+	raise ValueError(f"Unsupported level: {cfg.level}. Only levels 1 and 3 are supported.")
+
+
+def _companies_prompt(cfg, key: str, data: dict[str, str]) -> str:
+	"""Return the full companies prompt for one section label / group."""
+	if cfg.level == 1:
+		return build_prompt(build_companies_prompt(key, cfg.country, cfg.country_specific, cfg.max_companies_per_industry).strip())
+	return build_prompt(build_companies_groups_prompt(data, cfg.country, cfg.country_specific, cfg.max_companies_per_industry).strip())
+
+
+def _company_fetches(
+	client, cfg, dry_run: bool, scopes: dict[str, dict[str, str]] | None = None
+) -> dict[str, Callable[[], list[dict[str, str]]]]:
+	"""Map each section label / group name to a zero-argument fetch of its companies (scopes: preloaded ISIC data)."""
+	args = (cfg.max_companies_per_industry, cfg.country, cfg.country_specific, dry_run)
+	scopes = _load_scopes(cfg) if scopes is None else scopes
+	if cfg.level == 1:
+		return {
+			key: partial(_fetch_section_companies, client, cfg.model, idx, key, *args)
+			for idx, key in enumerate(scopes, start=1)
+		}
+	return {
+		key: partial(_fetch_group_companies, client, cfg.model, idx, data, *args)
+		for idx, (key, data) in enumerate(scopes.items(), start=1)
+	}
+
+
+class Partition(NamedTuple):
+	"""One country's share of a pipelined run: its fetches, results (updated in place) and stores."""
+
+	company_fetches: dict[str, Callable[[], list[dict[str, str]]]]
+	fetch_brands: Callable[[str], list[dict[str, str]]]
+	companies: dict[str, list[dict[str, str]]]
+	brands: dict[str, list[dict[str, str]]]
+	companies_path: Path
+	brands_path: Path
+
+
+def _run_pipeline(
+	partitions: dict[str, Partition],
+	companies_limit: int,
+	brands_limit: int,
+	max_concurrency: int,
+	logger,
+) -> None:
+	"""Generate companies and brands with overlapping phases, updating each partition's mappings in place.
+
+	Companies of every (country, group) are fetched by one pool of max_concurrency
+	workers. As soon as a group's companies are parsed, names not seen before in that
+	country (and without resumed brands) are queued on a second pool of brand workers
+	shared by all countries. Results are persisted from this thread only.
+	"""
+	seen: dict[str, set[str]] = {country: set() for country in partitions}
+	answered: list[str] = []
+	index = get_name_index()
+	in_flight: dict[Future, tuple[str, str, str]] = {}
+	pending_keys = [
+		(country, key) for country, part in partitions.items() for key in part.company_fetches if not part.companies.get(key)
+	]
+	pending = iter(pending_keys)
+	total = sum(len(part.company_fetches) for part in partitions.values())
+
+	def label(country: str, key: str) -> str:
+		return key if len(partitions) == 1 else f"{key} ({country})"
+
+	with (
+		ThreadPoolExecutor(max_workers=max_concurrency) as company_pool,
+		ThreadPoolExecutor(max_workers=max_concurrency) as brand_pool,
+		_tqdm(total=total, initial=total - len(pending_keys), desc="Companies", unit="group", position=0) as company_bar,
+		_tqdm(total=0, desc="Brands", unit="company", position=1) as brand_bar,
+	):
+		def enqueue_brands(country: str, company_list: list[dict[str, str]]) -> None:
+			"""Queue brand work for names newly seen in country (global dedup within the country)."""
+			part = partitions[country]
+			for name in _company_names([company_list]):
+				name = index.add(name) if index else name  # near-duplicates share one request
+				if name in seen[country]:
+					continue
+				seen[country].add(name)
+				brand_bar.total += 1
+				if part.brands.get(name):
+					brand_bar.update(1)  # resumed
+				elif items := _wikidata_answer(name, brands_limit):
+					part.brands[name] = items
+					incremental_update(str(part.brands_path), lambda m: m.update({name: items}))
+					answered.append(name)
+					brand_bar.update(1)
+				else:
+					in_flight[brand_pool.submit(part.fetch_brands, name)] = ("brands", country, name)
+			brand_bar.refresh()
+
+		def submit_companies(count: int) -> None:
+			for country, key in islice(pending, count):
+				in_flight[company_pool.submit(partitions[country].company_fetches[key])] = ("companies", country, key)
+
+		for country, part in partitions.items():
+			for company_list in list(part.companies.values()):
+				enqueue_brands(country, company_list)  # resumed groups feed brand workers immediately
+		submit_companies(max_concurrency)
+		try:
+			while in_flight:
+				done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+				for future in done:
+					kind, country, key = in_flight.pop(future)
+					part = partitions[country]
+					if kind == "companies":
+						items = _truncate(future.result(), companies_limit, "companies", label(country, key), logger)
+						part.companies[key] = items
+						incremental_update(str(part.companies_path), lambda m: m.update({key: items}))
+						company_bar.update(1)
+						enqueue_brands(country, items)
+						submit_companies(1)
+					else:
+						items = _truncate(future.result(), brands_limit, "brands", f"company {label(country, key)}", logger)
+						part.brands[key] = items
+						incremental_update(str(part.brands_path), lambda m: m.update({key: items}))
+						brand_bar.update(1)
+		finally:
+			for future in in_flight:
+				future.cancel()  # don't drain queued API calls after a failure
+	if answered:
+		logger.info(f"Wikidata answered {len(answered)} companies ({len(answered)} API calls avoided)")
+	groups = sum(len(part.companies) for part in partitions.values())
+	companies = sum(len(names) for names in seen.values())
+	across = f" across {len(partitions)} countries" if len(partitions) > 1 else ""
+	logger.info(f"Pipeline complete: {groups} groups, {companies} unique companies{across}")
+
+
+def _pipelined_run(
+	client,
+	cfg,
+	mode: str,
+	logger,
+) -> dict[str, tuple[dict[str, list[dict[str, str]]], dict[str, list[dict[str, str]]]]]:
+	"""Run companies and brands phases concurrently, then snapshot each partition's JSON files.
+
+	Used by full / resume runs with PIPELINE=true or several COUNTRY entries. ISIC data
+	is loaded once and every country shares the two worker pools; returns country ->
+	(companies, brands).
+	"""
+	scopes = _load_scopes(cfg)
+	partitions: dict[str, Partition] = {}
+	for country, part_cfg in _partitions(cfg).items():
+		companies_path, brands_path = Path(part_cfg.companies_file), Path(part_cfg.brands_file)
+		companies = load_companies(str(companies_path)) if store_exists(str(companies_path)) else {}
+		brands = load_store(str(brands_path)) if mode == "resume" else {}
+		where = f", country={country}" if len(cfg.countries) > 1 else ""
+		logger.info(f"Mode={mode}, Level={cfg.level}{where}, pipelined (resume groups={len(companies)}, brands={len(brands)})")
+		fetch_brands = partial(
+			_fetch_brands, client, cfg.model, cfg.max_brands_per_company, part_cfg.country, cfg.country_specific, False
+		)
+		partitions[country] = Partition(
+			_company_fetches(client, part_cfg, False, scopes), fetch_brands, companies, brands, companies_path, brands_path
+		)
+	_run_pipeline(partitions, cfg.max_companies_per_industry, cfg.max_brands_per_company, cfg.max_concurrency, logger)
+	results = {}
+	for country, part in partitions.items():
+		# Keep the snapshot in section/group order regardless of completion order
+		ordered = {key: part.companies[key] for key in part.company_fetches if key in part.companies}
+		ordered.update({key: value for key, value in part.companies.items() if key not in ordered})
+		compact_store(str(part.companies_path), ordered)
+		compact_store(str(part.brands_path), part.brands)
+		logger.info(f"Snapshot companies JSON to {part.companies_path} and brands JSON to {part.brands_path}")
+		results[country] = (ordered, part.brands)
+	return results
+
+
+def _batch_run(
+	client,
+	cfg,
+	companies_path: Path,
+	brands_path: Path,
+	logger,
+) -> tuple[dict[str, list[dict[str, str]]], dict[str, list[dict[str, str]]]]:
+	"""Generate pending companies, then pending brands, each as one Batch API job.
+
+	Results are merged through the journal like any other run, so an interrupted or
+	partially failed batch is simply resumed by running batch mode again.
+	"""
+	batch_client = create_batch_client(cfg.batch_client, client, Path(cfg.batch_dir))
+	companies = load_companies(str(companies_path)) if store_exists(str(companies_path)) else {}
+	scopes = _load_scopes(cfg)
+	prompts = {key: _companies_prompt(cfg, key, data) for key, data in scopes.items() if not companies.get(key)}
+	logger.info(f"Mode=batch ({cfg.batch_client}): {len(prompts)} pending groups (resume entries={len(companies)})")
+	if prompts:
+		results = run_batch(batch_client, prompts, cfg.model, companies_schema(cfg.max_companies_per_industry), Path(cfg.batch_dir), cfg.batch_poll_seconds)
+		for key, payload in results.items():
+			items = validate_items(client, cfg.model, "companies", payload.get("companies", []), key)
+			items = _truncate(items, cfg.max_companies_per_industry, "companies", key, logger)
+			companies[key] = items
+			incremental_update(str(companies_path), lambda m: m.update({key: items}))
+	ordered = {key: companies[key] for key in scopes if key in companies}
+	ordered.update({key: value for key, value in companies.items() if key not in ordered})
+	compact_store(str(companies_path), ordered)
+
+	brands = load_store(str(brands_path))
+	names = sorted(_unique_companies(ordered.values()))
+	answered = 0
+	for name in names:
+		items = [] if brands.get(name) else _wikidata_answer(name, cfg.max_brands_per_company)
+		if items:
+			brands[name] = items
+			incremental_update(str(brands_path), lambda m: m.update({name: items}))
+			answered += 1
+	if answered:
+		logger.info(f"Wikidata answered {answered} companies ({answered} batch requests avoided)")
+	prompts = {
+		name: build_prompt(
+			build_brands_prompt(name, cfg.country, cfg.country_specific, _known_brands(name), cfg.max_brands_per_company)
+		)
+		for name in names
+		if not brands.get(name)
+	}
+	logger.info(f"Mode=batch: {len(prompts)} pending of {len(names)} unique companies")
+	if prompts:
+		results = run_batch(batch_client, prompts, cfg.model, brands_schema(cfg.max_brands_per_company), Path(cfg.batch_dir), cfg.batch_poll_seconds)
+		for name, payload in results.items():
+			items = validate_items(client, cfg.model, "brands", payload.get("items", []), name)
+			items = _truncate(items, cfg.max_brands_per_company, "brands", f"company {name}", logger)
+			brands[name] = items
+			incremental_update(str(brands_path), lambda m: m.update({name: items}))
+	compact_store(str(brands_path), brands)
+	return ordered, brands
+
+
+def _worker_run(
+	client,
+	cfg,
+	queue: WorkQueue,
+	companies_path: Path,
+	brands_path: Path,
+	logger,
+) -> None:
+	"""Work through the shared QUEUE_FILE with other workers until nothing is pending or leased anywhere.
+
+	Every worker enqueues all groups (idempotent) and imports existing JSON stores as
+	finished items. Groups are claimed before brand companies; finishing a group
+	enqueues its companies, canonicalized through the queue so all workers share one
+	alias map. Leases are kept alive by a heartbeat thread, and items
+	left by a dead worker are reclaimed once their lease expires. Merging the results
+	is left to the one worker that wins ``queue.claim_merge``.
+	"""
+	scopes = _load_scopes(cfg)
+	company_fetches = _company_fetches(client, cfg, False)
+	fetch_brands = partial(
+		_fetch_brands, client, cfg.model, cfg.max_brands_per_company, cfg.country, cfg.country_specific, False
+	)
+	if store_exists(str(companies_path)):
+		queue.seed("companies", load_companies(str(companies_path)))
+	if store_exists(str(brands_path)):
+		queue.seed("brands", load_store(str(brands_path)))
+	queue.enqueue("companies", scopes)  # after seeding, so existing results are not re-queued as pending
+	queue.enqueue("brands", _queued_companies(queue, (items for _, items in queue.results("companies"))))
+	logger.info(
+		f"Mode=worker {queue.worker_id}: queue {cfg.queue_file} "
+		f"companies={queue.counts('companies')} brands={queue.counts('brands')}"
+	)
+	processed = {"companies": 0, "brands": 0}
+	with LeaseKeeper(queue), ThreadPoolExecutor(max_workers=cfg.max_concurrency) as pool:
+		while True:
+			kind, keys = "companies", queue.claim("companies", cfg.max_concurrency)
+			if not keys:
+				kind, keys = "brands", queue.claim("brands", cfg.max_concurrency)
+			if not keys:
+				if queue.outstanding("companies") or queue.outstanding("brands"):
+					time.sleep(cfg.queue_poll_seconds)  # other workers still hold leases
+					continue
+				break
+			futures = {}
+			for key in keys:
+				if kind == "brands" and (items := _wikidata_answer(key, cfg.max_brands_per_company)):
+					queue.complete("brands", key, items)
+					continue
+				futures[pool.submit(company_fetches[key] if kind == "companies" else partial(fetch_brands, key))] = key
+			for future in as_completed(futures):
+				key = futures[future]
+				try:
+					items = future.result()
+				except Exception as exc:  # leave the item for a retry (here or on another worker)
+					logger.warning(f"Worker {kind} item {key} failed: {exc}")
+					queue.release(kind, key, repr(exc))
+					continue
+				if kind == "companies":
+					items = _truncate(items, cfg.max_companies_per_industry, "companies", key, logger)
+					queue.complete("companies", key, items)
+					queue.enqueue("brands", _queued_companies(queue, [items]))
+				else:
+					queue.complete("brands", key, _truncate(items, cfg.max_brands_per_company, "brands", f"company {key}", logger))
+				processed[kind] += 1
+	failed = {kind: queue.counts(kind).get("failed", 0) for kind in ("companies", "brands")}
+	logger.info(f"Worker {queue.worker_id} processed {processed}; queue drained (failed items: {failed})")
+
+
+def _store_error(mode: str, companies_path: Path, brands_path: Path) -> str | None:
+	"""Return why mode cannot run with one partition's stores, or None."""
+	if mode == "brands" and not store_exists(str(companies_path)):
+		return f"companies file not found at {companies_path}; cannot run brands only."
+	if mode == "csv":
+		missing = [str(p) for p in (companies_path, brands_path) if not store_exists(str(p))]
+		if missing:
+			return "Missing required files: " + ", ".join(missing)
+	if mode == "resume" and not store_exists(str(companies_path)) and not store_exists(str(brands_path)):
+		return "Nothing to resume; companies or brands JSON missing."
+	return None
+
+
+def _save_outputs(cfg) -> None:
+	"""Save the alias map and, with sqlite storage and STORAGE_EXPORT_JSON, the JSON snapshots."""
+	index = get_name_index()
+	if index and (index.aliases() or Path(cfg.aliases_file).exists()):
+		save_json(cfg.aliases_file, index.aliases())
+	storage = get_storage()
+	if storage and cfg.storage_export_json:
+		for part in _partitions(cfg).values():
+			for path in (part.companies_file, part.brands_file):
+				if store_exists(path):
+					storage.export_json(path)
+
+
+def _mode_error(mode: str, cfg) -> str | None:
+	"""Return why mode cannot run with the current stores of the COUNTRY partitions, or None.
+
+	A multi-country resume only needs stores for one country; the others start fresh.
+	"""
+	errors = {
+		country: _store_error(mode, Path(part.companies_file), Path(part.brands_file))
+		for country, part in _partitions(cfg).items()
+	}
+	failed = {country: error for country, error in errors.items() if error}
+	if not failed or (mode == "resume" and len(failed) < len(errors)):
+		return None
+	if len(errors) == 1:
+		return next(iter(failed.values()))
+	return "; ".join(f"{country}: {error}" for country, error in failed.items())
+
+
+def ask_run_mode(cfg) -> str:
+	"""Ask user which mode to run (checked against the stores of every COUNTRY partition).
 
 	Returns one of:
 	- 'both'   : generate companies then brands then CSV
 	- 'brands' : generate brands (needs existing companies JSON) then CSV
 	- 'csv'    : only regenerate CSV from existing companies + brands JSON
+	- 'dry'    : mock data, no API calls
+	- 'resume' : continue from partial companies / brands JSON
+	- 'batch'  : submit pending companies then brands as Batch API jobs, then CSV
+	- 'worker' : claim groups / companies from the shared QUEUE_FILE with other workers, merge, then CSV
 	"""
 	print("Select run mode:")
 	print("  1) Full run (companies -> brands -> CSV)")
@@ -190,153 +806,285 @@ def ask_run_mode(companies_path: Path, brands_path: Path) -> str:
 	print("  3) CSV only (requires companies & brands files)")
 	print("  4) Dry run (mock data, no API calls)")
 	print("  5) Resume (continue from partial companies/brands JSON)")
+	print("  6) Batch (Batch API for pending companies/brands, then CSV)")
+	print("  7) Worker (shared work queue across processes/hosts, then CSV)")
 	while True:
-		choice = input("Enter 1-5: ").strip()
-		if choice == "1":
-			return "both"
-		if choice == "2":
-			if not companies_path.exists():
-				print(f"companies file not found at {companies_path}; cannot run brands only.")
-				continue
-			return "brands"
-		if choice == "3":
-			missing = []
-			if not companies_path.exists():
-				missing.append(str(companies_path))
-			if not brands_path.exists():
-				missing.append(str(brands_path))
-			if missing:
-				print("Missing required files: " + ", ".join(missing))
-				continue
-			return "csv"
-		if choice == "4":
-			return "dry"
-		if choice == "5":
-			if not companies_path.exists() and not brands_path.exists():
-				print("Nothing to resume; companies or brands JSON missing.")
-				continue
-			return "resume"
-		print("Invalid selection. Please enter 1, 2 or 3.")
-
-
-def main() -> int:
+		mode = MENU_MODES.get(input("Enter 1-7: ").strip())
+		if mode is None:
+			print("Invalid selection. Please enter 1-7.")
+			continue
+		error = _mode_error(mode, cfg)
+		if error:
+			print(error)
+			continue
+		return mode
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+	"""Parse the command line; a missing mode falls back to the interactive menu."""
+	parser = argparse.ArgumentParser(
+		description="Generate the companies / brands dataset.",
+		epilog="Settings come from the environment / env file. Without a mode, an interactive menu asks for one.",
+	)
+	parser.add_argument(
+		"mode", nargs="?", choices=list(RUN_MODES),
+		help="full: companies -> brands -> CSV; brands: brands for the existing companies file; csv: dataset from "
+		"existing stores; dry: mock data, no API calls; resume: continue partial stores; batch: Batch API; "
+		"worker: shared QUEUE_FILE work queue",
+	)
+	parser.add_argument("--env-file", default="config/.env", help="env file loaded before reading settings (default: config/.env)")
+	return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
 	"""Execute the workflow across all sections and store the combined output."""
-	load_env()
-	cfg = get_config()
+	args = parse_args(argv)
+	load_env(args.env_file)
+	cfg = get_config(require_api_key=False)  # checked below, once the mode is known
 	logger = configure_logger(level=logging.INFO, log_file=cfg.log_file)
 	logger.info("Configuration loaded")
-	client = create_client(cfg.api_key)
-	logger.info(f"OpenAI client initialized (model={cfg.model})")
+	configure_journal(cfg.journal_fsync_every)
+	configure_validation(cfg.validation_mode)
+	profiler = configure_profiling(cfg.trace_file is not None, cfg.profile_mode, cfg.profile_dir, cfg.profile_sample_ms)
+	storage = configure_storage(cfg.storage_backend, cfg.storage_file)
+	if storage:
+		logger.info(f"SQLite storage at {cfg.storage_file}")
+	if len(cfg.countries) > 1:
+		logger.info(f"Countries: {', '.join(cfg.countries)} (outputs partitioned per country)")
+	if args.mode:
+		mode = RUN_MODES[args.mode]
+		error = _mode_error(mode, cfg)
+		if error:
+			logger.error(error)
+			return 2
+	else:
+		mode = ask_run_mode(cfg)
+	needs_client = mode not in OFFLINE_MODES and not (mode == "batch" and cfg.batch_client == "local")
+	if needs_client and not cfg.api_key:
+		raise ValueError("OPENAI_API_KEY not set in environment")
+	cache = None  # offline modes never call the API, so they never open the cache
+	if mode not in OFFLINE_MODES:
+		cache = configure_cache(cfg.cache_file, cfg.cache_max_entries, cfg.cache_max_age_days, cfg.cache_bypass)
+	if cache:
+		logger.info(f"Response cache at {cfg.cache_file} (entries={cache.stats()['entries']}, bypass={cfg.cache_bypass})")
+	wikidata = configure_wikidata(cfg.wikidata_mode, cfg.wikidata_file, cfg.wikidata_index_file, cfg.countries)
+	if wikidata:
+		logger.info(f"Wikidata index: mode={wikidata.mode}, {len(wikidata.owner_brands)} owners")
+	name_index = None
+	if cfg.dedup_companies and mode != "csv":  # csv joins through ALIASES_FILE; no clustering
+		name_index = configure_dedup(cfg.dedup_threshold, load_json(cfg.aliases_file) if Path(cfg.aliases_file).exists() else None)
+	limiter = configure_limiter(
+		cfg.rate_limit_rpm, cfg.rate_limit_tpm, cfg.max_retries, cfg.backoff_base_seconds, cfg.backoff_max_seconds
+	)
+	hedger = configure_hedging(cfg.hedge_percentile, cfg.hedge_budget, cfg.hedge_min_samples)
+	if hedger:
+		logger.info(f"Hedging calls past p{cfg.hedge_percentile * 100:g} latency (budget {cfg.hedge_budget:.0%} of calls)")
+	client = None
+	if needs_client:  # the local batch client answers offline
+		client = create_client(cfg.api_key, max_retries=0, base_url=cfg.base_url)  # retries owned by the shared limiter
+		logger.info(f"OpenAI client initialized (model={cfg.model})")
+	rc = _run(client, cfg, mode, logger)
+	if name_index:
+		stats = name_index.stats()
+		logger.info(f"Company dedup: {stats['names']} names -> {stats['clusters']} companies ({stats['aliases']} aliases)")
+	if mode != "worker":  # only the merging worker writes these (see _run)
+		_save_outputs(cfg)
+	logger.info(f"Rate limiter: {limiter.state()}")
+	if hedger:
+		logger.info(f"Hedging: {hedger.stats()}")
+	telemetry = get_telemetry()
+	for line in telemetry.summary():
+		logger.info(f"Telemetry {line}")
+	if cfg.run_report_file:
+		telemetry.write_report(cfg.run_report_file)
+		logger.info(f"Run report written to {cfg.run_report_file}")
+	if cfg.prometheus_file:
+		telemetry.write_prometheus(cfg.prometheus_file)
+		logger.info(f"Prometheus metrics written to {cfg.prometheus_file}")
+	if profiler:
+		profiler.close()
+		if cfg.trace_file:
+			profiler.write_trace(cfg.trace_file)
+			logger.info(f"Trace written to {cfg.trace_file} ({len(profiler.events)} events; open in ui.perfetto.dev)")
+	if cache:
+		stats = cache.stats()
+		logger.info(
+			f"Response cache: hits={stats['hits']} misses={stats['misses']} writes={stats['writes']} "
+			f"evicted={stats['evicted']} entries={stats['entries']}"
+		)
+	return rc
+
+
+def _run(client, cfg, mode: str, logger) -> int:
+	"""Execute the selected run mode (client is None for offline modes).
+
+	With several COUNTRY entries, full / resume runs fan every (country, group) and
+	(country, company) out over one shared pipeline; the other modes run once per
+	country partition, sharing the client, cache, limiter and storage.
+	"""
+	partitions = _partitions(cfg)
+	if len(partitions) > 1 and mode not in ("both", "resume"):
+		for country, part_cfg in partitions.items():
+			logger.info(f"Country {country}: mode={mode}, outputs under {Path(part_cfg.companies_file).parent}")
+			rc = _run(client, part_cfg, mode, logger)
+			if rc:
+				return rc
+		return 0
 	start_time = time.time()
 	companies_phase_start = None
 	brands_phase_start = None
 	flatten_phase_start = None
 	companies_path = Path(cfg.companies_file)
 	brands_path = Path(cfg.brands_file)
-	mode = ask_run_mode(companies_path, brands_path)
 	if mode == "dry":
 		logger.info("Mode=dry: generating mock data (no API calls)")
 		companies_phase_start = time.time()
-		if cfg.level == 1:
-			sections = load_sections(cfg.industries_file)
-			section_responses = _collect_section_responses(
-				client, cfg.model, sections, cfg.max_companies_per_industry, cfg.country, cfg.country_specific, logger, True
-			)
-		elif cfg.level == 3:
-			groups = load_isic_groups(cfg.isic_flattened_file)
-			section_responses = _collect_group_responses(
-				client, cfg.model, groups, cfg.max_companies_per_industry, cfg.country, cfg.country_specific, logger, True
-			)
-		else:
-			raise ValueError(f"Unsupported level: {cfg.level}. Only levels 1 and 3 are supported.")
+		with phase("companies"):
+			if cfg.level == 1:
+				sections = load_sections(cfg.industries_file)
+				section_responses = _collect_section_responses(
+					client, cfg.model, sections, cfg.max_companies_per_industry, cfg.country, cfg.country_specific, logger, True
+				)
+			elif cfg.level == 3:
+				groups = load_isic_groups(cfg.isic_flattened_file)
+				section_responses = _collect_group_responses(
+					client, cfg.model, groups, cfg.max_companies_per_industry, cfg.country, cfg.country_specific, logger, True
+				)
+			else:
+				raise ValueError(f"Unsupported level: {cfg.level}. Only levels 1 and 3 are supported.")
 		logger.info(f"Companies phase elapsed: {time.time() - companies_phase_start:.2f}s (dry run)")
 		# Gather company names from mock data
-		company_names = {
-			entry.get("company_name")
-			for company_list in section_responses.values()
-			for entry in company_list
-			if isinstance(entry, dict) and entry.get("company_name")
-		}
+		company_names = _unique_companies(section_responses.values())
 		brands_phase_start = time.time()
-		brands_data = _collect_brand_responses(
-			client, cfg.model, sorted(company_names), cfg.max_brands_per_company, cfg.country, cfg.country_specific, logger, True
-		)
+		with phase("brands"):
+			brands_data = _collect_brand_responses(
+				client, cfg.model, sorted(company_names), cfg.max_brands_per_company, cfg.country, cfg.country_specific, logger, True,
+				max_concurrency=cfg.max_concurrency, brands_per_call=cfg.brands_per_call,
+			)
 		logger.info(f"Brands phase elapsed: {time.time() - brands_phase_start:.2f}s (dry run)")
 		flatten_phase_start = time.time()
-		flatten_to_csv(section_responses, brands_data, cfg.dataset_file)
+		with phase("flatten"):
+			flatten_to_csv(section_responses, brands_data, **_dataset_outputs(cfg))
 		logger.info(f"Flatten phase elapsed: {time.time() - flatten_phase_start:.2f}s (dry run)")
-		logger.info(f"Dry run complete. Mock dataset written to {cfg.dataset_file}")
+		logger.info(f"Dry run complete. Mock dataset written to {_dataset_paths(cfg)}")
 		logger.info(f"Total elapsed: {time.time() - start_time:.2f}s")
 		return 0
 	if mode == "csv":
-		# Load existing JSON artifacts only and regenerate CSV.
-		logger.info("Mode=csv: loading existing JSON artifacts for CSV regeneration")
-		section_responses = load_companies(str(companies_path))
-		logger.info(f"Opened file {brands_path} for reading...")
-		with brands_path.open("r", encoding="utf-8") as file:
-			brands_data: dict[str, list[dict[str, str]]] = json.load(file)
-		logger.info("Loaded brands JSON; writing CSV")
+		# Stream existing companies / brands stores straight to the dataset (bounded memory).
+		logger.info("Mode=csv: streaming existing companies / brands stores to the dataset")
+		flatten_phase_start = time.time()
+		with phase("flatten"):
+			rows = flatten_files_to_csv(str(companies_path), str(brands_path), **_dataset_outputs(cfg))
+		logger.info(f"Flatten phase elapsed: {time.time() - flatten_phase_start:.2f}s ({rows} rows)")
+		logger.info(f"Dataset regenerated at {_dataset_paths(cfg)}")
+		return 0
+	elif mode == "worker":
+		queue = WorkQueue(cfg.queue_file, cfg.worker_id, cfg.lease_seconds)
+		try:
+			worker_start = time.time()
+			with phase("worker"):
+				_worker_run(client, cfg, queue, companies_path, brands_path, logger)
+			logger.info(f"Worker companies+brands elapsed: {time.time() - worker_start:.2f}s")
+			if not queue.claim_merge():
+				logger.info(f"Worker {queue.worker_id}: results merged by another worker (or already up to date); not writing the dataset")
+				logger.info(f"Total elapsed: {time.time() - start_time:.2f}s")
+				return 0
+			with LeaseKeeper(queue):  # keeps the merge lease alive until the dataset is written
+				if index := get_name_index():
+					queue.canonicalize((), index)  # adopt every worker's names for the aliases and the dataset
+				section_responses = merge_to_json(queue, "companies", str(companies_path), _load_scopes(cfg))
+				brands_data = merge_to_json(queue, "brands", str(brands_path))
+				logger.info(f"Merged queue results to {companies_path} and {brands_path}")
+				flatten_phase_start = time.time()
+				with phase("flatten"):
+					flatten_to_csv(section_responses, brands_data, **_dataset_outputs(cfg))
+				logger.info(f"Flatten phase elapsed: {time.time() - flatten_phase_start:.2f}s")
+				_save_outputs(cfg)
+			queue.finish_merge()
+		finally:
+			queue.close()
+		logger.info(f"Flattened dataset written to {_dataset_paths(cfg)}")
+		logger.info(f"Total elapsed: {time.time() - start_time:.2f}s")
+		return 0
+	elif mode == "batch":
+		batch_start = time.time()
+		with phase("batch"):
+			section_responses, brands_data = _batch_run(client, cfg, companies_path, brands_path, logger)
+		logger.info(f"Batch companies+brands elapsed: {time.time() - batch_start:.2f}s")
+		flatten_phase_start = time.time()
+		with phase("flatten"):
+			flatten_to_csv(section_responses, brands_data, **_dataset_outputs(cfg))
+		logger.info(f"Flatten phase elapsed: {time.time() - flatten_phase_start:.2f}s")
+		logger.info(f"Flattened dataset written to {_dataset_paths(cfg)}")
+		logger.info(f"Total elapsed: {time.time() - start_time:.2f}s")
+		return 0
+	elif (mode == "both" or mode == "resume") and (cfg.pipeline or len(partitions) > 1):
+		pipeline_start = time.time()
+		with phase("pipeline"):
+			results = _pipelined_run(client, cfg, mode, logger)
+		logger.info(f"Pipelined companies+brands elapsed: {time.time() - pipeline_start:.2f}s")
 		flatten_phase_start = time.time()
-		flatten_to_csv(section_responses, brands_data, cfg.dataset_file)
+		with phase("flatten"):
+			for country, (section_responses, brands_data) in results.items():
+				flatten_to_csv(section_responses, brands_data, **_dataset_outputs(partitions[country]))
 		logger.info(f"Flatten phase elapsed: {time.time() - flatten_phase_start:.2f}s")
-		logger.info(f"CSV regenerated at {cfg.dataset_file}")
+		logger.info(f"Flattened dataset written to {_dataset_paths(cfg)}")
+		logger.info(f"Total elapsed: {time.time() - start_time:.2f}s")
 		return 0
 	elif mode == "both" or mode == "resume":
 		companies_phase_start = time.time()
-		existing_companies = load_companies(str(companies_path)) if companies_path.exists() else {}
-		if cfg.level == 1:
-			logger.info(f"Mode={mode}, Level=1: loading sections and generating companies (resume entries={len(existing_companies)})")
-			sections = load_sections(cfg.industries_file)
-			section_responses = _collect_section_responses(
-				client, cfg.model, sections, cfg.max_companies_per_industry, cfg.country, cfg.country_specific, logger, False, existing_companies, companies_path
-			)
-		elif cfg.level == 3:
-			logger.info(f"Mode={mode}, Level=3: loading ISIC groups and generating companies (resume entries={len(existing_companies)})")
-			groups = load_isic_groups(cfg.isic_flattened_file)
-			section_responses = _collect_group_responses(
-				client, cfg.model, groups, cfg.max_companies_per_industry, cfg.country, cfg.country_specific, logger, False, existing_companies, companies_path
-			)
-		else:
-			raise ValueError(f"Unsupported level: {cfg.level}. Only levels 1 and 3 are supported.")
+		with phase("companies"):
+			existing_companies = load_companies(str(companies_path)) if store_exists(str(companies_path)) else {}
+			if cfg.level == 1:
+				logger.info(f"Mode={mode}, Level=1: loading sections and generating companies (resume entries={len(existing_companies)})")
+				sections = load_sections(cfg.industries_file)
+				section_responses = _collect_section_responses(
+					client, cfg.model, sections, cfg.max_companies_per_industry, cfg.country, cfg.country_specific, logger, False, existing_companies, companies_path
+				)
+			elif cfg.level == 3:
+				logger.info(f"Mode={mode}, Level=3: loading ISIC groups and generating companies (resume entries={len(existing_companies)})")
+				groups = load_isic_groups(cfg.isic_flattened_file)
+				section_responses = _collect_group_responses(
+					client, cfg.model, groups, cfg.max_companies_per_industry, cfg.country, cfg.country_specific, logger, False, existing_companies, companies_path
+				)
+			else:
+				raise ValueError(f"Unsupported level: {cfg.level}. Only levels 1 and 3 are supported.")
 		
 		logger.info(f"Companies phase elapsed: {time.time() - companies_phase_start:.2f}s")
-		# Already incrementally saved; ensure final snapshot pretty
-		save_json(str(companies_path), section_responses)
+		# Already journaled incrementally; fold into a pretty snapshot
+		compact_store(str(companies_path), section_responses)
 		logger.info(f"Snapshot companies JSON to {companies_path}")
+		del section_responses  # the brands phase streams companies back from the store
 	else:  # brands only
-		logger.info("Mode=brands: loading existing companies JSON")
-		section_responses = load_companies(str(companies_path))
-
-	# Collect unique company names
-	company_names = {
-		entry.get("company_name")
-		for company_list in section_responses.values()
-		for entry in company_list
-		if isinstance(entry, dict) and entry.get("company_name")
-	}
-	logger.info(f"Generating brands for {len(company_names)} unique companies")
+		logger.info("Mode=brands: streaming existing companies JSON")
+
+	# Unique company names come from a disk-backed stream; brand results are written
+	# through to the store, so neither mapping is held in memory. Fresh runs write to a
+	# staged store that replaces the brands store only once the phase completes, so an
+	# interrupted run keeps the previous brands; resume continues a staged store if one is left.
+	staged = Path(staging_path(str(brands_path)))
+	target = brands_path if mode == "resume" and not store_exists(str(staged)) else staged
 	brands_phase_start = time.time()
-	existing_brands = {}
-	if mode == "resume" and brands_path.exists():
-		try:
-			with brands_path.open("r", encoding="utf-8") as fh:
-				existing_brands = json.load(fh)
-			if not isinstance(existing_brands, dict):
-				existing_brands = {}
-		except Exception:
-			existing_brands = {}
-	brands_data = _collect_brand_responses(
-		client, cfg.model, sorted(company_names), cfg.max_brands_per_company, cfg.country, cfg.country_specific, logger, False, existing_brands, brands_path
-	)
+	with phase("brands"), _company_name_stream(companies_path, target if mode == "resume" else None) as names:
+		logger.info(f"Generating brands for {len(names)} unique companies")
+		if mode != "resume":
+			reset_store(str(staged))  # drop leftovers of an interrupted run
+		_collect_brand_responses(
+			client, cfg.model, names.pending(), cfg.max_brands_per_company, cfg.country, cfg.country_specific, logger, False, target,
+			max_concurrency=cfg.max_concurrency, brands_per_call=cfg.brands_per_call, total=len(names), done=names.done(),
+		)
 	logger.info(f"Brands phase elapsed: {time.time() - brands_phase_start:.2f}s")
-	brands_path.parent.mkdir(parents=True, exist_ok=True)
-	# Final snapshot
-	save_json(str(brands_path), brands_data)
+	# Final snapshot (compacts the journal, streaming)
+	if target == staged:
+		swap_store(str(staged), str(brands_path))
+	else:
+		compact_store(str(brands_path))
 	logger.info(f"Snapshot brands JSON to {brands_path}")
 	flatten_phase_start = time.time()
-	flatten_to_csv(section_responses, brands_data, cfg.dataset_file)
+	with phase("flatten"):
+		flatten_files_to_csv(str(companies_path), str(brands_path), **_dataset_outputs(cfg))
 	logger.info(f"Flatten phase elapsed: {time.time() - flatten_phase_start:.2f}s")
-	logger.info(f"Flattened dataset written to {cfg.dataset_file}")
+	logger.info(f"Flattened dataset written to {_dataset_paths(cfg)}")
 	logger.info(f"Total elapsed: {time.time() - start_time:.2f}s")
 	return 0
 
@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from brandgen.flatten import flatten_files_to_csv, flatten_to_csv  # noqa: E402
+from brandgen.persist import close_journals, compact_store, incremental_update, load_companies, load_json, load_store, save_json, store_exists  # noqa: E402
+from brandgen.storage import configure_storage  # noqa: E402
+
+
+DEFAULT_DATA_DIR = ROOT / "data" / "synthetic"
+DEFAULT_RESULTS_DIR = ROOT / "data" / "benchmarks" / "persistence"
+UPDATES = 1000  # incremental_update calls per sample (one company each)
+
+
+def _copy_stores(data: Path, work: Path) -> tuple[str, str]:
+    shutil.copy(data / "companies.json", work / "companies.json")
+    shutil.copy(data / "brands.json", work / "brands.json")
+    return str(work / "companies.json"), str(work / "brands.json")
+
+
+def _updates(count: int) -> list[dict]:
+    item = {"name": "Bench", "type": "brand", "invoice_example": "Bench 1kg", "gpc_segment": "10000000",
+            "gpc_family": "10000100", "gpc_class": "10000101", "gpc_brick": "10000102"}
+    return [{f"bench company {n}": [item] * 10} for n in range(count)]
+
+
+def _apply_updates(path: str, updates: list[dict]) -> None:
+    for delta in updates:
+        incremental_update(path, lambda d, delta=delta: d.update(delta))
+    close_journals()
+
+
+def _sqlite(data: Path, work: Path, imported: bool = True) -> tuple[str, str]:
+    """Copy the JSON stores and switch to SQLite storage (importing them unless imported=False)."""
+    companies, brands = _copy_stores(data, work)
+    configure_storage("sqlite", str(work / "store.sqlite3"))
+    if imported:
+        for path in (companies, brands):
+            store_exists(path)  # first touch imports the JSON store
+    return companies, brands
+
+
+# name -> (setup(data, work) -> state, timed run(state, work)); setup is excluded from the timing
+CASES = {
+    "load_companies": (
+        lambda data, work: (str(data / "companies.json"), str(data / "brands.json")),
+        lambda state, work: (load_companies(state[0]), load_store(state[1])),
+    ),
+    "save_json": (
+        lambda data, work: load_json(str(data / "brands.json")),
+        lambda brands, work: save_json(str(work / "brands.json"), brands),
+    ),
+    "incremental_update": (
+        lambda data, work: (_copy_stores(data, work)[1], _updates(UPDATES)),
+        lambda state, work: _apply_updates(*state),
+    ),
+    "compact_store": (
+        lambda data, work: _apply_updates(_copy_stores(data, work)[1], _updates(UPDATES)),
+        lambda state, work: compact_store(str(work / "brands.json")),
+    ),
+    "flatten_to_csv": (
+        lambda data, work: (load_store(str(data / "companies.json")), load_store(str(data / "brands.json"))),
+        lambda state, work: flatten_to_csv(state[0], state[1], str(work / "dataset.csv")),
+    ),
+    "flatten_files_to_csv": (
+        lambda data, work: (str(data / "companies.json"), str(data / "brands.json")),
+        lambda state, work: flatten_files_to_csv(state[0], state[1], str(work / "dataset.csv")),
+    ),
+    "sqlite_import": (
+        lambda data, work: _sqlite(data, work, imported=False),
+        lambda state, work: (store_exists(state[0]), store_exists(state[1])),
+    ),
+    "sqlite_upsert": (
+        lambda data, work: (_sqlite(data, work)[1], _updates(UPDATES)),
+        lambda state, work: _apply_updates(*state),
+    ),
+    "sqlite_flatten": (
+        lambda data, work: _sqlite(data, work),
+        lambda state, work: flatten_files_to_csv(state[0], state[1], str(work / "dataset.csv")),
+    ),
+}
+
+
+def run_case_inline(name: str, data: Path, repeat: int) -> dict:
+    """Run one case repeat times in this process; return the timed samples."""
+    setup, run = CASES[name]
+    samples = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix="brandgen-bench-") as work:
+            state = setup(data, Path(work))
+            start = time.perf_counter()
+            run(state, Path(work))
+            samples.append(time.perf_counter() - start)
+            close_journals()
+            configure_storage("json", "")
+    return {"seconds": samples}
+
+
+def run_case(name: str, data: Path, repeat: int) -> dict:
+    """Run one case in a fresh interpreter so its peak RSS is isolated."""
+    proc = subprocess.Popen(
+        [sys.executable, __file__, "--run-case", name, "--data", str(data), "--repeat", str(repeat)],
+        cwd=ROOT, stdout=subprocess.PIPE,
+    )
+    output = proc.stdout.read()
+    _, status, rusage = os.wait4(proc.pid, 0)
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise RuntimeError(f"case {name} failed")
+    samples = json.loads(output)["seconds"]
+    return {
+        "min_seconds": round(min(samples), 4),
+        "median_seconds": round(statistics.median(samples), 4),
+        "peak_rss_mb": round(rusage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1),
+    }
+
+
+def ensure_data(size: int, data_dir: Path, seed: int) -> Path:
+    """Return a directory with synthetic stores of size brands, generating it once.
+
+    Generation runs in a subprocess: Linux children inherit the parent's peak RSS
+    across exec, so this process must stay small for the per-case numbers to hold.
+    """
+    target = data_dir / f"{size}-seed{seed}"
+    if not (target / "brands.json").exists():
+        subprocess.run(
+            [sys.executable, str(ROOT / "scripts" / "synthetic_data.py"), "--brands", str(size), "--seed", str(seed), "-o", str(target)],
+            cwd=ROOT, check=True,
+        )
+    return target
+
+
+def git_commit() -> str:
+    commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    return (commit or "unknown") + ("-dirty" if dirty else "")
+
+
+def history(results_dir: Path) -> None:
+    """Print median seconds per (size, case) across stored result files, oldest first."""
+    runs = sorted((json.loads(p.read_text(encoding="utf-8")) for p in results_dir.glob("*.json")), key=lambda r: r["created"])
+    if not runs:
+        print(f"No results in {results_dir}")
+        return
+    print(f"{'size':>8} {'case':<22}" + "".join(f"{r['commit']:>14}" for r in runs))
+    keys = sorted({(int(size), case) for r in runs for size, cases in r["results"].items() for case in cases})
+    for size, case in keys:
+        cells = [r["results"].get(str(size), {}).get(case, {}).get("median_seconds") for r in runs]
+        print(f"{size:>8} {case:<22}" + "".join(f"{c:>14.3f}" if c is not None else f"{'-':>14}" for c in cells))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time persistence and flatten paths on synthetic stores.")
+    parser.add_argument("--sizes", default="10000,100000", help="comma-separated brand counts (e.g. 10000,100000,1000000)")
+    parser.add_argument("--cases", default=",".join(CASES), help="comma-separated cases to run")
+    parser.add_argument("--repeat", type=int, default=3, help="timed samples per case")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR), help="cache of generated synthetic stores")
+    parser.add_argument("--results-dir", default=str(DEFAULT_RESULTS_DIR), help="one JSON result file per commit")
+    parser.add_argument("--history", action="store_true", help="print the stored results across commits and exit")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    parser.add_argument("--data", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case_inline(args.run_case, Path(args.data), args.repeat)))
+        sys.exit(0)
+    if args.history:
+        history(Path(args.results_dir))
+        sys.exit(0)
+
+    results: dict[str, dict] = {}
+    print(f"{'size':>8} {'case':<22} {'min s':>9} {'median s':>9} {'rss MB':>8}")
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        data = ensure_data(size, Path(args.data_dir), args.seed)
+        for case in (c.strip() for c in args.cases.split(",") if c.strip()):
+            result = results.setdefault(str(size), {})[case] = run_case(case, data, args.repeat)
+            print(f"{size:>8} {case:<22} {result['min_seconds']:>9.3f} {result['median_seconds']:>9.3f} {result['peak_rss_mb']:>8.1f}", flush=True)
+    commit = git_commit()
+    out = Path(args.results_dir) / f"{commit}.json"
+    if out.exists():  # another run on this commit (e.g. other sizes): keep its results
+        previous = json.loads(out.read_text(encoding="utf-8"))["results"]
+        results = {size: {**previous.get(size, {}), **cases} for size, cases in {**previous, **results}.items()}
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({
+        "commit": commit,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} cpus)",
+        "repeat": args.repeat,
+        "results": results,
+    }, indent=2), encoding="utf-8")
+    print(f"Results written to {out}")
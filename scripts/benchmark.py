@@ -0,0 +1,177 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from itertools import cycle, islice
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from mock_openai_server import add_server_arguments, server_from_args  # noqa: E402
+
+
+DEFAULT_ISIC = ROOT / "data" / "isic" / "ISIC5_Exp_Notes_11Mar2024_flattened.csv"
+
+
+def write_groups(source: Path, count: int, output: Path) -> None:
+    """Write an ISIC flattened CSV with count distinct groups (real groups first, then numbered copies)."""
+    with source.open("r", encoding="utf-8", newline="") as fh:
+        reader = csv.DictReader(fh)
+        fieldnames = reader.fieldnames
+        groups = list({row["group_name"]: row for row in reader if row.get("group_name")}.values())
+    with output.open("w", encoding="utf-8", newline="") as fh:
+        writer = csv.DictWriter(fh, fieldnames=fieldnames)
+        writer.writeheader()
+        for n, row in enumerate(islice(cycle(groups), count)):
+            copy = n // len(groups)
+            writer.writerow({**row, "group_name": row["group_name"] + (f" #{copy}" if copy else "")})
+
+
+def peak_rss_mb(rusage) -> float:
+    """ru_maxrss is KiB on Linux and bytes on macOS."""
+    return round(rusage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_case(args: argparse.Namespace, groups: int, concurrency: int) -> dict:
+    """Run generate.py full against a fresh mock server; return its metrics."""
+    with tempfile.TemporaryDirectory(prefix="brandgen-bench-") as tmp, server_from_args(args) as server:
+        tmp = Path(tmp)
+        write_groups(Path(args.isic), groups, tmp / "isic.csv")
+        env = {
+            **os.environ,
+            "OPENAI_API_KEY": "sk-benchmark",
+            "OPENAI_BASE_URL": server.base_url,
+            "GPT_MODEL": args.model,
+            "STARTING_ISIC_LEVEL": "3",
+            "ISIC_FLATTENED_FILE": str(tmp / "isic.csv"),
+            "INDUSTRIES_FILE": str(ROOT / "data" / "industries.json"),
+            "COMPANIES_FILE": str(tmp / "companies.json"),
+            "BRANDS_FILE": str(tmp / "brands.json"),
+            "DATASET_FILE": str(tmp / "dataset.csv"),
+            "MAX_CONCURRENCY": str(concurrency),
+            "RUN_REPORT_FILE": str(tmp / "report.json"),
+            "CACHE_FILE": "",
+            "LOG_FILE": "",
+            "PROMETHEUS_FILE": "",
+            "WIKIDATA_MODE": "off",
+            "ALIASES_FILE": str(tmp / "aliases.json"),
+            "STORAGE_FILE": str(tmp / "store.sqlite3"),
+            "QUEUE_FILE": str(tmp / "queue.sqlite3"),
+            "COUNTRY": args.countries,
+            "COUNTRY_SPECIFIC": "true" if args.countries else "false",
+        }
+        with (tmp / "run.log").open("wb") as log:
+            start = time.perf_counter()
+            proc = subprocess.Popen(
+                [sys.executable, str(ROOT / "generate.py"), "full"], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT
+            )
+            _, status, rusage = os.wait4(proc.pid, 0)
+            elapsed = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        if proc.returncode != 0:
+            tail = (tmp / "run.log").read_text(encoding="utf-8", errors="replace").splitlines()[-20:]
+            raise RuntimeError(f"generate.py exited with {proc.returncode}:\n" + "\n".join(tail))
+        report = json.loads((tmp / "report.json").read_text(encoding="utf-8"))
+    phases = report["phases"]
+    items = sum(p["items"] for name, p in phases.items() if name != "repair")  # repair answers re-send fields, not items
+    return {
+        "groups": groups,
+        "concurrency": concurrency,
+        "countries": len([c for c in args.countries.split(",") if c.strip()]) or 1,
+        "elapsed_seconds": round(elapsed, 3),
+        "items": items,
+        "items_per_second": round(items / elapsed, 1),
+        "calls": sum(p["calls"] for p in phases.values()),
+        "retries": sum(p["retries"] for p in phases.values()),
+        "latency_seconds": {
+            phase: {"p50": p["latency_seconds"]["p50"], "p99": p["latency_seconds"]["p99"]} for phase, p in phases.items()
+        },
+        "stages_seconds": report["stages_seconds"],
+        "validation": {key: sum(p["validation"][key] for p in phases.values()) for key in ("invalid", "repaired", "dropped")},
+        "hedging": {key: sum(p["hedging"][key] for p in phases.values()) for key in ("hedges", "wins", "saved_seconds", "extra_tokens")},
+        "server": dict(server.counts),
+        "peak_rss_mb": peak_rss_mb(rusage),
+    }
+
+
+def git_commit() -> str:
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return result.stdout.strip() or "unknown"
+
+
+def compare(results: list[dict], baseline_path: str, tolerance: float) -> list[str]:
+    """Return regressions: cases whose items/sec fell more than tolerance below the baseline."""
+    baseline = {(r["groups"], r["concurrency"]): r for r in json.loads(Path(baseline_path).read_text(encoding="utf-8"))["results"]}
+    regressions = []
+    for r in results:
+        old = baseline.get((r["groups"], r["concurrency"]))
+        if old and r["items_per_second"] < old["items_per_second"] * (1 - tolerance):
+            regressions.append(
+                f"groups={r['groups']} concurrency={r['concurrency']}: "
+                f"{r['items_per_second']} items/s vs {old['items_per_second']} baseline"
+            )
+    return regressions
+
+
+TABLE_HEADER = (
+    f"{'groups':>7} {'conc':>5} {'seconds':>8} {'items/s':>9} {'calls':>6} {'retries':>7} "
+    f"{'brands p50':>10} {'brands p99':>10} {'rss MB':>7}"
+)
+
+
+def table_row(r: dict) -> str:
+    brands = r["latency_seconds"].get("brands", {"p50": 0.0, "p99": 0.0})
+    return (
+        f"{r['groups']:>7} {r['concurrency']:>5} {r['elapsed_seconds']:>8.2f} {r['items_per_second']:>9.1f} "
+        f"{r['calls']:>6} {r['retries']:>7} {brands['p50']:>10.3f} {brands['p99']:>10.3f} {r['peak_rss_mb']:>7.1f}"
+    )
+
+
+def int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="End-to-end throughput benchmark: run generate.py against the mock OpenAI server."
+    )
+    parser.add_argument("--groups", type=int_list, default=[25, 100], help="comma-separated dataset sizes (ISIC groups)")
+    parser.add_argument("--concurrency", type=int_list, default=[1, 8, 32], help="comma-separated MAX_CONCURRENCY values")
+    parser.add_argument("--model", default="gpt-4o-mini", help="model name sent to the mock server")
+    parser.add_argument("--countries", default="", help="COUNTRY value; a comma-separated list fans each run out over those countries")
+    parser.add_argument("--isic", default=str(DEFAULT_ISIC), help="ISIC flattened CSV the groups are drawn from")
+    parser.add_argument("-o", "--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="previous --output file; exit 1 if items/sec regressed")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed items/sec drop versus the baseline")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    results = []
+    print(TABLE_HEADER)
+    for groups in args.groups:
+        for concurrency in args.concurrency:
+            results.append(run_case(args, groups, concurrency))
+            print(table_row(results[-1]), flush=True)
+    payload = {
+        "commit": git_commit(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "server": {k: v for k, v in vars(args).items() if k not in {"groups", "concurrency", "output", "baseline", "tolerance"}},
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        print(f"Results written to {args.output}")
+    regressions = compare(results, args.baseline, args.tolerance) if args.baseline else []
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
@@ -1,155 +1,163 @@
-import pandas as pd
+import argparse
+import hashlib
+import json
+import re
+import string
 import sys
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (Parquet engine for the parsed-sheet cache)
+except ImportError:
+    pyarrow = None
+
+
+DEFAULT_INPUT = Path("data") / "isic" / "ISIC5_Exp_Notes_11Mar2024.xlsx"
+DEFAULT_CACHE_DIR = Path("data") / "cache" / "isic"
+OUTPUT_COLUMNS = ["section_name", "division_name", "group_name", "class_name", "includes", "excludes"]
+
+# Code lengths after removing dots: A (section), A01 (division), A011 (group), A0111 (class)
+LEVELS = {1: "section", 3: "division", 4: "group", 5: "class"}
+CODE_PATTERN = re.compile(r"^[A-Za-z]\d{0,4}$")
+CLASS_HEADER_PATTERN = re.compile(r"this\s+class\s+(includes?|excludes?)\s*:?\s*", re.IGNORECASE)
+SEE_GROUPS_PATTERN = re.compile(r"\bsee\s+(group\s*|groups\s*)?[\d.,\s]+(and\s+[\d.,\s]+)*\b", re.IGNORECASE)
+SEE_NUMBER_PATTERN = re.compile(r"\bsee\s+\d+[\d.]*\b", re.IGNORECASE)
+CARRIAGE_RETURN_PATTERN = re.compile(r"_x000d_", re.IGNORECASE)
+DASH_PATTERN = re.compile(r"[-–—]")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+EDGE_CHARS = string.punctuation + " "
+
 
 def clean_text(text):
-    """Clean text for safe console output"""
+    """Clean one value for safe console output (same rules as clean_series)."""
     if pd.isna(text):
         return ""
-    
-    # Convert to string and make lowercase
-    cleaned = str(text).lower()
-    
-    # Remove unwanted patterns using regex for better matching
-    import re
-    cleaned = re.sub(r'this\s+class\s+(includes?|excludes?)\s*:?\s*', '', cleaned, flags=re.IGNORECASE)
-    cleaned = cleaned.replace("_x000d_", " ").replace("_x000D_", " ")
-    cleaned = cleaned.replace("_x000d_", " ").replace("_x000D_", " ")
-    
-    # Remove "see" patterns more comprehensively
-    import re
-    # Remove "see NUMBER", "see group NUMBER", "see groups NUMBER and NUMBER", etc.
-    cleaned = re.sub(r'\bsee\s+(group\s*|groups\s*)?[\d.,\s]+(and\s+[\d.,\s]+)*\b', '', cleaned, flags=re.IGNORECASE)
-    cleaned = re.sub(r'\bsee\s+\d+[\d.]*\b', '', cleaned, flags=re.IGNORECASE)
-    
-    # Replace dashes with commas
-    cleaned = cleaned.replace('-', ',').replace('–', ',').replace('—', ',')
-    
-    # Remove empty lines and extra whitespace
-    cleaned = ' '.join(cleaned.split())
-    
-    # Clean up double commas with spaces
-    cleaned = cleaned.replace(', ,', ',')
-    
-    # Remove punctuation at beginning and end
-    import string
-    cleaned = cleaned.strip(string.punctuation + ' ')
-    
-    return cleaned.encode('ascii', 'ignore').decode('ascii').strip()
-
-def flatten_isic_excel(input_path: str, output_path: str = None):
+    return clean_series(pd.Series([text])).iloc[0]
+
+
+def clean_series(values: pd.Series) -> pd.Series:
+    """Vectorized cleaning: lowercase, drop 'this class includes' / 'see ...' notes, dashes to commas, ASCII only."""
+    cleaned = values.fillna("").astype(str).str.lower()
+    cleaned = cleaned.str.replace(CLASS_HEADER_PATTERN, "", regex=True)
+    cleaned = cleaned.str.replace(CARRIAGE_RETURN_PATTERN, " ", regex=True)
+    cleaned = cleaned.str.replace(SEE_GROUPS_PATTERN, "", regex=True)
+    cleaned = cleaned.str.replace(SEE_NUMBER_PATTERN, "", regex=True)
+    cleaned = cleaned.str.replace(DASH_PATTERN, ",", regex=True)
+    cleaned = cleaned.str.replace(WHITESPACE_PATTERN, " ", regex=True).str.strip()
+    cleaned = cleaned.str.replace(", ,", ",", regex=False)
+    cleaned = cleaned.str.strip(EDGE_CHARS)
+    return cleaned.str.encode("ascii", "ignore").str.decode("ascii").str.strip()
+
+
+def read_sheets(input_path: str, cache_dir: Path | None = DEFAULT_CACHE_DIR, log=print) -> dict[str, pd.DataFrame]:
+    """Return every worksheet as an all-string DataFrame, reusing a Parquet cache keyed by the xlsx content hash.
+
+    Cells are read as text so codes such as '01' keep their leading zeros.
+    """
+    digest = hashlib.sha256(Path(input_path).read_bytes()).hexdigest()[:16]
+    stem = Path(input_path).stem
+    manifest = cache_dir / f"{stem}.{digest}.sheets.json" if cache_dir and pyarrow else None
+    if manifest and manifest.exists():
+        names = json.loads(manifest.read_text(encoding="utf-8"))
+        log(f"Using cached sheets ({digest}) from {cache_dir}")
+        return {name: pd.read_parquet(cache_dir / f"{stem}.{digest}.{n}.parquet") for n, name in enumerate(names)}
+    sheets = pd.read_excel(input_path, sheet_name=None, dtype=str)
+    if manifest:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        for n, frame in enumerate(sheets.values()):
+            frame.to_parquet(cache_dir / f"{stem}.{digest}.{n}.parquet", index=False)
+        manifest.write_text(json.dumps(list(sheets)), encoding="utf-8")
+        log(f"Cached parsed sheets ({digest}) in {cache_dir}")
+    return sheets
+
+
+def detect_levels(df: pd.DataFrame) -> tuple[pd.Series, pd.Series]:
+    """Return (code, level) per row, where code is the first non-empty cell without dots."""
+    cells = df.apply(lambda column: column.str.strip()).replace("", pd.NA)
+    first = cells.bfill(axis=1).iloc[:, 0].fillna("")
+    code = first.str.replace(".", "", regex=False).str.strip()
+    level = code.str.len().map(LEVELS).where(code.str.match(CODE_PATTERN), None)
+    return code, level
+
+
+def flatten_sheet(df: pd.DataFrame) -> pd.DataFrame:
+    """Flatten one ISIC sheet into class rows with their section / division / group names."""
+    code, level = detect_levels(df)
+    column = lambda i: clean_series(df.iloc[:, i]) if df.shape[1] > i else pd.Series("", index=df.index)  # noqa: E731
+    title = column(2)  # Column C
+    section = title.where(level == "section").ffill().fillna("")
+    division = title.where(level == "division").mask(level == "section", "").ffill().fillna("")
+    group = title.where(level == "group").mask(level.isin(["section", "division"]), "").ffill().fillna("")
+    includes = column(4).str.cat(column(5), sep="; ")  # Columns E and F
+    includes = includes.str.replace(r"^; |; $", "", regex=True).str.strip()
+    classes = level == "class"
+    return pd.DataFrame(
+        {
+            "section_name": section[classes],
+            "division_name": division[classes],
+            "group_name": group[classes],
+            "class_name": title[classes],
+            "includes": includes[classes],
+            "excludes": column(6)[classes],  # Column G
+        },
+        columns=OUTPUT_COLUMNS,
+    ).reset_index(drop=True)
+
+
+def describe_failure(sheet_name: str, df: pd.DataFrame) -> str:
+    """Explain why a sheet produced no class rows (level counts and unrecognized codes)."""
+    if df.empty:
+        return f"sheet '{sheet_name}' is empty"
+    code, level = detect_levels(df)
+    counts = level.value_counts().to_dict()
+    unknown = code[level.isna() & (code != "")].unique()[:5].tolist()
+    return (
+        f"sheet '{sheet_name}' {df.shape}: detected levels {counts or 'none'}; "
+        f"no class codes (letter + 4 digits, e.g. A0111) in the first non-empty column; "
+        f"unrecognized codes e.g. {unknown}"
+    )
+
+
+def flatten_isic_excel(input_path: str, output_path: str = None, quiet: bool = False, cache_dir: Path | None = DEFAULT_CACHE_DIR):
     """
     Flatten ISIC Excel structure to columns: section_name, division_name, group_name, class_name, includes, excludes
     """
-    # Read all sheets and find the one with data
-    excel_file = pd.ExcelFile(input_path)
-    print(f"Worksheets: {excel_file.sheet_names}")
-    
-    for sheet_name in excel_file.sheet_names:
-        print(f"\nTrying sheet: {sheet_name}")
-        df = pd.read_excel(input_path, sheet_name=sheet_name)
-        print(f"Shape: {df.shape}")
-        print(f"Columns: {df.columns.tolist()}")
-        
-        if df.empty:
+    log = (lambda *args: None) if quiet else print
+    sheets = read_sheets(input_path, cache_dir, log)
+    log(f"Worksheets: {list(sheets)}")
+
+    failures = []
+    for sheet_name, df in sheets.items():
+        log(f"\nSheet: {sheet_name} shape={df.shape}")
+        result_df = flatten_sheet(df) if not df.empty else pd.DataFrame(columns=OUTPUT_COLUMNS)
+        log(f"Total classes found: {len(result_df)}")
+        if result_df.empty:
+            failures.append(describe_failure(sheet_name, df))
             continue
-        
-        # Show first 15 rows to understand structure
-        print("\nFirst 15 rows with their first values:")
-        for idx in range(min(15, len(df))):
-            row = df.iloc[idx]
-            first_value = None
-            for cell in row.values:
-                if pd.notna(cell) and str(cell).strip():
-                    first_value = str(cell).strip()
-                    break
-            if first_value:
-                first_clean = first_value.replace('.', '').strip()
-                print(f"Row {idx}: '{first_value}' -> cleaned: '{first_clean}' (len={len(first_clean)}, isdigit={first_clean.isdigit()})")
-            
-        flattened_rows = []
-        current_section = ""
-        current_division = ""
-        current_group = ""
-        
-        for idx, row in df.iterrows():
-            # Skip completely empty rows
-            if row.isna().all():
-                continue
-            
-            # Get first non-empty cell value
-            first_value = None
-            for cell in row.values:
-                if pd.notna(cell) and str(cell).strip():
-                    first_value = str(cell).strip()
-                    break
-            
-            if not first_value:
-                continue
-            
-            # Clean the first value for pattern matching
-            first_clean = first_value.replace('.', '').strip()
-            
-            # Section level (single letter like T, A, B, etc)
-            if len(first_clean) == 1 and first_clean.isalpha():
-                current_section = clean_text(row.iloc[2]) if len(row) > 2 else ""  # Column C
-                current_division = ""
-                current_group = ""
-                print(f"Section: {first_clean} - {current_section}")
-                
-            # Division level (letter + 2 digits like T94, A01, etc)
-            elif len(first_clean) == 3 and first_clean[0].isalpha() and first_clean[1:].isdigit():
-                current_division = clean_text(row.iloc[2]) if len(row) > 2 else ""  # Column C
-                current_group = ""
-                print(f"Division: {first_clean} - {current_division}")
-                
-            # Group level (letter + 3 digits like T941, A011, etc)  
-            elif len(first_clean) == 4 and first_clean[0].isalpha() and first_clean[1:].isdigit():
-                current_group = clean_text(row.iloc[2]) if len(row) > 2 else ""  # Column C
-                print(f"Group: {first_clean} - {current_group}")
-                
-            # Class level (letter + 4 digits like T9411, A0111, etc)
-            elif len(first_clean) == 5 and first_clean[0].isalpha() and first_clean[1:].isdigit():
-                class_name = clean_text(row.iloc[2]) if len(row) > 2 else ""  # Column C
-                includes_e = clean_text(row.iloc[4]) if len(row) > 4 else ""  # Column E
-                includes_f = clean_text(row.iloc[5]) if len(row) > 5 else ""  # Column F
-                excludes = clean_text(row.iloc[6]) if len(row) > 6 else ""    # Column G
-                
-                # Combine includes from columns E and F
-                includes_parts = [includes_e, includes_f]
-                includes = "; ".join([part for part in includes_parts if part]).strip()
-                
-                flattened_rows.append({
-                    'section_name': current_section,
-                    'division_name': current_division,
-                    'group_name': current_group,
-                    'class_name': class_name,
-                    'includes': includes,
-                    'excludes': excludes
-                })
-                
-                print(f"Class: {first_clean} - {class_name}")
-        
-        print(f"\nTotal classes found: {len(flattened_rows)}")
-        
-        if flattened_rows:
-            # Create DataFrame
-            result_df = pd.DataFrame(flattened_rows)
-            
-            # Save to CSV in same directory as input file
-            if output_path is None:
-                output_path = input_path.replace('.xlsx', '_flattened.csv')
-            
-            result_df.to_csv(output_path, index=False, encoding='utf-8')
-            print(f"Flattened data saved to: {output_path}")
-            print(f"Total records: {len(result_df)}")
-            
-            return result_df
-    
-    print("No data found in any sheet")
+
+        # Save to CSV in same directory as input file
+        if output_path is None:
+            output_path = str(input_path).replace('.xlsx', '_flattened.csv')
+        result_df.to_csv(output_path, index=False, encoding='utf-8')
+        log(f"Flattened data saved to: {output_path}")
+        log(f"Total records: {len(result_df)}")
+        return result_df
+
+    print("No data found in any sheet:", file=sys.stderr)
+    for failure in failures:
+        print(f"  - {failure}", file=sys.stderr)
     return pd.DataFrame()
 
+
 if __name__ == "__main__":
-    # relative path to the input file
-    input_file = r"data\isic\ISIC5_Exp_Notes_11Mar2024.xlsx"
-    #input_file = r"C:\alkashef\GitHub\brands_dataset\data\isic\ISIC5_Exp_Notes_11Mar2024.xlsx"
-    flatten_isic_excel(input_file)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Flatten the ISIC Excel explanatory notes into a CSV.")
+    parser.add_argument("input", nargs="?", default=str(DEFAULT_INPUT), help="ISIC .xlsx file")
+    parser.add_argument("-o", "--output", help="output CSV (default: <input>_flattened.csv)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only report errors")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help="parsed-sheet Parquet cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="always re-read the workbook")
+    args = parser.parse_args()
+    result = flatten_isic_excel(args.input, args.output, args.quiet, None if args.no_cache else Path(args.cache_dir))
+    sys.exit(0 if not result.empty else 1)
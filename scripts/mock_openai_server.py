@@ -0,0 +1,49 @@
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from brandgen.mockserver import LATENCY_DISTRIBUTIONS, MockOpenAIServer  # noqa: E402
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the mock server knobs (shared with scripts/benchmark.py)."""
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="lognormal", help="latency distribution")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="mean (median for lognormal) latency in ms")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="lognormal shape parameter")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="probability of a 429 per attempt")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="probability of a 500/502/503 per attempt")
+    parser.add_argument("--retry-after", type=float, default=0.0, help="retry-after seconds sent with 429s")
+    parser.add_argument("--invalid-rate", type=float, default=0.0, help="probability that a generated item has a broken field")
+    parser.add_argument("--companies", type=int, default=10, help="companies per companies answer")
+    parser.add_argument("--brands", type=int, default=10, help="brand items per company")
+    parser.add_argument("--seed", type=int, default=0, help="seed for latency / failure draws")
+
+
+def server_from_args(args: argparse.Namespace, port: int = 0) -> MockOpenAIServer:
+    return MockOpenAIServer(
+        port=port,
+        latency=args.latency,
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        retry_after=args.retry_after,
+        invalid_rate=args.invalid_rate,
+        companies=args.companies,
+        brands=args.brands,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve mock OpenAI chat completions on localhost.")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(levelname)s | %(message)s")
+    server = server_from_args(args, args.port)
+    print(f"export OPENAI_BASE_URL={server.base_url}")
+    server.serve_forever()
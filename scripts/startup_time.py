@@ -0,0 +1,117 @@
+import argparse
+import csv
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_ISIC = ROOT / "data" / "isic" / "ISIC5_Exp_Notes_11Mar2024_flattened.csv"
+HEAVY_MODULES = ("openai", "httpx", "pydantic", "pyarrow", "pandas", "numpy", "tqdm")
+FORBIDDEN = {  # modules an offline command must not import
+    "import": {"openai", "pyarrow", "pandas", "numpy", "tqdm"},
+    "help": {"openai", "pyarrow", "pandas", "numpy", "tqdm"},
+    "csv": {"openai", "pyarrow", "pandas", "numpy", "tqdm"},
+    "dry": {"openai", "pyarrow", "pandas"},
+}
+ITEM = {"name": "Brand", "type": "brand", "invoice_example": "Brand 1kg", "gpc_segment": "10000000",
+        "gpc_family": "10000100", "gpc_class": "10000101", "gpc_brick": "10000102"}
+
+
+def write_inputs(tmp: Path, isic: Path) -> None:
+    """Write a one-group ISIC file and tiny companies / brands stores so the commands measure startup, not work."""
+    with isic.open("r", encoding="utf-8", newline="") as fh:
+        reader = csv.DictReader(fh)
+        row = next(reader)
+        fieldnames = reader.fieldnames
+    with (tmp / "isic.csv").open("w", encoding="utf-8", newline="") as fh:
+        writer = csv.DictWriter(fh, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerow(row)
+    company = {"company_name": "Startup Co", "headquarters_country": "Egypt", "main_industry_activities": "Testing"}
+    (tmp / "companies.json").write_text(json.dumps({row["group_name"]: [company]}), encoding="utf-8")
+    (tmp / "brands.json").write_text(json.dumps({"Startup Co": [ITEM]}), encoding="utf-8")
+
+
+def commands(tmp: Path) -> dict[str, list[str]]:
+    generate = str(ROOT / "generate.py")
+    return {
+        "import": [sys.executable, "-c", "import brandgen"],
+        "help": [sys.executable, generate, "--help"],
+        "csv": [sys.executable, generate, "csv", "--env-file", str(tmp / "missing.env")],
+        "dry": [sys.executable, generate, "dry", "--env-file", str(tmp / "missing.env")],
+    }
+
+
+def environment(tmp: Path) -> dict[str, str]:
+    env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}  # offline modes must not need it
+    env.update({
+        "GPT_MODEL": "gpt-4o-mini",
+        "STARTING_ISIC_LEVEL": "3",
+        "ISIC_FLATTENED_FILE": str(tmp / "isic.csv"),
+        "INDUSTRIES_FILE": str(ROOT / "data" / "industries.json"),
+        "COMPANIES_FILE": str(tmp / "companies.json"),
+        "BRANDS_FILE": str(tmp / "brands.json"),
+        "DATASET_FILE": str(tmp / "dataset.csv"),
+        "DATASET_FORMATS": "csv",
+        "CACHE_FILE": "",
+        "LOG_FILE": "",
+        "RUN_REPORT_FILE": "",
+        "PROMETHEUS_FILE": "",
+        "WIKIDATA_MODE": "off",
+        "ALIASES_FILE": str(tmp / "aliases.json"),
+    })
+    return env
+
+
+def imported_modules(cmd: list[str], env: dict[str, str]) -> set[str]:
+    """Top-level package names imported by cmd (via -X importtime)."""
+    proc = subprocess.run([cmd[0], "-X", "importtime", *cmd[1:]], cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd[1:])} exited with {proc.returncode}:\n{proc.stderr[-2000:]}")
+    return {
+        line.rsplit("|", 1)[1].strip().split(".")[0]
+        for line in proc.stderr.splitlines() if line.startswith("import time:") and "|" in line
+    }
+
+
+def measure(cmd: list[str], env: dict[str, str], repeat: int) -> list[float]:
+    """Wall-clock milliseconds of repeat cold runs of cmd."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold-start time and heavy imports of the offline entry points.")
+    parser.add_argument("--repeat", type=int, default=5, help="cold runs per command")
+    parser.add_argument("--max-ms", type=float, default=0.0, help="fail when a median exceeds this (0 = no budget)")
+    parser.add_argument("--isic", default=str(DEFAULT_ISIC), help="ISIC flattened CSV the one-group input is cut from")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'command':<8} {'min ms':>8} {'median ms':>10}  heavy imports")
+    with tempfile.TemporaryDirectory(prefix="brandgen-startup-") as tmp:
+        tmp = Path(tmp)
+        write_inputs(tmp, Path(args.isic))
+        env = environment(tmp)
+        for name, cmd in commands(tmp).items():
+            heavy = sorted(set(HEAVY_MODULES) & imported_modules(cmd, env))
+            samples = measure(cmd, env, args.repeat)
+            median = statistics.median(samples)
+            print(f"{name:<8} {min(samples):>8.1f} {median:>10.1f}  {', '.join(heavy) or '-'}", flush=True)
+            unexpected = FORBIDDEN[name] & set(heavy)
+            if unexpected:
+                failures.append(f"{name} imports {', '.join(sorted(unexpected))}")
+            if args.max_ms and median > args.max_ms:
+                failures.append(f"{name} median {median:.1f} ms exceeds {args.max_ms:g} ms")
+    for line in failures:
+        print(f"FAIL {line}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
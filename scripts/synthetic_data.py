@@ -0,0 +1,104 @@
+import argparse
+import csv
+import json
+import random
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from brandgen.persist import save_json  # noqa: E402
+
+
+DEFAULT_COMPANIES = ROOT / "data" / "companies.json"
+DEFAULT_ISIC = ROOT / "data" / "isic" / "ISIC5_Exp_Notes_11Mar2024_flattened.csv"
+BRAND_TYPES = ["brand", "product", "service", "product line"]
+COMPANIES_PER_GROUP = 10  # as in data/companies.json
+BRANDS_PER_COMPANY = (2, 15)  # uniform range; MAX_BRANDS_PER_COMPANY in config/.env.example is 15
+
+
+def load_profile(companies_path: Path = DEFAULT_COMPANIES, isic_path: Path = DEFAULT_ISIC) -> dict:
+    """Collect ISIC group names plus string-length samples and a word vocabulary from real output."""
+    with isic_path.open("r", encoding="utf-8", newline="") as fh:
+        groups = list(dict.fromkeys(row["group_name"] for row in csv.DictReader(fh) if row.get("group_name")))
+    companies = [c for items in json.loads(companies_path.read_text(encoding="utf-8")).values() for c in items]
+    texts = [c["company_name"] + " " + c["main_industry_activities"] for c in companies]
+    return {
+        "groups": groups,
+        "name_lengths": [len(c["company_name"]) for c in companies],
+        "activity_lengths": [len(c["main_industry_activities"]) for c in companies],
+        "countries": sorted({c["headquarters_country"] for c in companies}),
+        "words": sorted({w.strip(",.()") for text in texts for w in text.split() if len(w.strip(",.()")) > 2}),
+    }
+
+
+def _text(rng: random.Random, words: list[str], length: int) -> str:
+    """Join random vocabulary words until the text reaches length characters."""
+    out = rng.choice(words)
+    while len(out) < length:
+        out += " " + rng.choice(words)
+    return out
+
+
+def synthesize(brands: int, profile: dict, seed: int = 0) -> tuple[dict, dict]:
+    """Return (companies, brands) stores holding about ``brands`` brand items in total.
+
+    Companies fill the real ISIC groups ten at a time (numbered copies once every
+    group is used) and get 2-15 brands each; string lengths are drawn from the
+    real companies file, so JSON / CSV sizes scale like production output.
+    """
+    rng = random.Random(seed)
+    words, groups = profile["words"], profile["groups"]
+    companies: dict[str, list[dict]] = {}
+    brand_store: dict[str, list[dict]] = {}
+    total, n = 0, 0
+    while total < brands:
+        copy, group = divmod(n // COMPANIES_PER_GROUP, len(groups))
+        scope = groups[group] + (f" #{copy}" if copy else "")
+        name = f"{_text(rng, words, rng.choice(profile['name_lengths'])).title()} {n}"
+        companies.setdefault(scope, []).append(
+            {
+                "company_name": name,
+                "headquarters_country": rng.choice(profile["countries"]),
+                "main_industry_activities": _text(rng, words, rng.choice(profile["activity_lengths"])).capitalize(),
+            }
+        )
+        count = min(rng.randint(*BRANDS_PER_COMPANY), brands - total)
+        items = []
+        for _ in range(count):
+            brand = _text(rng, words, rng.randint(4, 24)).title()
+            segment = rng.randint(10, 99) * 1000000  # 8-digit GPC codes, each level nested in the one above
+            family = segment + rng.randint(1, 99) * 10000
+            klass = family + rng.randint(1, 99) * 100
+            items.append(
+                {
+                    "name": brand,
+                    "type": rng.choice(BRAND_TYPES),
+                    "invoice_example": f"{brand} {_text(rng, words, rng.randint(10, 40))}",
+                    "gpc_segment": str(segment),
+                    "gpc_family": str(family),
+                    "gpc_class": str(klass),
+                    "gpc_brick": str(klass + rng.randint(1, 99)),
+                }
+            )
+        brand_store[name] = items
+        total += count
+        n += 1
+    return companies, brand_store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic companies / brands JSON stores for benchmarks.")
+    parser.add_argument("--brands", type=int, default=100000, help="total brand items to generate")
+    parser.add_argument("-o", "--output-dir", default="data/synthetic", help="directory for companies.json / brands.json")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--companies-file", default=str(DEFAULT_COMPANIES), help="real companies JSON to sample lengths from")
+    parser.add_argument("--isic", default=str(DEFAULT_ISIC), help="ISIC flattened CSV with the group names")
+    args = parser.parse_args()
+    companies, brands = synthesize(args.brands, load_profile(Path(args.companies_file), Path(args.isic)), args.seed)
+    out = Path(args.output_dir)
+    save_json(str(out / "companies.json"), companies)
+    save_json(str(out / "brands.json"), brands)
+    print(f"{sum(len(v) for v in companies.values())} companies in {len(companies)} groups, "
+          f"{sum(len(v) for v in brands.values())} brands -> {out}")